@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Recall@10 against query latency of the IVF index (`IVFVectorStore`) compared
+with exact search (`NumpyVectorStore`), on synthetic catalogs.
+
+Real product embeddings cluster by category, so the synthetic vectors are
+drawn around `--topics` random topic directions rather than uniformly (which
+no ANN index handles well, and no real catalog looks like). For each size it
+reports the index build time and the `nprobe` the store calibrated for its
+target recall, then p50 latency, speedup and recall@10 against exact search
+for a range of `nprobe` values (half of the lists or more is searched exactly).
+
+    python benchmarks/ann_index.py --sizes 10000,100000,1000000 --nprobe 1,4,16,64
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.ivf_vector_store import IVFVectorStore
+from shared.numpy_vector_store import NumpyVectorStore
+
+TOP_K = 10
+
+
+def catalog(rng: np.random.Generator, topics: np.ndarray, count: int, spread: float) -> np.ndarray:
+    vectors = topics[rng.integers(0, len(topics), count)]
+    vectors += spread * rng.standard_normal(vectors.shape, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run(store, queries: np.ndarray) -> tuple[float, list[list[str]]]:
+    """p50 latency (ms) of top-10 queries, and their results."""
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=TOP_K))
+        latencies.append(time.perf_counter() - started)
+        results.append(result.ids)
+    return statistics.median(latencies) * 1000, results
+
+
+def recall(results: list[list[str]], exact: list[list[str]]) -> float:
+    return statistics.mean(len(set(r) & set(e)) / max(len(e), 1) for r, e in zip(results, exact))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated catalog sizes")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="comma-separated nprobe values")
+    parser.add_argument("--dim", type=int, default=128, help="embedding dimensions")
+    parser.add_argument("--dtype", default="float32", help="float32, float16 or int8")
+    parser.add_argument("--topics", type=int, default=1000, help="topic directions the vectors cluster around")
+    parser.add_argument("--spread", type=float, default=0.1, help="per-dimension noise around each topic")
+    parser.add_argument("--queries", type=int, default=50, help="queries per configuration")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    topics = rng.standard_normal((args.topics, args.dim), dtype=np.float32)
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+    queries = catalog(rng, topics, args.queries, args.spread)
+    print(f"{args.dim}-dim {args.dtype} vectors around {args.topics} topics, top-{TOP_K}, p50 over {args.queries} queries")
+    for size in (int(s) for s in args.sizes.split(",")):
+        ids = [f"node-{i}" for i in range(size)]
+        exact_store = NumpyVectorStore(dtype=args.dtype)
+        # Clustered once, when the last batch arrives.
+        ivf_store = IVFVectorStore(dtype=args.dtype, min_train_size=size)
+        build_seconds = 0.0
+        for start in range(0, size, 65536):
+            batch = catalog(rng, topics, min(65536, size - start), args.spread)
+            exact_store.add_vectors(ids[start:start + len(batch)], batch)
+            started = time.perf_counter()
+            ivf_store.add_vectors(ids[start:start + len(batch)], batch)
+            build_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        ivf_store.search(queries[:1], TOP_K)  # builds the inverted lists
+        build_seconds += time.perf_counter() - started
+
+        exact_ms, exact = run(exact_store, queries)
+        nlist = len(ivf_store._centroids)
+        print(f"\n  {size:,} items: exact {exact_ms:.2f}ms, IVF build {build_seconds:.1f}s ({nlist} lists)")
+        print(f"    calibrated for recall {ivf_store.target_recall}: nprobe {ivf_store.nprobe} (measured {ivf_store.measured_recall:.3f})")
+        print(f"    {'nprobe':>6} {'scanned':>8} {'p50':>9} {'speedup':>8} {'recall@10':>10}")
+        for nprobe in (int(n) for n in args.nprobe.split(",")):
+            if nprobe > nlist:
+                continue
+            ivf_store.nprobe = nprobe
+            ivf_ms, results = run(ivf_store, queries)
+            print(f"    {nprobe:>6} {nprobe / nlist:7.1%} {ivf_ms:7.2f}ms {exact_ms / ivf_ms:7.1f}x {recall(results, exact):10.3f}")
+        del exact_store, ivf_store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Concurrent-session throughput of the chapter 1 FunctionAgent, before and after
+registering the search tool with an async (`aquery`) implementation.
+
+Runs offline: the OpenAI LLM and the query engine are replaced by the fakes in
+`benchmarks/fakes.py`, each with a fixed latency.
+
+    python benchmarks/concurrent_sessions.py --sessions 32 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from llama_index.core.agent.workflow import FunctionAgent
+from llama_index.core.tools import FunctionTool
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from benchmarks.fakes import FakeLLM, FakeQueryEngine
+
+
+def build_tools(query_engine: FakeQueryEngine) -> dict[str, FunctionTool]:
+    def search_e_commerce_dataset(query: str) -> str:
+        """Useful to search cloting items and prices in an e-commerce dataset."""
+        return query_engine.query(query).response
+
+    async def blocking_search_e_commerce_dataset(query: str) -> str:
+        """Useful to search cloting items and prices in an e-commerce dataset."""
+        return query_engine.query(query).response
+
+    async def asearch_e_commerce_dataset(query: str) -> str:
+        """Useful to search cloting items and prices in an e-commerce dataset."""
+        return (await query_engine.aquery(query)).response
+
+    return {
+        # A sync call inside an async tool: stalls the event loop on every search.
+        "blocking": FunctionTool.from_defaults(async_fn=blocking_search_e_commerce_dataset, name="search_e_commerce_dataset"),
+        # Sync tool only: every search occupies a worker thread.
+        "sync": FunctionTool.from_defaults(fn=search_e_commerce_dataset),
+        # Sync + async tool: FunctionAgent awaits `aquery` directly.
+        "async": FunctionTool.from_defaults(
+            fn=search_e_commerce_dataset,
+            async_fn=asearch_e_commerce_dataset,
+            name="search_e_commerce_dataset",
+        ),
+    }
+
+
+async def run_sessions(tool: FunctionTool, sessions: int, latency: float) -> float:
+    agent = FunctionAgent(tools=[tool], llm=FakeLLM(latency=latency), system_prompt="You are a helpful assistant.")
+    started = time.perf_counter()
+    await asyncio.gather(*(agent.run(f"Find me a floral dress #{i}") for i in range(sessions)))
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=32, help="concurrent agent runs")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per LLM call and per query")
+    args = parser.parse_args()
+
+    tools = build_tools(FakeQueryEngine(latency=args.latency))
+    print(f"{args.sessions} concurrent sessions, {args.latency}s per LLM call / query")
+    for name, tool in tools.items():
+        seconds = await run_sessions(tool, args.sessions, args.latency)
+        print(f"  {name:<9} {seconds:6.2f}s  {args.sessions / seconds:6.1f} sessions/sec")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
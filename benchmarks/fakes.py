@@ -0,0 +1,772 @@
+"""
+Offline stand-ins for the hosted services used in the lessons.
+
+They let the helpers in `shared/` be exercised and benchmarked without API keys
+or network access, with configurable latency and error rates.
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import random
+import re
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+from typing import Any, Callable, List, Literal, Sequence, get_args, get_origin
+from unittest.mock import patch
+from uuid import uuid4
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+    MessageRole,
+)
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.function_calling import FunctionCallingLLM
+from llama_index.core.prompts import PromptTemplate
+from llama_index.core.tools import ToolSelection
+from pydantic import BaseModel, PrivateAttr
+
+
+class FakeRateLimitError(Exception):
+    """Raised by the fakes to simulate an HTTP 429 from the provider."""
+
+    status_code = 429
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    Deterministic bag-of-words embedding.
+
+    Each word is hashed into one of `embed_dim` buckets, so texts sharing words
+    get similar vectors, which is close enough to a real model for routing and
+    caching demos. Every call sleeps for `latency` seconds and fails with
+    `FakeRateLimitError` with probability `rate_limit_rate`.
+    """
+
+    model_name: str = "fake-embedding"
+    embed_dim: int = 64
+    latency: float = 0.0
+    rate_limit_rate: float = 0.0
+    _random: random.Random = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+
+    def __init__(self, seed: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self._random = random.Random(seed)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeEmbedding"
+
+    @property
+    def calls(self) -> int:
+        """Number of (batch) requests made against the fake provider."""
+        return self._calls
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.embed_dim
+        for word in re.findall(r"\w+", text.lower()):
+            bucket = int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.embed_dim
+            vector[bucket] += 1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _request(self):
+        self._calls += 1
+        if self._random.random() < self.rate_limit_rate:
+            raise FakeRateLimitError("Rate limit reached (fake)")
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embeddings([query])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        self._request()
+        return [self._vector(text) for text in texts]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return (await self._aget_text_embeddings([query]))[0]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        self._request()
+        return [self._vector(text) for text in texts]
+
+
+class FakeLLM(FunctionCallingLLM):
+    """
+    Offline stand-in for `OpenAI(model=...)`.
+
+    - `complete` answers with `responder(prompt)` (by default a short canned answer).
+    - `chat` with tools calls the first tool with the user's message, then answers
+      with the tool output once it is in the chat history, which is enough to
+      drive a `FunctionAgent` end to end.
+    - `structured_predict` returns an instance of the requested model, picking
+      for each `Literal` field the first choice mentioned in the prompt.
+
+    Every call sleeps for `latency` seconds and fails with `FakeRateLimitError`
+    with probability `error_rate`.
+    """
+
+    model: str = "fake-llm"
+    latency: float = 0.0
+    error_rate: float = 0.0
+    _responder: Callable[[str], str] = PrivateAttr()
+    _random: random.Random = PrivateAttr()
+
+    def __init__(self, responder: Callable[[str], str] | None = None, seed: int = 0, **kwargs):
+        super().__init__(**kwargs)
+        self._responder = responder or (lambda prompt: "This is a fake answer.")
+        self._random = random.Random(seed)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FakeLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name=self.model, is_chat_model=True, is_function_calling_model=True)
+
+    def _maybe_fail(self):
+        if self._random.random() < self.error_rate:
+            raise FakeRateLimitError("Rate limit reached (fake)")
+
+    @staticmethod
+    def _usage(prompt: str, completion: str) -> dict:
+        """Rough token usage (words), reported the way llama-index's OpenAI LLM does."""
+        prompt_tokens, completion_tokens = len(prompt.split()), len(completion.split())
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    def _reply(self, messages: Sequence[ChatMessage], tools: Sequence[Any] = ()) -> ChatMessage:
+        last = messages[-1]
+        if tools and last.role == MessageRole.USER:
+            tool = tools[0]
+            argument = next(iter(tool.metadata.get_parameters_dict()["properties"]), "input")
+            tool_call = ToolSelection(tool_id="call_0", tool_name=tool.metadata.get_name(), tool_kwargs={argument: last.content})
+            return ChatMessage(role=MessageRole.ASSISTANT, content="", additional_kwargs={"tool_calls": [tool_call]})
+        return ChatMessage(role=MessageRole.ASSISTANT, content=self._responder(last.content or ""))
+
+    def _prepare_chat_with_tools(self, tools, user_msg=None, chat_history=None, **kwargs) -> dict:
+        messages = list(chat_history or [])
+        if user_msg is not None:
+            messages.append(ChatMessage(role=MessageRole.USER, content=user_msg) if isinstance(user_msg, str) else user_msg)
+        return {"messages": messages, "tools": tools}
+
+    def get_tool_calls_from_response(self, response: ChatResponse, error_on_no_tool_call: bool = True, **kwargs) -> List[ToolSelection]:
+        tool_calls = response.message.additional_kwargs.get("tool_calls", [])
+        if not tool_calls and error_on_no_tool_call:
+            raise ValueError("Expected at least one tool call.")
+        return tool_calls
+
+    def _chat_response(self, messages: Sequence[ChatMessage], tools: Sequence[Any]) -> ChatResponse:
+        message = self._reply(messages, tools)
+        prompt = " ".join(m.content or "" for m in messages)
+        return ChatResponse(message=message, additional_kwargs=self._usage(prompt, message.content or ""))
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], tools: Sequence[Any] = (), **kwargs) -> ChatResponse:
+        time.sleep(self.latency)
+        self._maybe_fail()
+        return self._chat_response(messages, tools)
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], tools: Sequence[Any] = (), **kwargs) -> ChatResponse:
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return self._chat_response(messages, tools)
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], tools: Sequence[Any] = (), **kwargs) -> ChatResponseGen:
+        response = self.chat(messages, tools=tools)
+
+        def gen() -> ChatResponseGen:
+            yield ChatResponse(message=response.message, delta=response.message.content or "")
+
+        return gen()
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], tools: Sequence[Any] = (), **kwargs) -> ChatResponseAsyncGen:
+        response = await self.achat(messages, tools=tools)
+
+        async def gen() -> ChatResponseAsyncGen:
+            yield ChatResponse(message=response.message, delta=response.message.content or "")
+
+        return gen()
+
+    def _structured(self, output_cls: type[BaseModel], prompt: PromptTemplate, prompt_args: dict) -> BaseModel:
+        text = prompt.format(**prompt_args)
+        # The prompt lists every choice; the query arguments say which one is meant.
+        asked = " ".join(str(value) for value in prompt_args.values()).lower()
+        values = {}
+        for name, info in output_cls.model_fields.items():
+            if get_origin(info.annotation) is Literal:
+                choices = get_args(info.annotation)
+                values[name] = next((c for c in choices if str(c).lower() in asked), choices[0])
+            elif info.annotation is str:
+                values[name] = self._responder(text)
+        return output_cls(**values)
+
+    def structured_predict(self, output_cls: type[BaseModel], prompt: PromptTemplate, llm_kwargs=None, **prompt_args) -> BaseModel:
+        time.sleep(self.latency)
+        self._maybe_fail()
+        return self._structured(output_cls, prompt, prompt_args)
+
+    async def astructured_predict(self, output_cls: type[BaseModel], prompt: PromptTemplate, llm_kwargs=None, **prompt_args) -> BaseModel:
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return self._structured(output_cls, prompt, prompt_args)
+
+    def _completion_response(self, prompt: str) -> CompletionResponse:
+        text = self._responder(prompt)
+        return CompletionResponse(text=text, additional_kwargs=self._usage(prompt, text))
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        time.sleep(self.latency)
+        self._maybe_fail()
+        return self._completion_response(prompt)
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponse:
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        return self._completion_response(prompt)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponseGen:
+        time.sleep(self.latency)
+        self._maybe_fail()
+        text = self._responder(prompt)
+
+        def gen() -> CompletionResponseGen:
+            so_far = ""
+            for word in text.split(" "):
+                delta = word if not so_far else " " + word
+                so_far += delta
+                yield CompletionResponse(text=so_far, delta=delta)
+
+        return gen()
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs) -> CompletionResponseAsyncGen:
+        await asyncio.sleep(self.latency)
+        self._maybe_fail()
+        text = self._responder(prompt)
+
+        async def gen() -> CompletionResponseAsyncGen:
+            so_far = ""
+            for word in text.split(" "):
+                delta = word if not so_far else " " + word
+                so_far += delta
+                yield CompletionResponse(text=so_far, delta=delta)
+
+        return gen()
+
+
+class FakeQueryEngine:
+    """
+    Stand-in for `index.as_query_engine()`: `query` blocks for `latency`
+    seconds (like the real sync path), `aquery` awaits instead.
+    """
+
+    def __init__(self, latency: float = 0.0, answer: str = "Found 3 matching clothing items."):
+        self.latency = latency
+        self.answer = answer
+
+    def query(self, query: str):
+        time.sleep(self.latency)
+        return _FakeQueryResponse(self.answer)
+
+    async def aquery(self, query: str):
+        await asyncio.sleep(self.latency)
+        return _FakeQueryResponse(self.answer)
+
+
+class _FakeQueryResponse:
+    def __init__(self, response: str):
+        self.response = response
+
+    def __str__(self) -> str:
+        return self.response
+
+
+# --- Weaviate stand-ins -------------------------------------------------------
+
+_CATEGORIES = {
+    "Dresses & Jumpsuits": ["Dress", "Maxi Dress", "Jumpsuit", "Sundress"],
+    "Tops": ["T-Shirt", "Hoodie", "Blouse", "Sweater"],
+    "Bottoms": ["Jeans", "Skirt", "Trousers", "Shorts"],
+    "Footwear": ["Boots", "Sneakers", "Sandals", "Loafers"],
+    "Handbags": ["Tote", "Clutch", "Crossbody Bag", "Backpack"],
+    "Outerwear": ["Jacket", "Trench Coat", "Parka", "Blazer"],
+}
+_ADJECTIVES = ["Vintage", "Floral", "Leather", "Denim", "Linen", "Wool", "Silk", "Cotton", "Retro", "Urban", "Breezy", "Cozy"]
+_BRANDS = ["Loom & Aura", "Urban Threadline", "Echo & Stitch", "Solemates", "Nova Nest", "Vivid Verse"]
+_COLORS = ["black", "white", "red", "blue", "green", "cream", "yellow", "silver", "brown", "pink"]
+_TAGS = ["new in", "sale", "most loved", "limited edition", "bestseller"]
+
+
+def fake_catalog(n: int = 500, seed: int = 0) -> list[dict]:
+    """Synthetic rows shaped like the `weaviate/agents` e-commerce dataset."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        category = rng.choice(list(_CATEGORIES))
+        adjective = rng.choice(_ADJECTIVES)
+        item = rng.choice(_CATEGORIES[category])
+        brand = rng.choice(_BRANDS)
+        colors = rng.sample(_COLORS, k=2)
+        rows.append({
+            "properties": {
+                "name": f"{adjective} {item} {i}",
+                "description": f"A {adjective.lower()} {item.lower()} in {colors[0]} and {colors[1]} by {brand}, "
+                               f"perfect for {rng.choice(['summer parties', 'the office', 'weekends', 'evenings out'])}.",
+                "brand": brand,
+                "category": category,
+                "colors": colors,
+                "tags": rng.sample(_TAGS, k=rng.randint(0, 2)),
+                "price": round(rng.uniform(10, 600), 2),
+            }
+        })
+    return rows
+
+
+class _Metadata:
+    def __init__(self, distance: float | None = None, score: float | None = None):
+        self.distance = distance
+        self.score = score
+
+
+class FakeObject:
+    def __init__(self, uuid: str, properties: dict, metadata: _Metadata | None = None):
+        self.uuid = uuid
+        self.properties = properties
+        self.metadata = metadata or _Metadata()
+
+    def __repr__(self) -> str:
+        return f"Object(uuid={self.uuid!r}, properties={self.properties!r})"
+
+
+class FakeQueryReturn:
+    def __init__(self, objects: list[FakeObject]):
+        self.objects = objects
+
+
+class _Service:
+    """Adds latency / error injection to the collection sub-APIs."""
+
+    def __init__(self, collection: "FakeCollection"):
+        self._collection = collection
+
+    def _call(self):
+        self._collection._calls += 1
+        time.sleep(self._collection.latency)
+        if self._collection._random.random() < self._collection.error_rate:
+            raise FakeRateLimitError("Weaviate request failed (fake)")
+
+
+class _FakeBatchError:
+    def __init__(self, message: str, original_uuid: str | None = None):
+        self.message = message
+        self.original_uuid = original_uuid
+
+
+class _FakeBatchReturn:
+    def __init__(self, uuids: dict[int, str], errors: dict[int, _FakeBatchError], elapsed_seconds: float):
+        self.uuids = uuids
+        self.errors = errors
+        self.has_errors = bool(errors)
+        self.elapsed_seconds = elapsed_seconds
+
+
+class _FakeData(_Service):
+    def insert(self, properties: dict, uuid: str | None = None, **kwargs) -> str:
+        self._call()
+        return self._collection._put(properties, uuid)
+
+    def insert_many(self, objects: list) -> _FakeBatchReturn:
+        """Objects are dicts or `DataObject`s; each one fails with probability `object_error_rate`."""
+        started = time.perf_counter()
+        self._call()
+        collection = self._collection
+        time.sleep(collection.per_object_latency * len(objects))
+        uuids, errors = {}, {}
+        for i, obj in enumerate(objects):
+            properties, uuid = (obj, None) if isinstance(obj, dict) else (obj.properties, obj.uuid)
+            if collection._random.random() < collection.object_error_rate:
+                errors[i] = _FakeBatchError("object rejected (fake)", original_uuid=uuid)
+            else:
+                uuids[i] = collection._put(properties, uuid)
+        return _FakeBatchReturn(uuids, errors, time.perf_counter() - started)
+
+    def delete_many(self, where, **kwargs) -> "_FakeDeleteReturn":
+        """Only supports `Filter.by_id().contains_any([...])`."""
+        self._call()
+        ids = {str(uuid) for uuid in where.value}
+        deleted = [uuid for uuid in ids if self._collection.objects.pop(uuid, None) is not None]
+        return _FakeDeleteReturn(matches=len(deleted), successful=len(deleted))
+
+
+class _FakeDeleteReturn:
+    def __init__(self, matches: int, successful: int):
+        self.matches = matches
+        self.successful = successful
+        self.failed = 0
+
+
+class _FakeQuery(_Service):
+    def fetch_objects(self, limit: int | None = None, **kwargs) -> FakeQueryReturn:
+        self._call()
+        # Like Weaviate, an unbounded fetch still returns a single page.
+        limit = limit or self._collection.default_page_size
+        objects = [FakeObject(uuid, dict(properties)) for uuid, properties in islice(self._collection._snapshot(), limit)]
+        return FakeQueryReturn(objects)
+
+    def _ranked(self, query: str, limit: int | None) -> list[tuple[float, str, dict]]:
+        words = set(re.findall(r"\w+", query.lower()))
+        scored = []
+        for uuid, properties in self._collection._snapshot():
+            text = " ".join(str(properties.get(key, "")) for key in ("name", "description", "brand", "category")).lower()
+            score = len(words & set(re.findall(r"\w+", text)))
+            if score:
+                scored.append((score / max(len(words), 1), uuid, properties))
+        scored.sort(key=lambda item: -item[0])
+        return scored[: limit or 10]
+
+    def near_text(self, query: str, limit: int | None = None, **kwargs) -> FakeQueryReturn:
+        self._call()
+        return FakeQueryReturn([
+            FakeObject(uuid, dict(properties), _Metadata(distance=1 - score)) for score, uuid, properties in self._ranked(query, limit)
+        ])
+
+    def bm25(self, query: str, limit: int | None = None, **kwargs) -> FakeQueryReturn:
+        self._call()
+        return FakeQueryReturn([
+            FakeObject(uuid, dict(properties), _Metadata(score=score)) for score, uuid, properties in self._ranked(query, limit)
+        ])
+
+    def near_vector(self, near_vector: list[float], limit: int | None = None, **kwargs) -> FakeQueryReturn:
+        """Ranks objects by cosine similarity with the FakeEmbedding vector of their text."""
+        self._call()
+        embedding = FakeEmbedding(embed_dim=len(near_vector))
+        scored = []
+        for uuid, properties in self._collection._snapshot():
+            text = " ".join(str(properties.get(key, "")) for key in ("name", "description", "brand"))
+            similarity = sum(a * b for a, b in zip(near_vector, embedding._vector(text)))
+            scored.append((similarity, uuid, properties))
+        scored.sort(key=lambda item: -item[0])
+        return FakeQueryReturn([
+            FakeObject(uuid, dict(properties), _Metadata(distance=1 - similarity))
+            for similarity, uuid, properties in scored[: limit or 10]
+        ])
+
+    def hybrid(self, query: str, limit: int | None = None, **kwargs) -> FakeQueryReturn:
+        # Not `self.bm25`: that may be wrapped (traced, cached) on the instance.
+        return _FakeQuery.bm25(self, query, limit=limit)
+
+
+class _FakeAggregate(_Service):
+    def over_all(self, group_by=None, total_count: bool = True, return_metrics=None, **kwargs):
+        """Number and text metrics over all objects, optionally grouped by one property."""
+        from weaviate.collections.classes.aggregate import AggregateGroup, AggregateGroupByReturn, AggregateReturn, GroupedBy
+
+        self._call()
+        objects = [properties for _, properties in self._collection._snapshot()]
+        metrics = return_metrics if isinstance(return_metrics, (list, tuple)) else [return_metrics] if return_metrics else []
+        if group_by is None:
+            return AggregateReturn(properties=self._metrics(objects, metrics), total_count=len(objects) if total_count else None)
+
+        prop = group_by if isinstance(group_by, str) else group_by.prop
+        groups: dict[Any, list[dict]] = {}
+        for properties in objects:
+            groups.setdefault(properties.get(prop), []).append(properties)
+        return AggregateGroupByReturn(groups=[
+            AggregateGroup(grouped_by=GroupedBy(prop=prop, value=value), properties=self._metrics(members, metrics),
+                           total_count=len(members) if total_count else None)
+            for value, members in groups.items()
+        ])
+
+    @staticmethod
+    def _metrics(objects: list[dict], metrics: list) -> dict:
+        from collections import Counter
+
+        from weaviate.collections.classes.aggregate import AggregateNumber, AggregateText, TopOccurrence
+
+        results = {}
+        for metric in metrics:
+            values = [properties.get(metric.property_name) for properties in objects]
+            values = [value for value in values if value is not None]
+            if hasattr(metric, "top_occurrences_count"):
+                counts = Counter(v for value in values for v in (value if isinstance(value, list) else [value]))
+                results[metric.property_name] = AggregateText(count=sum(counts.values()), top_occurrences=[
+                    TopOccurrence(value=value, count=count) for value, count in counts.most_common(metric.limit or 5)
+                ])
+            else:
+                results[metric.property_name] = AggregateNumber(
+                    count=len(values),
+                    maximum=max(values, default=None),
+                    mean=sum(values) / len(values) if values else None,
+                    median=None,
+                    minimum=min(values, default=None),
+                    mode=None,
+                    sum_=sum(values),
+                )
+        return results
+
+
+class _FakeBatch:
+    def __init__(self, collection: "FakeCollection"):
+        self._collection = collection
+        self.failed_objects = []
+
+    def fixed_size(self, batch_size: int = 100, **kwargs) -> "_FakeBatch":
+        return self
+
+    def dynamic(self) -> "_FakeBatch":
+        return self
+
+    def __enter__(self) -> "_FakeBatch":
+        self.failed_objects = []
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add_object(self, properties: dict, uuid: str | None = None, **kwargs) -> str:
+        return self._collection._put(properties, uuid)
+
+
+class FakeCollection:
+    """In-memory stand-in for a Weaviate collection (keyword matching instead of vectors)."""
+
+    default_page_size = 25
+
+    def __init__(self, name: str, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+                 per_object_latency: float = 0.0, object_error_rate: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.per_object_latency = per_object_latency
+        self.object_error_rate = object_error_rate
+        self.objects: dict[str, dict] = {}
+        self._calls = 0
+        self._random = random.Random(seed)
+        self.data = _FakeData(self)
+        self.query = _FakeQuery(self)
+        self.batch = _FakeBatch(self)
+        self.aggregate = _FakeAggregate(self)
+
+    def _put(self, properties: dict, uuid: str | None = None) -> str:
+        uuid = uuid or str(uuid4())
+        self.objects[str(uuid)] = dict(properties)
+        return str(uuid)
+
+    def _snapshot(self) -> list[tuple[str, dict]]:
+        # Queries run on worker threads while admin steps insert; copying the
+        # items is a single call under the GIL, iterating the dict is not.
+        return list(self.objects.items())
+
+    def iterator(self, return_properties: list[str] | None = None, **kwargs):
+        for uuid, properties in self._snapshot():
+            if return_properties is not None:
+                properties = {key: properties[key] for key in return_properties if key in properties}
+            yield FakeObject(uuid, dict(properties))
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+
+class _FakeCollections:
+    def __init__(self, client: "FakeWeaviateClient"):
+        self._client = client
+        self._collections: dict[str, FakeCollection] = {}
+
+    def exists(self, name: str) -> bool:
+        return name in self._collections
+
+    def get(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = self._client._new_collection(name)
+        return self._collections[name]
+
+    use = get
+
+    def create(self, name: str, **kwargs) -> FakeCollection:
+        self._collections[name] = self._client._new_collection(name)
+        return self._collections[name]
+
+    def delete(self, name: str):
+        self._collections.pop(name, None)
+
+
+class FakeWeaviateClient:
+    """Stand-in for `weaviate.connect_to_weaviate_cloud(...)`."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, catalog_size: int = 500, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.collections = _FakeCollections(self)
+        ecommerce = self.collections.get("ECommerce")
+        for row in fake_catalog(catalog_size, seed=seed):
+            ecommerce._put(row["properties"])
+
+    def _new_collection(self, name: str) -> FakeCollection:
+        return FakeCollection(name, latency=self.latency, error_rate=self.error_rate, seed=self.seed)
+
+    def is_ready(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "FakeWeaviateClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+# --- QueryAgent stand-in ------------------------------------------------------
+
+class _FakeSearchResults:
+    def __init__(self, objects: list[FakeObject]):
+        self.objects = objects
+
+
+class FakeQueryAgentResponse:
+    def __init__(self, final_answer: str, objects: list[FakeObject] = ()):
+        self.final_answer = final_answer
+        self.search_results = _FakeSearchResults(list(objects))
+
+    def display(self):
+        print(self.final_answer)
+
+
+class FakeQueryAgent:
+    """Stand-in for `weaviate.agents.query.QueryAgent` backed by a FakeWeaviateClient."""
+
+    def __init__(self, client: FakeWeaviateClient, collections: list, system_prompt: str | None = None,
+                 latency: float = 0.0, error_rate: float = 0.0, seed: int = 0, **kwargs):
+        name = collections[0] if isinstance(collections[0], str) else collections[0].name
+        self.collection = client.collections.get(name)
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def _call(self):
+        time.sleep(self.latency)
+        if self._random.random() < self.error_rate:
+            raise FakeRateLimitError("QueryAgent request failed (fake)")
+
+    @staticmethod
+    def _question(query) -> str:
+        if isinstance(query, str):
+            return query
+        # Conversations are lists of weaviate ChatMessage (TypedDicts) or objects with `.content`.
+        last = query[-1]
+        return last["content"] if isinstance(last, dict) else last.content
+
+    def search(self, query, limit: int = 20, **kwargs) -> FakeQueryAgentResponse:
+        self._call()
+        objects = self.collection.query._ranked(self._question(query), limit)
+        return FakeQueryAgentResponse("", [FakeObject(uuid, dict(properties)) for _, uuid, properties in objects])
+
+    def _answer(self, query) -> FakeQueryAgentResponse:
+        objects = self.collection.query._ranked(self._question(query), 3)
+        names = ", ".join(properties["name"] for _, _, properties in objects) or "nothing matching"
+        return FakeQueryAgentResponse(f"I found {names}.", [FakeObject(uuid, dict(p)) for _, uuid, p in objects])
+
+    def ask(self, query, **kwargs) -> FakeQueryAgentResponse:
+        self._call()
+        return self._answer(query)
+
+    def ask_stream(self, query, **kwargs):
+        """Like the real one: a generator of StreamedTokens, then the final response."""
+        from weaviate.agents.classes import StreamedTokens
+
+        self._call()
+        response = self._answer(query)
+        for word in response.final_answer.split(" "):
+            yield StreamedTokens(delta=word + " ")
+        yield response
+
+
+# --- Offline mode -------------------------------------------------------------
+
+def default_responder(prompt: str) -> str:
+    """Canned completions for the prompts used in the lesson workflows."""
+    if "return the number only" in prompt:
+        numbers = re.findall(r"\d+", prompt)
+        return numbers[0] if numbers else "0"
+    if "return the numbers only" in prompt:
+        query = re.search(r"'(.*?)'", prompt)
+        return ", ".join(re.findall(r"\d+", query.group(1) if query else prompt))
+    return "Here is what I found for you: a few great matching items."
+
+
+@contextmanager
+def offline_services(
+    llm_latency: float = 0.0,
+    embed_latency: float = 0.0,
+    weaviate_latency: float = 0.0,
+    agent_latency: float = 0.0,
+    error_rate: float = 0.0,
+    catalog_size: int = 500,
+    seed: int = 0,
+):
+    """
+    Replace OpenAI, the Hugging Face dataset, Weaviate Cloud and QueryAgent
+    with the fakes above, so the lesson scripts can be imported and run
+    without credentials or network access. Yields the shared FakeWeaviateClient.
+
+    Lesson modules must be imported, and their lazily built agents and indexes
+    first used, inside the `with` block, since that is when they bind
+    `OpenAI`, `QueryAgent` etc.
+    """
+    from llama_index.core import Settings
+
+    client = FakeWeaviateClient(latency=weaviate_latency, error_rate=error_rate, catalog_size=catalog_size, seed=seed)
+    rows = fake_catalog(catalog_size, seed=seed)
+
+    def make_llm(*args, **kwargs):
+        return FakeLLM(latency=llm_latency, error_rate=error_rate, responder=default_responder, seed=seed)
+
+    def make_query_agent(client, collections, **kwargs):
+        return FakeQueryAgent(client, collections, latency=agent_latency, error_rate=error_rate, seed=seed, **kwargs)
+
+    previous_llm, previous_embed_model = Settings._llm, Settings._embed_model
+    Settings.llm = make_llm()
+    Settings.embed_model = FakeEmbedding(latency=embed_latency, seed=seed)
+    with tempfile.TemporaryDirectory() as index_dir, ExitStack() as stack:
+        stack.enter_context(patch.dict(os.environ, {"ECOMMERCE_INDEX_DIR": index_dir, "QUERY_VECTOR_CACHE": os.path.join(index_dir, "query_vectors.npz"),
+                                                # Fake router decisions and agent results must not reach the real stores.
+                                                "SHARED_CACHE_DB": os.path.join(index_dir, "shared_cache.db"), "HITL_DB": os.path.join(index_dir, "hitl.db"),
+                                                "WEAVIATE_URL": "http://fake", "WEAVIATE_API_KEY": "fake", "OPENAI_API_KEY": "fake"}))
+        stack.enter_context(patch("llama_index.llms.openai.OpenAI", make_llm))
+        stack.enter_context(patch("llama_index.embeddings.openai.OpenAIEmbedding", lambda *args, **kwargs: Settings.embed_model))
+        stack.enter_context(patch("datasets.load_dataset", lambda *args, **kwargs: iter(rows)))
+        stack.enter_context(patch("shared.query_engine.dataset_revision", lambda limit=None: f"fake-{catalog_size}-{seed}:{limit}"))
+        stack.enter_context(patch("weaviate.connect_to_weaviate_cloud", lambda *args, **kwargs: client))
+        stack.enter_context(patch("weaviate.agents.query.QueryAgent", make_query_agent))
+        try:
+            yield client
+        finally:
+            Settings._llm, Settings._embed_model = previous_llm, previous_embed_model
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Replay a JSONL request log against the lesson agents and report latency.
+
+Every line of the log is a JSON object with a "query" and, optionally, an "at"
+field (seconds since the start of the replay, used with --replay-timing).
+Runs offline by default: OpenAI, the Hugging Face dataset, Weaviate Cloud and
+the QueryAgent are replaced by the stand-ins in `benchmarks/fakes.py`, with
+injectable latency and error rates.
+
+    python benchmarks/replay.py --target all --concurrency 8 --rate 20
+    python benchmarks/replay.py --target mcp --llm-latency 0.5 --output results.json --max-p95 2.0
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import redirect_stdout
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+from benchmarks.fakes import offline_services
+from shared.tracing import enable_tracing
+
+
+def load_lesson(relative_path: str):
+    """Import a lesson script by path (their file names aren't valid module names)."""
+    path = ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(f"lesson_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def function_agent(client):
+    from llama_index.core.agent.workflow import FunctionAgent
+    from llama_index.llms.openai import OpenAI
+
+    module = load_lesson("chapter_1/01_02_end.py")
+    module.query_engine.get()  # the index is built before the replay starts
+    agent = FunctionAgent(tools=[module.search_tool.get()], llm=OpenAI(model="gpt-4.1"),
+                          system_prompt="You are a helpful assistant.")
+
+    async def run(query: str):
+        return await agent.run(query)
+    return run
+
+
+def ecommerce_agent(client):
+    module = load_lesson("chapter_1/01_03_end.py")
+    module.query_engine.get()  # the index is built before the replay starts
+    agent = module.EcommerceAgent(timeout=None)
+
+    async def run(query: str):
+        return await agent.run(query=query)
+    return run
+
+
+def ecommerce_workflow(client):
+    module = load_lesson("chapter_3/03_01_end.py")
+    agent = module.ECommerceAgent(client=client, timeout=None)
+
+    async def run(query: str):
+        return await agent.run(query=query)
+    return run
+
+
+def admin_workflow(client):
+    import tempfile
+
+    from shared.context_store import DurableRuns, SQLiteContextStore
+
+    module = load_lesson("chapter_3/03_02_end.py")
+    agent = module.ECommerceAdminAgent(client=client, timeout=None)
+    # Paused confirmations go through the same SQLite store the CLI uses.
+    store = SQLiteContextStore(os.path.join(tempfile.mkdtemp(), "hitl.db"))
+    runs = DurableRuns(agent, store, metrics=enable_tracing())
+
+    async def run(query: str):
+        outcome = await runs.start(query=query)
+        while outcome.paused:
+            # Stand-in for the human confirming the admin action.
+            outcome = await runs.resume(outcome.run_id, "yes")
+        return outcome.result
+    return run
+
+
+def mcp_server(client):
+    from llama_index.tools.mcp.utils import Context as MCPContext
+
+    async def discard_log(self, level, data, **kwargs):
+        pass
+
+    # The tool forwards streamed tokens to the client as log notifications;
+    # calls made here have no client session to send them to.
+    MCPContext.log = discard_log
+    module = load_lesson("chapter_4/04_03_end.py")
+    module.agent.get()  # connected before the replay starts
+
+    async def run(query: str):
+        return await module.mcp.call_tool("e-commerce-tool", {"run_args": {"query": query}})
+    return run
+
+
+TARGETS = {
+    "function-agent": function_agent,
+    "ecommerce-agent": ecommerce_agent,
+    "ecommerce-workflow": ecommerce_workflow,
+    "admin-workflow": admin_workflow,
+    "mcp": mcp_server,
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarize(latencies: list[float]) -> dict:
+    return {
+        "count": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+async def replay(run, requests: list[dict], concurrency: int, rate: float, replay_timing: bool, timeout: float | None) -> dict:
+    """Send `requests` at the given arrival rate with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], Counter()
+
+    async def send(request: dict):
+        arrived = time.perf_counter()
+        async with semaphore:
+            try:
+                await asyncio.wait_for(run(request["query"]), timeout)
+                # Latency includes time spent queued behind the concurrency limit.
+                latencies.append(time.perf_counter() - arrived)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+
+    started = time.perf_counter()
+    tasks = []
+    for i, request in enumerate(requests):
+        if replay_timing and "at" in request:
+            offset = request["at"]
+        else:
+            offset = i / rate if rate else 0.0
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(request)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    return {
+        **summarize(latencies),
+        "errors": dict(errors),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def print_report(target: str, result: dict):
+    print(f"\n=== {target} ===")
+    print(f"  requests: {result['count']} ok, {sum(result['errors'].values())} errors {result['errors'] or ''}")
+    print(f"  latency:  p50 {result['p50']:.3f}s  p95 {result['p95']:.3f}s  p99 {result['p99']:.3f}s")
+    print(f"  throughput: {result['throughput']:.1f} req/s over {result['seconds']:.2f}s")
+    print("  per step:")
+    for name, stats in result["steps"].items():
+        print(f"    {name:<45} n={stats['count']:<5} p50 {stats['p50']:.3f}s  p95 {stats['p95']:.3f}s  tokens {stats['tokens']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=str(ROOT / "benchmarks" / "sample_requests.jsonl"), help="JSONL request log")
+    parser.add_argument("--target", default="all", choices=["all", *TARGETS])
+    parser.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    parser.add_argument("--rate", type=float, default=0.0, help="arrivals per second (0 = all at once)")
+    parser.add_argument("--replay-timing", action="store_true", help="use the 'at' offsets from the log")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request deadline in seconds")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--weaviate-latency", type=float, default=0.05)
+    parser.add_argument("--agent-latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--verbose", action="store_true", help="show the lessons' own output")
+    parser.add_argument("--trace-file", help="also export every span as JSONL to this file")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--max-p95", type=float, help="exit with an error if any target's p95 exceeds this or any request fails")
+    args = parser.parse_args()
+
+    with open(args.log, "r") as f:
+        requests = [json.loads(line) for line in f if line.strip()]
+
+    # Lessons open new_clothing_items.json relative to the repository root.
+    os.chdir(ROOT)
+    # Per-step latencies come from the workflow/LLM spans, see shared/tracing.py.
+    registry = enable_tracing(trace_path=args.trace_file)
+    # Lessons that trace only when asked (04_03) then share this registry.
+    os.environ["TRACING"] = "1"
+
+    results = {}
+    targets = list(TARGETS) if args.target == "all" else [args.target]
+    with offline_services(
+        llm_latency=args.llm_latency,
+        embed_latency=args.embed_latency,
+        weaviate_latency=args.weaviate_latency,
+        agent_latency=args.agent_latency,
+        error_rate=args.error_rate,
+    ) as client:
+        for target in targets:
+            with redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                run = TARGETS[target](client)
+            registry.reset()  # drop spans recorded while setting up
+            # The lessons print progress for every request; keep the report readable.
+            with redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                result = await replay(run, requests, args.concurrency, args.rate, args.replay_timing, args.timeout)
+            result["steps"] = registry.snapshot()
+            results[target] = result
+            print_report(target, result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.max_p95 is not None:
+        # p95 only covers successful requests: a run where everything failed has none.
+        failed = [target for target, result in results.items() if result["errors"] or not result["count"]]
+        slow = [target for target, result in results.items() if result["p95"] > args.max_p95]
+        if failed or slow:
+            problems = []
+            if failed:
+                problems.append(f"failed requests for: {', '.join(failed)}")
+            if slow:
+                problems.append(f"p95 latency above {args.max_p95}s for: {', '.join(slow)}")
+            sys.exit("; ".join(problems))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Cold-start time of the lesson scripts, each in a fresh interpreter run with
+`-X importtime`.
+
+For every script it reports how long importing it takes and which top-level
+imports took longest (cumulative time, as `-X importtime` reports it). With
+`--serve` the script is run as the MCP server instead, and the report also
+has the time from process start until GET /status answers (the server is
+listening) and until the workflow it serves is built (see shared/startup.py).
+
+Without credentials the workflow can't connect and only the listening time is
+meaningful; `--offline` runs the script against the fakes in benchmarks/fakes.py,
+which import the SDKs they stand in for up front (so imports look slower).
+
+    python benchmarks/startup.py chapter_1/01_02_end.py chapter_1/01_03_end.py
+    python benchmarks/startup.py --serve --offline chapter_4/04_03_end.py
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Run by the child interpreter: argv is [mode, script, offline].
+_CHILD = """
+import importlib.util, json, runpy, sys, time
+from contextlib import nullcontext
+
+mode, path, offline = sys.argv[1], sys.argv[2], sys.argv[3] == "1"
+sys.path.insert(0, {root!r})
+if offline:
+    from benchmarks.fakes import offline_services
+    context = offline_services()
+else:
+    context = nullcontext()
+with context:
+    started = time.perf_counter()
+    if mode == "import":
+        spec = importlib.util.spec_from_file_location("lesson", path)
+        spec.loader.exec_module(importlib.util.module_from_spec(spec))
+        print(json.dumps({{"import_seconds": time.perf_counter() - started}}))
+    else:
+        runpy.run_path(path, run_name="__main__")
+"""
+
+
+def slowest_imports(stderr: str, top: int) -> list[tuple[float, str]]:
+    """(cumulative seconds, module) of the slowest top-level imports in `-X importtime` output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # nested imports are indented under their importer
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def child(mode: str, script: str, offline: bool) -> list[str]:
+    return [sys.executable, "-X", "importtime", "-c", _CHILD.format(root=str(ROOT)), mode, str(ROOT / script), "1" if offline else "0"]
+
+
+def profile_import(script: str, offline: bool) -> tuple[dict, str]:
+    started = time.perf_counter()
+    result = subprocess.run(child("import", script, offline), cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report["process_seconds"] = time.perf_counter() - started
+    return report, result.stderr
+
+
+def status(url: str) -> dict | None:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+
+def profile_serve(script: str, offline: bool, url: str, timeout: float) -> tuple[dict, str]:
+    # One process, so the importtime output is the server's alone.
+    env = {**os.environ, "MCP_WORKERS": "1"}
+    # A file rather than a pipe: nothing reads the pipe while the server runs, and a full one blocks it.
+    log = tempfile.TemporaryFile("w+")
+    started = time.perf_counter()
+    process = subprocess.Popen(child("serve", script, offline), cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    report = {}
+    try:
+        while time.perf_counter() - started < timeout and process.poll() is None:
+            stats = status(url)
+            if stats is not None:
+                report.setdefault("listening_seconds", time.perf_counter() - started)
+                workflow = stats.get("workflow", {"ready": True})
+                if workflow["ready"] or workflow.get("error"):
+                    report["workflow"] = workflow
+                    report["ready_seconds"] = time.perf_counter() - started
+                    break
+            time.sleep(0.05)
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    with log:
+        log.seek(0)
+        return report, log.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scripts", nargs="*", default=["chapter_1/01_02_end.py", "chapter_1/01_03_end.py", "chapter_4/04_03_end.py"])
+    parser.add_argument("--serve", action="store_true", help="run the scripts as MCP servers")
+    parser.add_argument("--offline", action="store_true", help="run against the fakes in benchmarks/fakes.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/status", help="status route of the served script")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds to wait for the server to be ready")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    for script in args.scripts:
+        print(f"\n{script}")
+        if args.serve:
+            report, stderr = profile_serve(script, args.offline, args.url, args.timeout)
+            if "listening_seconds" not in report:
+                print(f"  ⚠ not listening on {args.url} after {args.timeout:.0f}s")
+            else:
+                print(f"  listening after {report['listening_seconds']:.2f}s")
+                workflow = report.get("workflow")
+                if workflow is None:
+                    print(f"  ⚠ workflow not ready after {args.timeout:.0f}s")
+                elif workflow.get("error"):
+                    print(f"  ⚠ workflow failed after {report['ready_seconds']:.2f}s: {workflow['error']}")
+                elif workflow.get("seconds") is not None:
+                    print(f"  workflow ready after {report['ready_seconds']:.2f}s (built in {workflow['seconds']:.2f}s)")
+        else:
+            try:
+                report, stderr = profile_import(script, args.offline)
+            except RuntimeError as e:
+                print(f"  ⚠ import failed: {e}")
+                continue
+            print(f"  imported in {report['import_seconds']:.2f}s ({report['process_seconds']:.2f}s with interpreter start)")
+        print("  slowest imports (cumulative):")
+        for seconds, module in slowest_imports(stderr, args.top):
+            print(f"    {seconds * 1000:8.1f}ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Memory and query latency of the local vector stores: LlamaIndex's default
+SimpleVectorStore against NumpyVectorStore (float32, float16 and int8), on
+synthetic normalized embeddings with a `price` metadata field.
+
+For each size it reports the memory taken by the vectors and ids, the p50
+latency of a top-10 query with and without a `price < 100` filter, and the
+recall@10 of each store against exact float32 search. SimpleVectorStore is
+skipped above `--max-simple` items (it scores in pure Python).
+
+    python benchmarks/vector_store.py --sizes 1000,10000,100000 --dim 1536
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import MetadataFilter, MetadataFilters, VectorStoreQuery
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.numpy_vector_store import NumpyVectorStore
+
+TOP_K = 10
+PRICE_FILTER = MetadataFilters(filters=[MetadataFilter(key="price", value=100.0, operator="<")])
+
+
+def vectors(rng: np.random.Generator, count: int, dim: int) -> np.ndarray:
+    matrix = rng.standard_normal((count, dim), dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def build_simple(ids: list[str], matrix: np.ndarray, prices: np.ndarray) -> SimpleVectorStore:
+    store = SimpleVectorStore()
+    for node_id, vector, price in zip(ids, matrix, prices):
+        store.data.embedding_dict[node_id] = vector.tolist()
+        store.data.text_id_to_ref_doc_id[node_id] = node_id
+        store.data.metadata_dict[node_id] = {"price": float(price)}
+    return store
+
+
+def build_numpy(dtype: str, ids: list[str], matrix: np.ndarray, prices: np.ndarray) -> NumpyVectorStore:
+    store = NumpyVectorStore(dtype=dtype)
+    metadata = [{"price": float(price)} for price in prices]
+    for start in range(0, len(ids), 65536):
+        end = start + 65536
+        store.add_vectors(ids[start:end], matrix[start:end], ref_doc_ids=ids[start:end], metadata=metadata[start:end])
+    return store
+
+
+def measure(build) -> tuple[object, float, int]:
+    """Build a store; returns it with the build time and the memory it allocated."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = build()
+    seconds = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, seconds, allocated
+
+
+def p50_ms(store, queries: np.ndarray, filters: MetadataFilters | None = None) -> tuple[float, list[list[str]]]:
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=TOP_K, filters=filters))
+        latencies.append(time.perf_counter() - started)
+        results.append(result.ids)
+    return statistics.median(latencies) * 1000, results
+
+
+def recall(results: list[list[str]], exact: list[list[str]]) -> float:
+    return statistics.mean(len(set(r) & set(e)) / max(len(e), 1) for r, e in zip(results, exact))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000,100000,1000000", help="comma-separated item counts")
+    parser.add_argument("--dim", type=int, default=256, help="embedding dimensions")
+    parser.add_argument("--queries", type=int, default=20, help="queries per store")
+    parser.add_argument("--max-simple", type=int, default=100000, help="largest size to run SimpleVectorStore on")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    queries = vectors(rng, args.queries, args.dim)
+    print(f"{args.dim}-dim vectors, top-{TOP_K}, p50 over {args.queries} queries")
+    print(f"  {'items':>9}  {'store':<15} {'memory':>10} {'build':>8} {'query':>10} {'filtered':>10} {'recall@10':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        ids = [f"node-{i}" for i in range(size)]
+        matrix = vectors(rng, size, args.dim)
+        prices = rng.uniform(10, 500, size).astype(np.float32)
+        # Exact top-10 (float32 brute force) for recall.
+        exact = [[ids[i] for i in np.argsort(-(matrix @ q))[:TOP_K]] for q in queries]
+
+        builds = {f"numpy:{dtype}": lambda d=dtype: build_numpy(d, ids, matrix, prices) for dtype in ("float32", "float16", "int8")}
+        if size <= args.max_simple:
+            builds = {"simple": lambda: build_simple(ids, matrix, prices), **builds}
+        for name, build in builds.items():
+            store, seconds, allocated = measure(build)
+            latency, results = p50_ms(store, queries)
+            filtered, _ = p50_ms(store, queries, PRICE_FILTER)
+            print(f"  {size:>9,}  {name:<15} {allocated / 2**20:8.1f}MB {seconds:7.2f}s "
+                  f"{latency:8.2f}ms {filtered:8.2f}ms {recall(results, exact):10.3f}")
+            del store
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,89 @@
 import os
+import sys
 import asyncio
+from pathlib import Path
 from typing import Optional
-from llama_index.core.tools import FunctionTool
-from llama_index.core.agent.workflow import FunctionAgent
-from llama_index.llms.openai import OpenAI
-from datasets import load_dataset
-from llama_index.core import Document, VectorStoreIndex
-from llama_index.core.memory import Memory
 
 from dotenv import load_dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.startup import Lazy
+
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-def create_query_engine():
-    ecommerce_dataset = load_dataset(
-        "weaviate/agents", "query-agent-ecommerce", split="train", streaming=True
-    )
-    documents = [Document(text=row["properties"]["description"], 
-                          metadata={"name": row["properties"]["name"], "price": row["properties"]["price"], "category": row["properties"]["category"]}) 
-                          for row in ecommerce_dataset]
-    index = VectorStoreIndex.from_documents(documents[:100])
-    engine = index.as_query_engine(similarity_top_k=10)
-    return engine
 
-query_engine = create_query_engine()
+def make_query_engine():
+    # Imported here rather than at the top: both modules import llama_index.core,
+    # which would otherwise load before the script does anything.
+    from shared.query_engine import create_query_engine
+    from shared.semantic_cache import SemanticCache
+
+    # Paraphrased repeats of a question are answered from the cache.
+    return SemanticCache(similarity_threshold=0.92).wrap(create_query_engine())
+
+
+# Loading (or building) the index takes a while, so it happens on the first
+# search, or in the background from the start of `main`.
+query_engine = Lazy(make_query_engine, "query engine")
 
 def search_e_commerce_dataset(query: str) -> str:
     """Useful to search cloting items and prices in an e-commerce dataset.""" # call this a docstring
     print(f"Searching e-commerce dataset for: {query}")
-    response = query_engine.query(query)
+    response = query_engine.get().query(query)
+    return response.response
+
+
+async def asearch_e_commerce_dataset(query: str) -> str:
+    """Useful to search cloting items and prices in an e-commerce dataset."""
+    print(f"Searching e-commerce dataset for: {query}")
+    response = await (await query_engine.aget()).aquery(query)
     return response.response
 
 
+def make_search_tool():
+    # Imported here rather than at the top, like the agent and the LLM in `main`.
+    from llama_index.core.tools import FunctionTool
+
+    # FunctionAgent awaits `tool.acall`, which uses `async_fn` when one is given.
+    # Without it the sync function is pushed to a worker thread for every call.
+    return FunctionTool.from_defaults(
+        fn=search_e_commerce_dataset,
+        async_fn=asearch_e_commerce_dataset,
+        name="search_e_commerce_dataset",
+    )
+
+
+search_tool = Lazy(make_search_tool, "search tool")
+
+
 async def main():
+    from llama_index.core.agent.workflow import FunctionAgent
+    from llama_index.llms.openai import OpenAI
+
+    from shared.conversation_memory import bounded_memory
+
+    query_engine.warm()
     llm = OpenAI(model="gpt-4.1")
     agent_prompt = """
     You are a helpful assistant that can help answer siimple use questions or 
     search through clothing items and prices in an e-commerce dataset.
     """
-    memory = Memory.from_defaults(token_limit=40000)
+    # Older turns are compacted to the products they mentioned plus a running
+    # summary, so prompts stay near 4k tokens instead of growing to 40k.
+    memory = bounded_memory(target_tokens=4000, llm=llm)
 
-    agent = FunctionAgent(tools=[search_e_commerce_dataset], 
+    agent = FunctionAgent(tools=[search_tool.get()], 
                           llm=llm, 
                           system_prompt=agent_prompt)
     
     while True:
         user_input = input("Enter your query: ")
         if user_input.lower() == "exit":
+            if query_engine.ready:
+                print(f"Response cache: {query_engine.get().cache.stats()}")
             break
         response = await agent.run(user_input, memory=memory)
         print(response)
@@ -1,30 +1,27 @@
-import os, json
+import os, json, sys
 import asyncio
+from pathlib import Path
 from pydantic import BaseModel
 from workflows import Workflow, Context,step
 from workflows.events import Event, StartEvent, StopEvent
-from datasets import load_dataset
-from llama_index.core import Document, VectorStoreIndex
-from llama_index.llms.openai import OpenAI
 from dotenv import load_dotenv
-from llama_index.utils.workflow import (draw_all_possible_flows)
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.query_engine import create_query_engine
+from shared.router import ECOMMERCE_ROUTE, OTHER_ROUTE, QueryRouter
+from shared.semantic_cache import SemanticCache
+from shared.startup import Lazy
+from shared.tracing import enable_tracing
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-def create_query_engine():
-    ecommerce_dataset = load_dataset(
-        "weaviate/agents", "query-agent-ecommerce", split="train", streaming=True
-    )
-    documents = [Document(text=row["properties"]["description"], 
-                          metadata={"name": row["properties"]["name"], "price": row["properties"]["price"], "category": row["properties"]["category"]}) 
-                          for row in ecommerce_dataset]
-    index = VectorStoreIndex.from_documents(documents[:100])
-    engine = index.as_query_engine(similarity_top_k=10)
-    return engine
-
-query_engine = create_query_engine()
+# Paraphrased repeats of a question are answered from the cache.
+response_cache = SemanticCache(similarity_threshold=0.92)
+# Loading (or building) the index takes a while, so it happens on the first
+# e-commerce question, or in the background from the start of `main`.
+query_engine = Lazy(lambda: response_cache.wrap(create_query_engine()), "query engine")
 
 class FirstWorkflow(Workflow):
     @step
@@ -43,24 +40,24 @@ class OtherQuestion(Event):
 class EcommerceAgent(Workflow):
     
     def __init__(self, *args, **kwargs):
+        from llama_index.llms.openai import OpenAI
+
         super().__init__(*args, **kwargs)
         self.llm = OpenAI(model="gpt-5")
+        # Classifies locally and only falls back to the LLM when unsure.
+        self.router = QueryRouter([ECOMMERCE_ROUTE, OTHER_ROUTE], llm=self.llm)
 
     @step
     def evaluate_query(self, ev: EvaluateQuery) -> ECommerceQuestion | OtherQuestion:
-        response = self.llm.complete(
-            f"""Given the query '{ev.query}', return the relevant category of the query. 
-            If the query is about cloting items and proces, return 'ECommerce'. 
-            If the query is about something else, return 'Other'."""
-        )
-        if response.text == "ECommerce":
+        decision = self.router.route(ev.query)
+        if decision.label == "ECommerce":
             return ECommerceQuestion(query=ev.query)
         else:
             return OtherQuestion(query=ev.query)
 
     @step
     def answer_ecommerce_question(self, ev: ECommerceQuestion) -> StopEvent:
-        response = query_engine.query(ev.query)
+        response = query_engine.get().query(ev.query)
         return StopEvent(response.response)
     
     @step
@@ -74,11 +71,16 @@ class EcommerceAgent(Workflow):
     
 
 async def main():
+    from llama_index.utils.workflow import draw_all_possible_flows
+
+    query_engine.warm()
+    registry = enable_tracing()
     agent = EcommerceAgent(verbose=True)
     result = await agent.run(query="Where can I buy a macbook?")
     draw_all_possible_flows(agent, filename="e_commerce_agent.html")
 
     print(result)
+    print(registry.report())
 
 if __name__ == "__main__":
     asyncio.run(main())
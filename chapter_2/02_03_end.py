@@ -10,9 +10,17 @@ Prerequisites:
    - WEAVIATE_API_KEY=your-admin-api-key-here
 3. Install dependencies:
    pip install -U weaviate-client datasets
+
+By default an existing ECommerce collection is synced incrementally (only added,
+changed and removed items are sent). Run with --reset to delete and recreate it
+(discarding any import checkpoint), or with --resume to continue an interrupted
+or partly failed import from its checkpoint.
 """
 
+import asyncio
 import os
+import sys
+from pathlib import Path
 import weaviate
 from weaviate.classes.config import Configure, Property, DataType
 from weaviate.classes.query import MetadataQuery
@@ -20,8 +28,17 @@ from datasets import load_dataset
 from weaviate.collections.collection import Collection
 import dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.bulk_import import bulk_import
+from shared.catalog_sync import sync_catalog
+from shared.query_vectors import VectorSearch
+from shared.result_cache import bump_generation, invalidate_on_writes
+
 dotenv.load_dotenv(override=True)
 
+# Progress of an interrupted import, and the rows that failed; --resume continues from it.
+CHECKPOINT_FILE = os.getenv("IMPORT_CHECKPOINT_FILE", "storage/ecommerce_import_checkpoint.json")
+
 # Best practice:
 # This check prevents accidental credential exposure.
 if not all(key in os.environ for key in ["WEAVIATE_URL", "WEAVIATE_API_KEY"]):
@@ -44,14 +61,23 @@ def connect_to_weaviate() -> weaviate.WeaviateClient:
     return client
 
 
-def create_ecommerce_collection(client: weaviate.WeaviateClient) -> Collection:
+def create_ecommerce_collection(client: weaviate.WeaviateClient, reset: bool = False) -> Collection:
     """
     Create the ECommerce collection with the full schema from the lesson.
-    Deletes the collection if it already exists for a clean run.
+    An existing collection is kept (and synced) unless `reset` is True, in
+    which case it is deleted for a clean run.
     """
     collection_name = "ECommerce"
+    if not reset and client.collections.exists(collection_name):
+        print(f"ℹ Using the existing '{collection_name}' collection.")
+        collection = client.collections.get(collection_name)
+        if "openai" in (collection.config.get().vector_config or {}):
+            # Added by an earlier version of this script; every import still vectorizes it.
+            print("ℹ Its unused 'openai' named vector doubles the vectorization work; run with --reset to drop it.")
+        return collection
     if client.collections.exists(collection_name):
         client.collections.delete(collection_name)
+        bump_generation(collection_name)
         print(f"ℹ Deleted existing '{collection_name}' collection.")
 
     collection = client.collections.create(
@@ -65,6 +91,8 @@ def create_ecommerce_collection(client: weaviate.WeaviateClient) -> Collection:
             Property(name="colors", data_type=DataType.TEXT_ARRAY),
             Property(name="price", data_type=DataType.NUMBER, description="The price of the clothing item in USD"),
             Property(name="tags", data_type=DataType.TEXT_ARRAY),
+            Property(name="content_hash", data_type=DataType.TEXT, skip_vectorization=True,
+                     description="Hash of the other properties, used by incremental syncs"),
         ],
         vector_config=[
             Configure.Vectors.text2vec_weaviate(
@@ -78,28 +106,54 @@ def create_ecommerce_collection(client: weaviate.WeaviateClient) -> Collection:
     return collection
 
 
-def import_data(collection: Collection):
-    """
-    Load the e-commerce dataset from Hugging Face and import it
-    into the specified Weaviate collection using batching.
-    """
-    print("\n[Step 2/3] Importing data from Hugging Face...")
+def load_catalog():
+    """Yield the properties of every item in the e-commerce dataset from Hugging Face."""
     ecommerce_dataset = load_dataset(
         "weaviate/agents", "query-agent-ecommerce", split="train"
     )
+    for item in ecommerce_dataset:
+        yield item["properties"]
+
 
-    with collection.batch.fixed_size(100) as batch:
-        for item in ecommerce_dataset:
-            batch.add_object(properties=item["properties"])
+def import_data(collection: Collection, concurrency: int = 4):
+    """
+    Load the e-commerce dataset from Hugging Face and import it
+    into the specified Weaviate collection using batching.
 
-    if collection.batch.failed_objects:
-        print(f"⚠ Failed to import {len(collection.batch.failed_objects)} objects.")
-        for failure in collection.batch.failed_objects[:3]:
-            print(f"  - Error for object UUID {failure.original_uuid}: {failure.message}")
+    Batches are sent by `concurrency` workers, sized to the observed latency;
+    failed objects are retried with backoff and progress is checkpointed to
+    CHECKPOINT_FILE (see shared/bulk_import.py).
+    """
+    print("\n[Step 2/3] Importing data from Hugging Face...")
+    stats = asyncio.run(bulk_import(
+        collection,
+        load_catalog(),
+        checkpoint_path=CHECKPOINT_FILE,
+        concurrency=concurrency,
+    ))
+    print(f"  {stats.report()}")
+
+    if stats.failed:
+        print(f"⚠ Failed to import {len(stats.failed)} objects after retries.")
+        for offset, message in stats.failed[:3]:
+            print(f"  - Error for dataset row {offset}: {message}")
+        print(f"ℹ They are kept in {CHECKPOINT_FILE}; run with --resume to retry them.")
     else:
         print("✓ Data imported successfully!")
 
 
+def sync_data(collection: Collection, concurrency: int = 4):
+    """
+    Sync the collection with the e-commerce dataset: only added and changed
+    items are imported (and vectorized), removed ones are deleted.
+    """
+    print("\n[Step 2/3] Syncing data from Hugging Face...")
+    stats = asyncio.run(sync_catalog(collection, load_catalog(), concurrency=concurrency))
+    print(f"✓ {stats.report()}")
+    if stats.imported and stats.imported.failed:
+        print(f"⚠ Failed to import {len(stats.imported.failed)} objects after retries.")
+
+
 def verify_data(collection: Collection):
     """
     Verify the imported data with three checks:
@@ -109,8 +163,8 @@ def verify_data(collection: Collection):
     """
     print("\n[Step 3/3] Verifying data...")
 
-    # 1. Count the total number of objects.
-    total_count = len(collection.query.fetch_objects().objects)
+    # 1. Count the total number of objects (fetch_objects() only returns one page).
+    total_count = collection.aggregate.over_all(total_count=True).total_count
 
     print(f"✓ 1. Total objects in collection: {total_count}")
     assert total_count > 0
@@ -123,12 +177,14 @@ def verify_data(collection: Collection):
     assert "brand" in sample.properties and "name" in sample.properties
 
 
-    # 3. Test vector search
-    response = collection.query.near_text(
+    # 3. Test vector search (WEAVIATE_QUERY_VECTORS=1 sends a cached client-side query vector instead of the text)
+    search = VectorSearch.for_collection(collection)
+    response = search.near_text(
         query="vintage shoes",
         limit=1,
         return_metadata=MetadataQuery(distance=True)
     )
+    search.save()
 
     search_result = response.objects[0]
     distance = search_result.metadata.distance
@@ -147,8 +203,25 @@ def main():
     try:
         with connect_to_weaviate() as client:
             print("\n[Step 1/3] Creating ECommerce collection...")
-            collection = create_ecommerce_collection(client)
-            import_data(collection)
+            if "--reset" in sys.argv:
+                # A clean run: progress recorded against the old collection no longer applies.
+                if os.path.exists(CHECKPOINT_FILE):
+                    os.remove(CHECKPOINT_FILE)
+                    print(f"ℹ Deleted the import checkpoint {CHECKPOINT_FILE}.")
+                collection = create_ecommerce_collection(client, reset=True)
+                # Cached query results for the collection are dropped by the import's writes.
+                invalidate_on_writes(collection.data, collection.name)
+                import_data(collection)
+            elif "--resume" in sys.argv:
+                if not os.path.exists(CHECKPOINT_FILE):
+                    print(f"ℹ No checkpoint at {CHECKPOINT_FILE}; importing every row.")
+                collection = create_ecommerce_collection(client)
+                invalidate_on_writes(collection.data, collection.name)
+                import_data(collection)
+            else:
+                collection = create_ecommerce_collection(client)
+                invalidate_on_writes(collection.data, collection.name)
+                sync_data(collection)
             verify_data(collection)
 
         print("\n🎉 You now have a working Weaviate instance with the e-commerce dataset.")
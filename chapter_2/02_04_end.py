@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 import os
+import sys
+from pathlib import Path
 from weaviate.classes.query import MetadataQuery, Filter
 from weaviate.auth import AuthApiKey
 import weaviate
 import dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.query_vectors import VectorSearch
+
 dotenv.load_dotenv(override=True)
 
 # This script contains all the query examples from Lesson 2.4.
@@ -26,10 +31,15 @@ def main():
 
         print(f"✓ Collection '{collection.name}' is ready.")
 
+        # With WEAVIATE_QUERY_VECTORS=1, query vectors are computed client-side once
+        # (with the collection's own text2vec_weaviate model) and cached across runs,
+        # instead of Weaviate vectorizing the same query text on every search.
+        search = VectorSearch.for_collection(collection)
+
 
         # --- Vector Search ---
         print("\n--- 1. Vector Search (by meaning) ---")
-        response = collection.query.near_text(
+        response = search.near_text(
             query="smart pants",
             limit=2,
         )
@@ -51,7 +61,7 @@ def main():
 
         # --- Hybrid Search ---
         print("\n--- 3. Hybrid Search (best of both) ---")
-        response = collection.query.hybrid(
+        response = search.hybrid(
             query="vintage floral dresses",
             alpha=0.5,
             limit=3,
@@ -64,7 +74,7 @@ def main():
 
         # --- Hybrid Search with Filter ---
         print("\n--- 4. Hybrid Search with Filter ---")
-        response = collection.query.hybrid(
+        response = search.hybrid(
             query="vintage floral dresses",
             alpha=0.75,
             filters=Filter.by_property("price").less_than(60),
@@ -74,5 +84,9 @@ def main():
         for obj in response.objects:
             print(f"  - {obj.properties['name']} (${obj.properties['price']:.2f})")
 
+        search.save()
+        if search.cache is not None:
+            print(f"\nℹ Query vector cache: {search.stats()}")
+
 if __name__ == "__main__":
     main()
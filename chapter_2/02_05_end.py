@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 import os
+import sys
+from pathlib import Path
 import weaviate
 from weaviate.agents.query import QueryAgent
-from weaviate.agents.classes import ChatMessage
 from weaviate.auth import AuthApiKey
 import dotenv
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.catalog_stats import CatalogStats
+from shared.conversation_memory import Conversation
+
 dotenv.load_dotenv(override=True)
 
 # Connect to Weaviate Cloud
@@ -45,35 +50,36 @@ with weaviate.connect_to_weaviate_cloud(
 
 
     # Aggregation queries
+    # Counts and price figures come straight from an aggregate query over the
+    # collection; the agent is only asked if the question isn't recognized.
     print("\n--- Ask results (aggregation) ---")
-    agg_response = qa.ask(
-        "How many items do we have in the 'Footwear' category, and what is the average price?"
-    )
+    agg_question = "How many items do we have in the 'Footwear' category, and what is the average price?"
+    stats = CatalogStats(client.collections.get("ECommerce"))
+    agg_answer = stats.answer(agg_question)
+    if agg_answer is None:
+        agg_answer = qa.ask(agg_question).final_answer
 
-    print("Ask mode query: How many items do we have in the 'Footwear' category, and what is the average price?")
-    print(f"Agent answer: {agg_response.final_answer}")
+    print(f"Ask mode query: {agg_question}")
+    print(f"Agent answer: {agg_answer}")
 
 
     # Handling Conversations
     print("\n--- Conversation ---")
 
     # Initial question
+    # The conversation keeps only the latest answer in full; earlier answers are
+    # replaced by the products they mentioned, so follow-ups stay small.
+    conversation = Conversation(target_tokens=1500)
     initial_question = "Recommend some footwear for me."
-    initial_response = qa.ask(initial_question)
+    initial_response = conversation.ask(qa, initial_question)
 
     print(f"User: {initial_question}")
     print(f"Agent: {initial_response.final_answer}")
 
 
-    # Build conversation history for the follow-up
+    # Follow-up using the conversation history
     follow_up_question = "Which of those are under $80?"
-
-    conversation = [
-        ChatMessage(role="user", content=initial_question),
-        ChatMessage(role="assistant", content=initial_response.final_answer),
-        ChatMessage(role="user", content=follow_up_question)
-    ]
-    follow_up = qa.ask(conversation)
+    follow_up = conversation.ask(qa, follow_up_question)
 
     # The agent understands "those" refers to the footwear from the previous turn
     print(f"\nUser: {follow_up_question}")
@@ -1,13 +1,20 @@
 import asyncio
 import os
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
-from weaviate.agents.query import QueryAgent
-from llama_index.llms.openai import OpenAI
-from workflows import Workflow, step
+from workflows import Context, Workflow, step
 from workflows.events import Event, StartEvent, StopEvent
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.catalog_stats import CatalogStats
+from shared.projection import project_results
+from shared.result_cache import ResultCache
+from shared.router import ASK_ROUTE, SEARCH_ROUTE, STATS_ROUTE, QueryRouter
+from shared.streaming import TokenEvent, stream_answer, stream_completion
+from shared.startup import Lazy
+from shared.tracing import enable_tracing, trace_calls
+
 load_dotenv()
 
 class AskEvent(Event):
@@ -16,53 +23,102 @@ class AskEvent(Event):
 class SearchEvent(Event):
     query: str
 
+class StatsEvent(Event):
+    query: str
+
 class ECommerceAgent(Workflow):
     def __init__(self, client, *args, **kwargs):
+        # Imported here rather than at the top: they take seconds, and are built while the first query is typed.
+        from llama_index.llms.openai import OpenAI
+        from weaviate.agents.query import QueryAgent
+
         super().__init__(*args, **kwargs)
+        self.client = client
         self.llm = OpenAI(model="gpt-5")
-        self.weaviate_agent = QueryAgent(client=client, collections=["ECommerce"])
+        self.router = QueryRouter([ASK_ROUTE, SEARCH_ROUTE, STATS_ROUTE], llm=self.llm)
+        self.weaviate_agent = trace_calls(QueryAgent(client=client, collections=["ECommerce"]), "ask_stream", "search")
+        # Identical searches are answered from memory until the collection changes.
+        self.result_cache = ResultCache()
+        self.result_cache.wrap(self.weaviate_agent, "ECommerce", "search")
+        self.catalog_stats = CatalogStats(client.collections.get("ECommerce"))
 
     @step
-    def start(self, ev: StartEvent) -> AskEvent | SearchEvent:
-        decision_prompt = f"""
-        Given the query '{ev.query}', return the relevant category of the query. 
-        If the query is a question that can be answered in natural language, return 'Ask'.
-        If the query is a question that can be answered by searching the database and returning a list of objects, return 'Search'.           
-        """
-        response = self.llm.complete(decision_prompt)
-        if response.text == "Ask":
+    def start(self, ev: StartEvent) -> AskEvent | SearchEvent | StatsEvent:
+        decision = self.router.route(ev.query)
+        if decision.label == "Ask":
             return AskEvent(query=ev.query)
-        elif response.text == "Search":
+        elif decision.label == "Stats":
+            return StatsEvent(query=ev.query)
+        else:
             return SearchEvent(query=ev.query)
 
     @step
-    def ask(self, ev: AskEvent) -> StopEvent:
-        response = self.weaviate_agent.ask(ev.query)
+    async def ask(self, ev: AskEvent, ctx: Context) -> StopEvent:
+        response = await stream_answer(ctx, self.weaviate_agent, ev.query)
         return StopEvent(response.final_answer)
     
     @step
-    def search(self, ev: SearchEvent) -> StopEvent:
-        results = self.weaviate_agent.search(ev.query)
-        response = self.llm.complete(
-            f"""Here's the list of items for the the query '{ev.query}':
-            {results.search_results.objects}. Return them as a readable list for the user.
+    def stats(self, ev: StatsEvent) -> StopEvent | AskEvent:
+        # Counts and price figures come from the cached aggregate summary;
+        # questions it can't parse still go to the QueryAgent.
+        answer = self.catalog_stats.answer(ev.query)
+        if answer is None:
+            return AskEvent(query=ev.query)
+        return StopEvent(answer)
+
+    @step
+    async def search(self, ev: SearchEvent, ctx: Context) -> StopEvent:
+        results = await asyncio.to_thread(self.weaviate_agent.search, ev.query)
+        # Only the properties worth showing, as TSV, within a fixed token budget.
+        items = project_results(results.search_results.objects)
+        response = await stream_completion(
+            ctx,
+            self.llm,
+            f"""Here's the list of items for the the query '{ev.query}', one per line:
+{items}
+Return them as a readable list for the user.
             """
         )
         return StopEvent(response)
 
 
-async def main():
-     with  weaviate.connect_to_weaviate_cloud(
+def connect_agent() -> ECommerceAgent:
+    import weaviate
+    from weaviate.auth import AuthApiKey
+
+    client = weaviate.connect_to_weaviate_cloud(
         cluster_url=os.getenv("WEAVIATE_URL"),
         auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY")),
-    ) as client:
-        agent = ECommerceAgent(client=client, verbose=True)
+    )
+    return ECommerceAgent(client=client, verbose=True)
+
+
+async def main():
+    registry = enable_tracing()
+    # Connected in the background while the first query is typed.
+    agent = Lazy(connect_agent, "e-commerce agent")
+    agent.warm()
+    try:
         while True:
             user_input = input("Enter your query: ")
             if user_input.lower() == "exit":
+                print(registry.report())
                 break
-            response = await agent.run(query=user_input)
-            print(response)
+            handler = (await agent.aget()).run(query=user_input)
+            streamed = False
+            async for event in handler.stream_events():
+                if isinstance(event, TokenEvent):
+                    print(event.delta, end="", flush=True)
+                    streamed = True
+            result = await handler
+            # Ask/Search answers were already printed token by token; Stats answers weren't.
+            if streamed:
+                print()
+            else:
+                print(result)
+    finally:
+        if agent.ready:
+            agent.get().client.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
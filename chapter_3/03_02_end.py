@@ -1,15 +1,25 @@
 
 import asyncio
-import json
 import os
+import re
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-import weaviate
-from weaviate.auth import AuthApiKey
-from weaviate.agents.query import QueryAgent
-from llama_index.llms.openai import OpenAI
 from workflows import Context, Workflow, step
 from workflows.events import Event, StartEvent, StopEvent, HumanResponseEvent, InputRequiredEvent
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.catalog import get_catalog
+from shared.catalog_stats import CatalogStats
+from shared.context_store import DurableRuns, SQLiteContextStore
+from shared.item_selection import parse_item_selection
+from shared.projection import project_results
+from shared.result_cache import ResultCache, invalidate_on_writes
+from shared.router import ASK_ROUTE, SEARCH_ROUTE, STATS_ROUTE, ADMIN_ROUTE, QueryRouter
+from shared.streaming import TokenEvent, stream_answer, stream_completion
+from shared.startup import Lazy
+from shared.tracing import enable_tracing, trace_calls
+
 load_dotenv()  
 
 class AskEvent(Event):
@@ -18,86 +28,164 @@ class AskEvent(Event):
 class SearchEvent(Event):
     query: str
 
+class StatsEvent(Event):
+    query: str
+
 class AdminEvent(Event):
-    index: int
+    # The selected items themselves, resolved when routing: the file may be reloaded before the admin step runs.
+    indices: list[int]
+    selected: list[dict]  # not `items`, which would shadow the dict-like Event.items()
 
 class ECommerceAdminAgent(Workflow):
     def __init__(self, client, *args, **kwargs):
+        # Imported here rather than at the top: they take seconds, and are built while the first query is typed.
+        from llama_index.llms.openai import OpenAI
+        from weaviate.agents.query import QueryAgent
+
         super().__init__(*args, **kwargs)
+        self.client = client
         self.llm = OpenAI(model="gpt-5")
-        self.weaviate_agent = QueryAgent(client=client, collections=["ECommerce"])
+        self.router = QueryRouter([ASK_ROUTE, SEARCH_ROUTE, ADMIN_ROUTE, STATS_ROUTE], llm=self.llm)
+        self.weaviate_agent = trace_calls(QueryAgent(client=client, collections=["ECommerce"]), "ask_stream", "search")
+        # Identical searches are answered from memory until the collection changes.
+        self.result_cache = ResultCache()
+        self.result_cache.wrap(self.weaviate_agent, "ECommerce", "search")
         self.collection = client.collections.get("ECommerce")
-        # Load JSON file with clothing items
-        with open("new_clothing_items.json", "r") as f:
-            self.new_items = json.load(f)
+        trace_calls(self.collection.data, "insert", "insert_many", name="ECommerce.data")
+        # Aggregation answers are cached; admin inserts mark them stale.
+        self.catalog_stats = CatalogStats(self.collection)
+        self.catalog_stats.watch_writes(self.collection.data)
+        invalidate_on_writes(self.collection.data, "ECommerce")
+        # Clothing items to add, shared by every agent and reloaded when the file changes
+        self.new_items = get_catalog("new_clothing_items.json")
         
     @step
-    def start(self, ev: StartEvent) -> AskEvent | SearchEvent | AdminEvent:
-        decision_prompt = f"""
-        Given the query '{ev.query}', return the relevant category of the query. 
-        If the query is a question that can be answered in natural language, return 'Ask'.
-        If the query is a question that can be answered by searching the database and returning a list of objects, return 'Search'.
-        If the query is about adding an item to the collection, return 'Admin'.            
-        """
-        response = self.llm.complete(decision_prompt)
-        if response.text == "Ask":
+    def start(self, ev: StartEvent) -> AskEvent | SearchEvent | StatsEvent | AdminEvent:
+        decision = self.router.route(ev.query)
+        if decision.label == "Ask":
             return AskEvent(query=ev.query)
-        elif response.text == "Search":
+        elif decision.label == "Search":
             return SearchEvent(query=ev.query)
-        elif response.text == "Admin":
-            response = self.llm.complete(
-            f"""Evaluate the requested index from the query: '{ev.query}', return the number only.""")
-            return AdminEvent(index=int(response.text))
+        elif decision.label == "Stats":
+            return StatsEvent(query=ev.query)
+        else:
+            # Ranges, lists, item and collection names are resolved without the LLM.
+            indices = parse_item_selection(ev.query, self.new_items)
+            if indices is None:
+                names = "\n".join(f"{i}: {self.new_items.properties(i)['name']}" for i in range(len(self.new_items)))
+                response = self.llm.complete(
+                f"""Evaluate the requested item indexes from the query: '{ev.query}', return the numbers only, separated by commas.
+                The items are:\n{names}""")
+                indices = [int(n) for n in re.findall(r"\d+", response.text) if int(n) < len(self.new_items)]
+            return AdminEvent(indices=indices, selected=[self.new_items.properties(i) for i in indices])
 
     @step
     async def admin(self, ev: HumanResponseEvent | AdminEvent, ctx: Context) -> InputRequiredEvent | StopEvent:
         if isinstance(ev, AdminEvent):
-            item = self.new_items[ev.index]
-            properties = item.get("properties", item)
-            await ctx.store.set("item_index", ev.index)
-            return InputRequiredEvent(confirmation=f"Please confirm that this is the item you want to add (answer yes or no) {properties}:")
+            if not ev.selected:
+                return StopEvent("No matching items found in new_clothing_items.json.")
+            # Keep the items themselves until the answer arrives.
+            await ctx.store.set("selected_items", ev.selected)
+            lines = []
+            for i, properties in zip(ev.indices, ev.selected):
+                lines.append(f"  [{i}] {properties['name']} ({properties.get('collection', '')}, ${properties['price']:.2f})")
+            listing = "\n".join(lines)
+            return InputRequiredEvent(confirmation=f"Please confirm that these are the {len(ev.indices)} item(s) you want to add (answer yes or no):\n{listing}\n")
         elif isinstance(ev, HumanResponseEvent):
             if ev.response.lower() == "yes":
-                item = self.new_items[await ctx.store.get("item_index")]
-                properties = item.get("properties", item)
-                self.collection.data.insert(properties=properties)
-                return StopEvent(f"Successfully added item: {properties["name"]} to the collection.")
+                # Imported here: it imports weaviate, which the agent otherwise only needs once connected.
+                from shared.bulk_import import to_data_object
+
+                properties = await ctx.store.get("selected_items")
+                # One batch request for the whole selection; failures are reported per item.
+                result = self.collection.data.insert_many([to_data_object(p) for p in properties])
+                added = [properties[i]["name"] for i in sorted(result.uuids)]
+                message = f"Successfully added {len(added)} item(s) to the collection: {', '.join(added)}."
+                if result.errors:
+                    failures = "\n".join(f"  - {properties[i]['name']}: {error.message}" for i, error in sorted(result.errors.items()))
+                    message += f"\nFailed to add {len(result.errors)} item(s):\n{failures}"
+                return StopEvent(message)
             else:
-                return StopEvent("Aborted adding item to the collection.")
+                return StopEvent("Aborted adding items to the collection.")
         
     @step
-    def ask(self, ev: AskEvent) -> StopEvent:
-        response = self.weaviate_agent.ask(ev.query)
+    async def ask(self, ev: AskEvent, ctx: Context) -> StopEvent:
+        response = await stream_answer(ctx, self.weaviate_agent, ev.query)
         return StopEvent(response.final_answer)
     
     @step
-    def search(self, ev: SearchEvent) -> StopEvent:
-        results = self.weaviate_agent.search(ev.query)
-        response = self.llm.complete(
-            f"""Here's the list of items for the the query '{ev.query}':
-            {results.search_results.objects}. Return them as a readable list for the user.
+    def stats(self, ev: StatsEvent) -> StopEvent | AskEvent:
+        # Counts and price figures come from the cached aggregate summary;
+        # questions it can't parse still go to the QueryAgent.
+        answer = self.catalog_stats.answer(ev.query)
+        if answer is None:
+            return AskEvent(query=ev.query)
+        return StopEvent(answer)
+
+    @step
+    async def search(self, ev: SearchEvent, ctx: Context) -> StopEvent:
+        results = await asyncio.to_thread(self.weaviate_agent.search, ev.query)
+        # Only the properties worth showing, as TSV, within a fixed token budget.
+        items = project_results(results.search_results.objects)
+        response = await stream_completion(
+            ctx,
+            self.llm,
+            f"""Here's the list of items for the the query '{ev.query}', one per line:
+{items}
+Return them as a readable list for the user.
             """
         )
         return StopEvent(response)
 
 
-async def main():
-    with weaviate.connect_to_weaviate_cloud(
+def connect_agent() -> ECommerceAdminAgent:
+    import weaviate
+    from weaviate.auth import AuthApiKey
+
+    client = weaviate.connect_to_weaviate_cloud(
         cluster_url=os.getenv("WEAVIATE_URL"),
         auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY")),
-    ) as client:
-        agent = ECommerceAdminAgent(client=client, verbose=True)
+    )
+    return ECommerceAdminAgent(client=client, verbose=True)
+
+
+async def main():
+    registry = enable_tracing()
+    # Connected in the background while the first query is typed.
+    agent = Lazy(connect_agent, "e-commerce admin agent")
+    agent.warm()
+    streamed = False
+
+    def show_tokens(event):
+        nonlocal streamed
+        if isinstance(event, TokenEvent):
+            print(event.delta, end="", flush=True)
+            streamed = True
+
+    runs = None
+    try:
         while True:
             user_input = input("Enter your query: ")
             if user_input.lower() == "exit":
+                print(registry.report())
                 break
-            handler = agent.run(query=user_input)
-            async for event in handler.stream_events():
-                if isinstance(event, InputRequiredEvent):
-                    response = input(event.confirmation)
-                    handler.ctx.send_event(HumanResponseEvent(response=response))
-
-            final_result = await handler
-            print(final_result)
+            if runs is None:
+                # Runs waiting for a confirmation are saved to SQLite and dropped from
+                # memory; any process sharing the database can resume them.
+                runs = DurableRuns(await agent.aget(), SQLiteContextStore(), on_event=show_tokens, metrics=registry)
+            streamed = False
+            outcome = await runs.start(query=user_input)
+            while outcome.paused:
+                outcome = await runs.resume(outcome.run_id, input(outcome.prompt))
+
+            # Ask/Search answers were already printed token by token.
+            if streamed:
+                print()
+            else:
+                print(outcome.result)
+    finally:
+        if agent.ready:
+            agent.get().client.close()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
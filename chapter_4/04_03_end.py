@@ -1,20 +1,27 @@
-from llama_index.tools.mcp.utils import workflow_as_mcp
 import asyncio
 import inspect
 import os
+import sys
+from pathlib import Path
 
 asyncio.iscoroutinefunction = inspect.iscoroutinefunction
 
 from dotenv import load_dotenv
 from pydantic import BaseModel
-import weaviate
-from weaviate.auth import AuthApiKey
-from weaviate.agents.query import QueryAgent
-from llama_index.core.memory import Memory
-from llama_index.llms.openai import OpenAI
 from workflows import Context, Workflow, step
 from workflows.events import Event, StartEvent, StopEvent
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from shared.catalog_stats import CatalogStats
+from shared.mcp_serving import MCP_WORKERS, AdmissionController, SingleFlight, bounded_workflow_as_mcp, serve_workers
+from shared.projection import project_results
+from shared.result_cache import ResultCache
+from shared.router import ASK_ROUTE, SEARCH_ROUTE, STATS_ROUTE, QueryRouter
+from shared.shared_cache import SharedCache
+from shared.startup import Lazy
+from shared.streaming import stream_answer, stream_completion
+from shared.tracing import HistogramRegistry, enable_tracing, trace_calls
+
 load_dotenv()
 
 class QueryEvent(StartEvent):
@@ -26,47 +33,100 @@ class AskEvent(Event):
 class SearchEvent(Event):
     query: str
 
+class StatsEvent(Event):
+    query: str
+
 class ECommerceAgent(Workflow):
-    def __init__(self, client, *args, **kwargs):
+    def __init__(self, client, *args, shared_cache: SharedCache | None = None, **kwargs):
+        # Imported here rather than at the top: they take seconds, and the server listens without them.
+        from llama_index.llms.openai import OpenAI
+        from weaviate.agents.query import QueryAgent
+
         super().__init__(*args, **kwargs)
         self.llm = OpenAI(model="gpt-5")
-        self.weaviate_agent = QueryAgent(client=client, collections=["ECommerce"])
+        # Routing decisions and search results are shared by every worker process.
+        self.shared_cache = shared_cache or SharedCache()
+        self.router = QueryRouter([ASK_ROUTE, SEARCH_ROUTE, STATS_ROUTE], llm=self.llm, shared_cache=self.shared_cache)
+        self.weaviate_agent = trace_calls(QueryAgent(client=client, collections=["ECommerce"]), "ask_stream", "search")
+        # Identical searches are answered from memory until the collection changes. The
+        # projected items are cached rather than the QueryAgent response: only JSON is shared.
+        self.result_cache = ResultCache(shared=self.shared_cache)
+        self.result_cache.wrap(self, "ECommerce", "search_items")
+        self.catalog_stats = CatalogStats(client.collections.get("ECommerce"))
     @step
-    def start(self, ev: QueryEvent) -> AskEvent | SearchEvent:
-        response = self.llm.complete(
-            f"""Given the query '{ev.query}', return the relevant category of the query. 
-            If the query is a question that can be answered in natural language, return 'Ask'.
-            If the query is a question that can be answered by searching the database and retyrning a list of objects, return 'Search'.            """
-        )
-        if response.text == "Ask":
+    def start(self, ev: QueryEvent) -> AskEvent | SearchEvent | StatsEvent:
+        decision = self.router.route(ev.query)
+        if decision.label == "Ask":
             return AskEvent(query=ev.query)
-        elif response.text == "Search":
+        elif decision.label == "Stats":
+            return StatsEvent(query=ev.query)
+        else:
             return SearchEvent(query=ev.query)
 
     @step
-    def ask(self, ev: AskEvent) -> StopEvent:
-        response = self.weaviate_agent.ask(ev.query)
+    async def ask(self, ev: AskEvent, ctx: Context) -> StopEvent:
+        response = await stream_answer(ctx, self.weaviate_agent, ev.query)
         return StopEvent(response.final_answer)
     
     @step
-    def search(self, ev: SearchEvent) -> StopEvent:
-        results = self.weaviate_agent.search(ev.query)
-        response = self.llm.complete(
-            f"""Here's the list of items for the the query '{ev.query}':
-            {results.search_results.objects}. Return them as a readable list for the user.
+    def stats(self, ev: StatsEvent) -> StopEvent | AskEvent:
+        # Counts and price figures come from the cached aggregate summary;
+        # questions it can't parse still go to the QueryAgent.
+        answer = self.catalog_stats.answer(ev.query)
+        if answer is None:
+            return AskEvent(query=ev.query)
+        return StopEvent(answer)
+
+    def search_items(self, query: str) -> str:
+        results = self.weaviate_agent.search(query)
+        # Only the properties worth showing, as TSV, within a fixed token budget.
+        return project_results(results.search_results.objects)
+
+    @step
+    async def search(self, ev: SearchEvent, ctx: Context) -> StopEvent:
+        items = await asyncio.to_thread(self.search_items, ev.query)
+        response = await stream_completion(
+            ctx,
+            self.llm,
+            f"""Here's the list of items for the the query '{ev.query}', one per line:
+{items}
+Return them as a readable list for the user.
             """
         )
         return StopEvent(response)
 
-# Create MCP server as a global variable
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=os.getenv("WEAVIATE_URL"),
-    auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY")))
-agent = ECommerceAgent(client=client)
-mcp = workflow_as_mcp(agent, 
-                      start_event_model=QueryEvent, 
-                      workflow_name="e-commerce-tool", 
-                      workflow_description="Useful to answer questions about e-commerce products (clothing items, prices etc).")
+# TRACING=1 exports spans for every step, LLM and QueryAgent call to traces/spans.<pid>.jsonl.
+registry = enable_tracing() if os.getenv("TRACING") == "1" else HistogramRegistry()
+
+def connect_agent() -> ECommerceAgent:
+    import weaviate
+    from weaviate.auth import AuthApiKey
+
+    client = weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.getenv("WEAVIATE_URL"),
+        auth_credentials=AuthApiKey(os.getenv("WEAVIATE_API_KEY")))
+    return ECommerceAgent(client=client, shared_cache=shared_cache)
+
+# Create MCP server as a global variable. It listens right away; the agent is
+# built in the background once it does (or by the first call), see GET /status.
+# Routing decisions and search results are shared by every worker process.
+shared_cache = SharedCache()
+agent = Lazy(connect_agent, "e-commerce agent")
+# At most MCP_MAX_CONCURRENT runs at once, MCP_MAX_QUEUE waiting, MCP_DEADLINE seconds each;
+# bursts beyond that get a fast "busy" error. Gauges on GET /status.
+admission = AdmissionController(metrics=registry)
+mcp = bounded_workflow_as_mcp(agent,
+                              admission,
+                              # Identical questions asked at the same time share one run.
+                              single_flight=SingleFlight(),
+                              shared_cache=shared_cache,
+                              start_event_model=QueryEvent,
+                              workflow_name="e-commerce-tool",
+                              workflow_description="Useful to answer questions about e-commerce products (clothing items, prices etc).")
 
 if __name__ == "__main__":
-    mcp.run(transport="streamable-http")
+    # MCP_WORKERS=4 serves from four processes on the same port (SIGHUP restarts them one at a time).
+    if MCP_WORKERS > 1:
+        serve_workers(__file__, "mcp")
+    else:
+        mcp.run(transport="streamable-http")
@@ -0,0 +1,7 @@
+"""
+Helpers shared by the lesson scripts.
+
+The lesson scripts live in per-chapter folders and are run directly
+(e.g. `python chapter_1/01_02_end.py`), so each script that needs these
+helpers adds the repository root to `sys.path` before importing them.
+"""
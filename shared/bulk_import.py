@@ -0,0 +1,272 @@
+"""
+Resumable, concurrent bulk import into a Weaviate collection.
+
+`bulk_import` sends `collection.data.insert_many` requests from `concurrency`
+workers and:
+  - adapts the batch size to the observed request latency (AdaptiveBatchSize)
+  - re-queues objects that failed, individually or as a whole batch, with
+    jittered exponential backoff
+  - records in a checkpoint file the offset below which every row is done,
+    and the rows that failed for good, so an interrupted import resumes there
+    instead of starting over, and a rerun retries the failed rows
+Objects get deterministic UUIDs (see `object_uuid`), so rows sent again after
+a resume overwrite themselves instead of creating duplicates, and carry a
+`content_hash` property that `shared/catalog_sync.py` diffs against.
+
+Run `python -m shared.bulk_import` for a demo against the offline FakeCollection.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from weaviate.classes.data import DataObject
+from weaviate.util import generate_uuid5
+
+
+@dataclass
+class ImportStats:
+    imported: int = 0
+    resumed_from: int = 0
+    requests: int = 0
+    retries: int = 0
+    failed: list[tuple[int, str]] = field(default_factory=list)  # (row offset, last error)
+    batch_size: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def objects_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+    def report(self) -> str:
+        resumed = f", resumed at row {self.resumed_from}" if self.resumed_from else ""
+        return (
+            f"{self.imported} objects imported in {self.seconds:.2f}s "
+            f"({self.objects_per_second:.1f} objects/sec, {self.requests} requests, {self.retries} retries, "
+            f"{len(self.failed)} failed, final batch size {self.batch_size}{resumed})"
+        )
+
+
+class AdaptiveBatchSize:
+    """
+    Batch size that grows by a quarter while requests finish in under half of
+    `target_latency`, and halves when a request is slower than that or fails.
+    """
+
+    def __init__(self, initial: int = 100, minimum: int = 10, maximum: int = 1000, target_latency: float = 2.0):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+
+    def record(self, latency: float, ok: bool = True):
+        if not ok or latency > self.target_latency:
+            self.size = max(self.minimum, self.size // 2)
+        elif latency < self.target_latency / 2:
+            self.size = min(self.maximum, self.size + max(1, self.size // 4))
+
+
+def content_hash(properties: dict) -> str:
+    """Stable hash of an object's properties (ignoring a stored `content_hash`)."""
+    content = {key: value for key, value in properties.items() if key != "content_hash"}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def object_uuid(properties: dict) -> str:
+    """UUID derived from `product_id` when the item has one, otherwise from its content."""
+    if properties.get("product_id"):
+        return generate_uuid5(str(properties["product_id"]))
+    return generate_uuid5(content_hash(properties))
+
+
+def to_data_object(properties: dict) -> DataObject:
+    """The object to write for `properties`, with its deterministic UUID and content hash."""
+    return DataObject(properties={**properties, "content_hash": content_hash(properties)}, uuid=object_uuid(properties))
+
+
+def _read_checkpoint(path: str, collection_name: str) -> tuple[int, set[int]]:
+    """(offset to resume at, offsets of earlier rows that failed) from the checkpoint file."""
+    try:
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0, set()
+    if checkpoint.get("collection") != collection_name:
+        return 0, set()
+    return checkpoint["next_offset"], set(checkpoint.get("failed", []))
+
+
+def _write_checkpoint(path: str, collection_name: str, next_offset: int, failed: set[int]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"collection": collection_name, "next_offset": next_offset, "failed": sorted(failed)}, f)
+    os.replace(tmp_path, path)
+
+
+async def bulk_import(
+    collection,
+    rows: Iterable[dict],
+    checkpoint_path: str | None = None,
+    concurrency: int = 4,
+    batch_size: AdaptiveBatchSize | None = None,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0,
+) -> ImportStats:
+    """
+    Import `rows` (property dicts, consumed lazily) into `collection`.
+
+    With a `checkpoint_path`, rows before the checkpointed offset are skipped,
+    except those that failed in an earlier run, which are sent again. Objects
+    still failing after `max_retries` attempts are listed in
+    `ImportStats.failed` and kept in the checkpoint; it is removed once an
+    import finishes without failures.
+    """
+    sizer = batch_size or AdaptiveBatchSize()
+    start, failed = _read_checkpoint(checkpoint_path, collection.name) if checkpoint_path else (0, set())
+    stats = ImportStats(resumed_from=start)
+    # `failed` holds the offsets that aren't imported yet and won't be retried in this run.
+    retry_offsets = set(failed)
+    source = ((offset, row) for offset, row in enumerate(rows) if offset >= start or offset in retry_offsets)
+    read_offset = start  # offset of the next row to read from `source`
+    exhausted = False
+    retry_heap: list[tuple[float, int, dict, int]] = []  # (ready_at, offset, properties, attempts)
+    in_flight: set[int] = set()  # offsets read but not yet imported or given up on
+    checkpointed = start
+
+    def take_batch() -> list[tuple[int, dict, int]]:
+        nonlocal read_offset, exhausted
+        batch = []
+        now = time.monotonic()
+        while retry_heap and retry_heap[0][0] <= now and len(batch) < sizer.size:
+            _, offset, properties, attempts = heapq.heappop(retry_heap)
+            batch.append((offset, properties, attempts))
+        while not exhausted and len(batch) < sizer.size:
+            try:
+                offset, properties = next(source)
+            except StopIteration:
+                exhausted = True
+                break
+            read_offset = offset + 1
+            in_flight.add(offset)
+            batch.append((offset, properties, 0))
+        return batch
+
+    def save_checkpoint(failures_changed: bool = False):
+        nonlocal checkpointed
+        # Every row below the smallest unfinished offset is done or listed as failed.
+        watermark = min(in_flight) if in_flight else read_offset
+        if checkpoint_path and (watermark > checkpointed or failures_changed):
+            checkpointed = max(watermark, checkpointed)
+            _write_checkpoint(checkpoint_path, collection.name, checkpointed, failed)
+
+    async def send(batch: list[tuple[int, dict, int]]) -> dict[int, str]:
+        objects = [to_data_object(properties) for _, properties, _ in batch]
+        started = time.perf_counter()
+        stats.requests += 1
+        try:
+            result = await asyncio.to_thread(collection.data.insert_many, objects)
+        except Exception as e:
+            sizer.record(time.perf_counter() - started, ok=False)
+            return {i: f"{type(e).__name__}: {e}" for i in range(len(batch))}
+        sizer.record(time.perf_counter() - started)
+        return {i: error.message for i, error in result.errors.items()}
+
+    async def worker():
+        while True:
+            batch = take_batch()
+            if not batch:
+                if exhausted and not retry_heap and not in_flight:
+                    return
+                # Wait for another worker's batch, or for the next retry to be due.
+                wait = retry_heap[0][0] - time.monotonic() if retry_heap else 0.05
+                await asyncio.sleep(min(max(wait, 0.0), 0.05))
+                continue
+
+            errors = await send(batch)
+            failures_changed = False
+            for i, (offset, properties, attempts) in enumerate(batch):
+                if i not in errors:
+                    stats.imported += 1
+                    if offset in failed:
+                        failed.discard(offset)
+                        failures_changed = True
+                elif attempts < max_retries:
+                    stats.retries += 1
+                    delay = min(max_delay, base_delay * 2**attempts) * random.uniform(0.5, 1.5)
+                    heapq.heappush(retry_heap, (time.monotonic() + delay, offset, properties, attempts + 1))
+                    continue
+                else:
+                    stats.failed.append((offset, errors[i]))
+                    failed.add(offset)
+                    failures_changed = True
+                in_flight.discard(offset)
+            save_checkpoint(failures_changed)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        stats.finished_at = time.perf_counter()
+        stats.batch_size = sizer.size
+    if checkpoint_path:
+        if failed:
+            # Keep the failed rows for the next run to retry.
+            _write_checkpoint(checkpoint_path, collection.name, max(read_offset, checkpointed), failed)
+        elif os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+    return stats
+
+
+async def _demo():
+    import tempfile
+
+    from benchmarks.fakes import FakeCollection, fake_catalog
+
+    rows = [row["properties"] for row in fake_catalog(5000)]
+    for concurrency in (1, 4, 16):
+        collection = FakeCollection("ECommerce", latency=0.02, per_object_latency=0.0002, object_error_rate=0.01)
+        stats = await bulk_import(collection, rows, concurrency=concurrency, base_delay=0.01)
+        print(f"concurrency={concurrency:>2}: {stats.report()}")
+
+    # Interrupt an import halfway through, then resume it from the checkpoint.
+    def interrupted(rows):
+        for i, row in enumerate(rows):
+            if i == 2500:
+                raise ConnectionError("connection lost (simulated)")
+            yield row
+
+    checkpoint_path = os.path.join(tempfile.mkdtemp(), "checkpoint.json")
+    collection = FakeCollection("ECommerce", latency=0.02, per_object_latency=0.0002)
+    try:
+        await bulk_import(collection, interrupted(rows), checkpoint_path=checkpoint_path, concurrency=4)
+    except ConnectionError:
+        print(f"interrupted with {len(collection)} objects imported")
+    stats = await bulk_import(collection, rows, checkpoint_path=checkpoint_path, concurrency=4)
+    print(f"resumed: {stats.report()}, {len(collection)} objects in the collection")
+
+    # Rows that still fail after the retries stay in the checkpoint; the next run sends only those.
+    collection = FakeCollection("ECommerce", latency=0.02, per_object_latency=0.0002, object_error_rate=0.05)
+    stats = await bulk_import(collection, rows, checkpoint_path=checkpoint_path, concurrency=4, max_retries=0)
+    print(f"with failures: {stats.report()}")
+    collection.object_error_rate = 0.0
+    stats = await bulk_import(collection, rows, checkpoint_path=checkpoint_path, concurrency=4)
+    print(f"rerun: {stats.report()}, {len(collection)} objects in the collection, checkpoint kept: {os.path.exists(checkpoint_path)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
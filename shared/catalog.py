@@ -0,0 +1,167 @@
+"""
+Shared, indexed loader for the new-items catalog (new_clothing_items.json).
+
+`get_catalog(path)` returns one `Catalog` per file for the whole process, so
+agents no longer parse their own copy. The file is parsed one item at a time
+(large staging files are never held as one string) and items are indexed by
+`product_id`, name, `collection` and category. Reads check the file's mtime
+(at most every `check_interval` seconds) and reload it when it changed, so
+edits show up without restarting the agent.
+
+    catalog = get_catalog("new_clothing_items.json")
+    catalog.in_collection("Cottagecore")  # -> [1, 8]
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterator
+
+
+_SEPARATOR = re.compile(r"[\s,]*")
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[dict]:
+    """Yield the elements of the JSON array in `path`, reading `chunk_size` characters at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array")
+        position = 1
+        eof = False
+        while True:
+            position = _SEPARATOR.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The next element isn't complete yet: read more of the file.
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield item
+
+
+def _key(value) -> str:
+    return " ".join(str(value).lower().split())
+
+
+@dataclass
+class _Snapshot:
+    items: list[dict] = field(default_factory=list)
+    by_product_id: dict[str, int] = field(default_factory=dict)
+    by_name: dict[str, int] = field(default_factory=dict)
+    by_collection: dict[str, list[int]] = field(default_factory=dict)
+    by_category: dict[str, list[int]] = field(default_factory=dict)
+    mtime_ns: int = -1
+    size: int = -1
+
+
+class Catalog:
+    """
+    Items of a JSON array file, addressable by position and indexed by
+    product_id, name, collection and category (case-insensitive).
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.version = 0
+        self._snapshot = _Snapshot()
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh(force=True)
+
+    def _load(self, stat: os.stat_result) -> _Snapshot:
+        snapshot = _Snapshot(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        for i, item in enumerate(iter_json_array(self.path)):
+            properties = item.get("properties", item)
+            snapshot.items.append(item)
+            if properties.get("product_id"):
+                snapshot.by_product_id[str(properties["product_id"])] = i
+            if properties.get("name"):
+                snapshot.by_name.setdefault(_key(properties["name"]), i)
+            if properties.get("collection"):
+                snapshot.by_collection.setdefault(_key(properties["collection"]), []).append(i)
+            if properties.get("category"):
+                snapshot.by_category.setdefault(_key(properties["category"]), []).append(i)
+        return snapshot
+
+    def _refresh(self, force: bool = False) -> _Snapshot:
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            stat = os.stat(self.path)
+            current = self._snapshot
+            if (stat.st_mtime_ns, stat.st_size) != (current.mtime_ns, current.size):
+                # Readers keep using the old snapshot until the new one is complete.
+                self._snapshot = self._load(stat)
+                self.version += 1
+            return self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._refresh().items)
+
+    def __getitem__(self, index: int) -> dict:
+        return self._refresh().items[index]
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._refresh().items)
+
+    def properties(self, index: int) -> dict:
+        item = self[index]
+        return item.get("properties", item)
+
+    def find(self, product_id: str | None = None, name: str | None = None) -> int | None:
+        snapshot = self._refresh()
+        if product_id is not None:
+            return snapshot.by_product_id.get(str(product_id))
+        if name is not None:
+            return snapshot.by_name.get(_key(name))
+        return None
+
+    def in_collection(self, collection: str) -> list[int]:
+        return list(self._refresh().by_collection.get(_key(collection), []))
+
+    def in_category(self, category: str) -> list[int]:
+        return list(self._refresh().by_category.get(_key(category), []))
+
+    @property
+    def collections(self) -> list[str]:
+        return list(self._refresh().by_collection)
+
+    @property
+    def categories(self) -> list[str]:
+        return list(self._refresh().by_category)
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._refresh().by_name)
+
+    @property
+    def product_ids(self) -> list[str]:
+        return list(self._refresh().by_product_id)
+
+
+_catalogs: dict[str, Catalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(path: str = "new_clothing_items.json") -> Catalog:
+    """The process-wide Catalog for `path`, loaded on first use."""
+    key = os.path.abspath(path)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = Catalog(key)
+        return _catalogs[key]
@@ -0,0 +1,194 @@
+"""
+Cached catalog statistics for aggregation questions.
+
+"How many items are in Footwear, and what is the average price?" needs neither
+retrieval nor an LLM. One grouped aggregate query returns, for every category:
+  - the item count
+  - the average, minimum and maximum price
+  - the most common colors and tags
+`CatalogStats` keeps that summary in memory. It is marked stale whenever the
+collection is written to through an object passed to `watch_writes`, and is
+refreshed on the next read. `answer()` replies to the common aggregation
+questions from the summary, about categories or the whole catalog, and
+returns None for anything else (a question about "red sneakers" or a brand
+is not answered with catalog-wide figures).
+
+    stats = CatalogStats(client.collections.get("ECommerce"))
+    stats.answer("What is the average price of handbags?")
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field
+
+# Which figures a question asks for, keyed by the name used in `answer`.
+_INTENTS = {
+    "count": re.compile(r"\b(how many|number of|count)\b", re.IGNORECASE),
+    "average": re.compile(r"\b(average|avg|mean)\b", re.IGNORECASE),
+    "range": re.compile(r"\b(price range|(lowest|highest|minimum|maximum|min|max) price)\b", re.IGNORECASE),
+    "colors": re.compile(r"\b(colou?rs?)\b", re.IGNORECASE),
+    "tags": re.compile(r"\b(tags?|tagged)\b", re.IGNORECASE),
+}
+# Counts and averages are only about items and prices ("how many reviews..." is not).
+_ITEMS = re.compile(r"\b(items?|products?|pieces?|things)\b", re.IGNORECASE)
+_PRICES = re.compile(r"\b(price[sd]?|cost[s]?)\b", re.IGNORECASE)
+# Without a category, only questions about the whole catalog get catalog-wide figures:
+# "the price range for jackets" (not a category) must not be answered for everything.
+_WHOLE_CATALOG = re.compile(
+    r"\b(catalog(ue)?|collection|inventory|store|shop|overall|in total|altogether|(all|every) (the )?(items?|products?))\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class CategorySummary:
+    category: str
+    count: int
+    avg_price: float | None = None
+    min_price: float | None = None
+    max_price: float | None = None
+    colors: list[tuple[str, int]] = field(default_factory=list)  # most common first
+    tags: list[tuple[str, int]] = field(default_factory=list)
+
+
+def _top(metric) -> list[tuple[str, int]]:
+    return [(occurrence.value, occurrence.count) for occurrence in getattr(metric, "top_occurrences", None) or []]
+
+
+def _combine(summaries: list[CategorySummary], category: str) -> CategorySummary:
+    """Roll several category summaries up into one (counts are exact, top values approximate)."""
+    priced = [s for s in summaries if s.avg_price is not None]
+    total = sum(s.count for s in priced)
+
+    def merge(pairs: list[tuple[str, int]]) -> list[tuple[str, int]]:
+        counts: dict[str, int] = {}
+        for value, count in pairs:
+            counts[value] = counts.get(value, 0) + count
+        return sorted(counts.items(), key=lambda item: -item[1])
+
+    return CategorySummary(
+        category=category,
+        count=sum(s.count for s in summaries),
+        avg_price=sum(s.avg_price * s.count for s in priced) / total if total else None,
+        min_price=min((s.min_price for s in priced), default=None),
+        max_price=max((s.max_price for s in priced), default=None),
+        colors=merge([pair for s in summaries for pair in s.colors]),
+        tags=merge([pair for s in summaries for pair in s.tags]),
+    )
+
+
+class CatalogStats:
+    """Per-category summary of a collection, refreshed lazily after writes."""
+
+    def __init__(self, collection, top_values: int = 5):
+        self.collection = collection
+        self.top_values = top_values
+        self.refreshes = 0
+        self._summary: dict[str, CategorySummary] | None = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._summary = None
+
+    def _fetch(self) -> dict[str, CategorySummary]:
+        from weaviate.classes.aggregate import GroupByAggregate, Metrics
+
+        result = self.collection.aggregate.over_all(
+            group_by=GroupByAggregate(prop="category", limit=1000),
+            total_count=True,
+            return_metrics=[
+                Metrics("price").number(count=True, mean=True, minimum=True, maximum=True),
+                Metrics("colors").text(top_occurrences_count=True, top_occurrences_value=True, limit=self.top_values),
+                Metrics("tags").text(top_occurrences_count=True, top_occurrences_value=True, limit=self.top_values),
+            ],
+        )
+        summary = {}
+        for group in result.groups:
+            category = str(group.grouped_by.value)
+            price = group.properties.get("price")
+            summary[category] = CategorySummary(
+                category=category,
+                count=group.total_count or 0,
+                avg_price=getattr(price, "mean", None),
+                min_price=getattr(price, "minimum", None),
+                max_price=getattr(price, "maximum", None),
+                colors=_top(group.properties.get("colors")),
+                tags=_top(group.properties.get("tags")),
+            )
+        return summary
+
+    def summary(self) -> dict[str, CategorySummary]:
+        with self._lock:
+            if self._summary is None:
+                self._summary = self._fetch()
+                self.refreshes += 1
+            return self._summary
+
+    def total_count(self) -> int:
+        return sum(s.count for s in self.summary().values())
+
+    def watch_writes(self, data, methods=("insert", "insert_many", "replace", "update", "delete_by_id", "delete_many")):
+        """
+        Wrap the write methods of `collection.data` (the object the writes go
+        through) so every write marks the summary stale. Returns `data`.
+        """
+        for name in methods:
+            method = getattr(data, name, None)
+            if method is None:
+                continue
+
+            def write(*args, _method=method, **kwargs):
+                try:
+                    return _method(*args, **kwargs)
+                finally:
+                    self.invalidate()
+
+            setattr(data, name, write)
+        return data
+
+    def _find_categories(self, query: str, summary: dict[str, CategorySummary]) -> list[str]:
+        text = query.lower()
+        found = []
+        for category in summary:
+            name = category.lower()
+            # Singular or plural: "handbag" and "handbags" both match "Handbags".
+            if re.search(rf"\b{re.escape(name.rstrip('s'))}s?\b", text):
+                found.append(category)
+        return found
+
+    def answer(self, query: str) -> str | None:
+        """Answer an aggregation question from the summary, or None if it isn't one."""
+        intents = [name for name, pattern in _INTENTS.items() if pattern.search(query)]
+        if not intents:
+            return None
+        summary = self.summary()
+        categories = self._find_categories(query, summary)
+        if "count" in intents and not (categories or _ITEMS.search(query)):
+            intents.remove("count")
+        if "average" in intents and not _PRICES.search(query):
+            intents.remove("average")
+        if categories:
+            stats = _combine([summary[c] for c in categories], " and ".join(categories))
+            scope = f"in the {stats.category} {'category' if len(categories) == 1 else 'categories'}"
+        elif not _WHOLE_CATALOG.search(query):
+            return None  # about something narrower than the catalog that isn't a category
+        else:
+            stats = _combine(list(summary.values()), "catalog")
+            scope = "in the catalog"
+
+        parts = []
+        if "count" in intents:
+            parts.append(f"there are {stats.count} items")
+        if "average" in intents and stats.avg_price is not None:
+            parts.append(f"the average price is ${stats.avg_price:.2f}")
+        if "range" in intents and stats.min_price is not None:
+            parts.append(f"prices range from ${stats.min_price:.2f} to ${stats.max_price:.2f}")
+        if "colors" in intents and stats.colors:
+            parts.append("the most common colors are " + ", ".join(value for value, _ in stats.colors[:self.top_values]))
+        if "tags" in intents and stats.tags:
+            parts.append("the most common tags are " + ", ".join(value for value, _ in stats.tags[:self.top_values]))
+        if not parts:
+            return None
+        sentence = f"{scope}, " + ", and ".join(parts)
+        return sentence[0].upper() + sentence[1:] + "."
@@ -0,0 +1,216 @@
+"""
+Durable human-in-the-loop runs.
+
+A workflow waiting on a `HumanResponseEvent` normally keeps its handler, its
+context and a worker busy until the human answers. `DurableRuns` instead:
+  1. runs the workflow until it emits an `InputRequiredEvent`
+  2. snapshots the context (`ctx.to_dict()`), saves it in a ContextStore under
+     a run id, and cancels the in-process handler
+  3. on `resume(run_id, response)` claims the snapshot (in any process that
+     shares the store), restores the context and sends the response; a run
+     is claimed once, so a second resume of the same id fails instead of
+     replaying the step
+Paused runs nobody resumes expire after the store's `ttl`.
+Pause and resume latencies are recorded in a HistogramRegistry.
+
+    runs = DurableRuns(agent, SQLiteContextStore("storage/hitl.db"))
+    outcome = await runs.start(query="Add items 0-7")
+    if outcome.paused:
+        outcome = await runs.resume(outcome.run_id, input(outcome.prompt))
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import aiosqlite
+from workflows import Context, Workflow
+from workflows.errors import WorkflowCancelledByUser
+from workflows.events import Event, HumanResponseEvent, InputRequiredEvent
+
+from shared.tracing import HistogramRegistry
+
+HITL_DB = "storage/hitl.db"
+
+
+class ContextStore(ABC):
+    """Where paused workflow contexts are kept between pause and resume."""
+
+    @abstractmethod
+    async def save(self, run_id: str, workflow: str, data: dict): ...
+
+    @abstractmethod
+    async def claim(self, run_id: str) -> dict | None:
+        """Remove and return the snapshot; None if it doesn't exist, expired or was claimed already."""
+
+    @abstractmethod
+    async def delete(self, run_id: str): ...
+
+    @abstractmethod
+    async def expire(self) -> int:
+        """Drop the runs paused longer than `ttl` ago; returns how many."""
+
+
+class InMemoryContextStore(ContextStore):
+    """Single-process store, mostly for tests and demos."""
+
+    def __init__(self, ttl: float | None = 24 * 3600):
+        self.ttl = ttl
+        self._runs: dict[str, tuple[float, str]] = {}
+
+    async def save(self, run_id: str, workflow: str, data: dict):
+        await self.expire()
+        self._runs[run_id] = (time.time(), json.dumps(data))
+
+    async def claim(self, run_id: str) -> dict | None:
+        await self.expire()
+        run = self._runs.pop(run_id, None)
+        return json.loads(run[1]) if run is not None else None
+
+    async def delete(self, run_id: str):
+        self._runs.pop(run_id, None)
+
+    async def expire(self) -> int:
+        if self.ttl is None:
+            return 0
+        oldest = time.time() - self.ttl
+        expired = [run_id for run_id, (paused_at, _) in self._runs.items() if paused_at < oldest]
+        for run_id in expired:
+            del self._runs[run_id]
+        return len(expired)
+
+
+class SQLiteContextStore(ContextStore):
+    """Paused contexts in a SQLite file, shared by every process that opens it."""
+
+    def __init__(self, path: str | None = None, ttl: float | None = 24 * 3600):
+        # $HITL_DB is read here rather than at import, so it can be pointed elsewhere after import.
+        path = path or os.getenv("HITL_DB", HITL_DB)
+        self.path = path
+        self.ttl = ttl
+        self._initialized = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @asynccontextmanager
+    async def _connect(self):
+        async with aiosqlite.connect(self.path) as db:
+            if not self._initialized:
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute(
+                    "CREATE TABLE IF NOT EXISTS paused_runs ("
+                    "run_id TEXT PRIMARY KEY, workflow TEXT NOT NULL, data TEXT NOT NULL, paused_at REAL NOT NULL)"
+                )
+                await db.execute("CREATE INDEX IF NOT EXISTS paused_runs_paused_at ON paused_runs (paused_at)")
+                await db.commit()
+                self._initialized = True
+            yield db
+
+    def _oldest(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    async def save(self, run_id: str, workflow: str, data: dict):
+        async with self._connect() as db:
+            # Pausing is rare enough to sweep expired runs every time.
+            await db.execute("DELETE FROM paused_runs WHERE paused_at < ?", (self._oldest(),))
+            await db.execute(
+                "INSERT OR REPLACE INTO paused_runs (run_id, workflow, data, paused_at) VALUES (?, ?, ?, ?)",
+                (run_id, workflow, json.dumps(data), time.time()),
+            )
+            await db.commit()
+
+    async def claim(self, run_id: str) -> dict | None:
+        async with self._connect() as db:
+            query = "SELECT data FROM paused_runs WHERE run_id = ? AND paused_at >= ?"
+            async with db.execute(query, (run_id, self._oldest())) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            # Concurrent claims may both read the row; only the one whose DELETE removes it owns the run.
+            cursor = await db.execute("DELETE FROM paused_runs WHERE run_id = ?", (run_id,))
+            await db.commit()
+        return json.loads(row[0]) if cursor.rowcount == 1 else None
+
+    async def delete(self, run_id: str):
+        async with self._connect() as db:
+            await db.execute("DELETE FROM paused_runs WHERE run_id = ?", (run_id,))
+            await db.commit()
+
+    async def expire(self) -> int:
+        async with self._connect() as db:
+            cursor = await db.execute("DELETE FROM paused_runs WHERE paused_at < ?", (self._oldest(),))
+            await db.commit()
+        return cursor.rowcount
+
+
+@dataclass
+class RunOutcome:
+    run_id: str
+    result: Any = None
+    prompt: str | None = None  # set when the run paused for human input
+
+    @property
+    def paused(self) -> bool:
+        return self.prompt is not None
+
+
+class DurableRuns:
+    """
+    Start and resume runs of `workflow`, parking them in `store` whenever they
+    wait for human input. `on_event` receives every other streamed event (e.g.
+    TokenEvents). Latencies are recorded as "hitl.pause" and "hitl.resume".
+    """
+
+    def __init__(
+        self,
+        workflow: Workflow,
+        store: ContextStore,
+        on_event: Callable[[Event], None] | None = None,
+        metrics: HistogramRegistry | None = None,
+    ):
+        self.workflow = workflow
+        self.store = store
+        self.on_event = on_event
+        self.metrics = metrics or HistogramRegistry()
+
+    async def _drive(self, run_id: str, handler) -> RunOutcome:
+        async for event in handler.stream_events():
+            if isinstance(event, InputRequiredEvent):
+                started = time.perf_counter()
+                data = handler.ctx.to_dict()
+                await self.store.save(run_id, type(self.workflow).__name__, data)
+                # The snapshot is safe; free the worker instead of waiting for the human.
+                await handler.cancel_run()
+                try:
+                    await handler
+                except (WorkflowCancelledByUser, asyncio.CancelledError):
+                    pass
+                self.metrics.observe("hitl.pause", time.perf_counter() - started)
+                prompt = getattr(event, "confirmation", None) or "Input required: "
+                return RunOutcome(run_id=run_id, prompt=prompt)
+            if self.on_event is not None:
+                self.on_event(event)
+        result = await handler
+        # Nothing to delete: a resumed run was removed from the store when it was claimed.
+        return RunOutcome(run_id=run_id, result=result)
+
+    async def start(self, **start_kwargs) -> RunOutcome:
+        run_id = uuid.uuid4().hex
+        return await self._drive(run_id, self.workflow.run(**start_kwargs))
+
+    async def resume(self, run_id: str, response: str) -> RunOutcome:
+        started = time.perf_counter()
+        # Claimed, not just read: a second resume of the same run (another worker, a double click) fails here.
+        data = await self.store.claim(run_id)
+        if data is None:
+            raise KeyError(f"No paused run with id {run_id} (it expired or was resumed already)")
+        ctx = Context.from_dict(self.workflow, data)
+        handler = self.workflow.run(ctx=ctx)
+        handler.ctx.send_event(HumanResponseEvent(response=response))
+        self.metrics.observe("hitl.resume", time.perf_counter() - started)
+        return await self._drive(run_id, handler)
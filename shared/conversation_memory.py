@@ -0,0 +1,289 @@
+"""
+Bounded conversation memory for long agent sessions.
+
+Replaying the whole history makes every turn's prompt (and latency) larger
+than the last, until the hard token limit is reached. The helpers here keep it
+near a much smaller target budget instead:
+  - `bounded_memory()` returns a LlamaIndex `Memory` for
+    `FunctionAgent.run(memory=...)`. Messages that overflow the target are
+    flushed to two memory blocks: one keeps the products they mentioned, the
+    other folds them into a short running summary in a background task.
+  - `Conversation` builds the `ChatMessage` list for `QueryAgent.ask`. The
+    latest answer is kept verbatim; older answers are replaced by the
+    products they mentioned, and the oldest turns are dropped when the
+    history is still over budget.
+
+    memory = bounded_memory(target_tokens=2000, llm=llm)
+    response = await agent.run(user_input, memory=memory)
+
+    conversation = Conversation(target_tokens=1500)
+    response = conversation.ask(qa, "Which of those are under $80?")
+
+Run `python -m shared.conversation_memory` to compare prompt sizes over a long
+session against the offline fakes.
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass, field
+
+from llama_index.core.llms import LLM, ChatMessage as LlamaChatMessage
+from llama_index.core.memory import Memory
+from llama_index.core.memory.memory import BaseMemoryBlock
+from pydantic import Field, PrivateAttr
+from weaviate.agents.classes import ChatMessage
+
+from shared.projection import count_tokens
+
+_PRODUCT_ID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+# Product names are runs of two or more capitalized words ("Stellar Mesh Hoodie", "Retro Hoodie 1").
+_PRODUCT_NAME = re.compile(r"\b[A-Z][\w'&-]*(?:[ \t]+[A-Z0-9][\w'&-]*)+")
+_LEADING_WORDS = re.compile(r"^(?:(?:The|A|An|Our|This|These|Those|Some|I|We)\s+)+")
+
+SUMMARY_PROMPT = """Update the summary of an e-commerce support conversation.
+Keep what the user is looking for, their constraints (budget, size, style) and any decisions made.
+Leave out product descriptions. Use at most {max_words} words.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+
+Updated summary:"""
+
+
+def extract_references(text: str) -> list[str]:
+    """Product names and ids mentioned in `text`, in order of appearance."""
+    references = []
+    for match in _PRODUCT_NAME.finditer(_PRODUCT_ID.sub(" ", text)):
+        name = _LEADING_WORDS.sub("", match.group(0)).strip()
+        if " " in name:
+            references.append(name)
+    references.extend(_PRODUCT_ID.findall(text))
+    return list(dict.fromkeys(references))
+
+
+def response_references(response) -> list[str]:
+    """References for a QueryAgent response: returned objects, cited sources and names in the answer."""
+    references = []
+    returned = set()
+    search_results = getattr(response, "search_results", None)
+    for obj in getattr(search_results, "objects", None) or []:
+        properties = getattr(obj, "properties", {}) or {}
+        name, product_id = properties.get("name"), properties.get("product_id")
+        returned.add(str(obj.uuid))
+        if name:
+            references.append(f"{name} ({product_id})" if product_id else name)
+        else:
+            references.append(str(product_id or obj.uuid))
+    for source in getattr(response, "sources", None) or []:
+        if str(source.object_id) not in returned:
+            references.append(str(source.object_id))
+    references.extend(extract_references(getattr(response, "final_answer", "") or ""))
+    return list(dict.fromkeys(r for r in references if r))
+
+
+def _remember(references: list[str], new: list[str], limit: int) -> list[str]:
+    """Append `new` (moving repeats to the end) and keep the `limit` most recent."""
+    merged = [r for r in references if r not in new] + list(dict.fromkeys(new))
+    return merged[-limit:]
+
+
+class ProductReferenceBlock(BaseMemoryBlock[str]):
+    """Memory block that keeps the products mentioned in flushed messages, not the messages."""
+
+    name: str = "products_mentioned"
+    description: str | None = "Products mentioned earlier in the conversation, most recent last."
+    max_references: int = 20
+    references: list[str] = Field(default_factory=list)
+
+    async def _aget(self, messages: list[LlamaChatMessage] | None = None, **block_kwargs) -> str:
+        return ", ".join(self.references)
+
+    async def _aput(self, messages: list[LlamaChatMessage]) -> None:
+        new = [ref for message in messages for ref in extract_references(message.content or "")]
+        self.references = _remember(self.references, new, self.max_references)
+
+
+class SummaryMemoryBlock(BaseMemoryBlock[str]):
+    """
+    Memory block that folds flushed messages into a running summary. The LLM
+    call runs in a background task, so flushing doesn't delay the agent's
+    reply; until it finishes, the previous summary is used.
+    """
+
+    name: str = "conversation_summary"
+    description: str | None = "Summary of the earlier conversation."
+    llm: LLM
+    max_words: int = 120
+    summary: str = ""
+    _pending: asyncio.Task | None = PrivateAttr(default=None)
+
+    async def _aget(self, messages: list[LlamaChatMessage] | None = None, **block_kwargs) -> str:
+        return self.summary
+
+    async def _aput(self, messages: list[LlamaChatMessage]) -> None:
+        transcript = "\n".join(f"{m.role.value}: {m.content}" for m in messages if m.content)
+        if transcript:
+            self._pending = asyncio.create_task(self._summarize(transcript, self._pending))
+
+    async def _summarize(self, transcript: str, previous: asyncio.Task | None):
+        if previous is not None:
+            # Summaries build on each other: apply flushes in order.
+            await asyncio.wait([previous])
+        prompt = SUMMARY_PROMPT.format(max_words=self.max_words, summary=self.summary or "(none)", transcript=transcript)
+        try:
+            response = await self.llm.acomplete(prompt)
+        except Exception as e:
+            print(f"⚠ Could not summarize earlier messages, keeping the previous summary: {e}")
+            return
+        self.summary = response.text.strip()
+
+    async def wait(self):
+        """Wait for pending summaries (e.g. before saving the memory)."""
+        if self._pending is not None:
+            await asyncio.wait([self._pending])
+
+
+def bounded_memory(
+    target_tokens: int = 2000,
+    llm: LLM | None = None,
+    chat_history_ratio: float = 0.6,
+    max_references: int = 20,
+    **memory_kwargs,
+) -> Memory:
+    """
+    A `Memory` that keeps its prompt near `target_tokens`. The most recent
+    messages (up to `chat_history_ratio` of the target) are kept verbatim;
+    older ones are flushed to a ProductReferenceBlock and, when `llm` is
+    given, a SummaryMemoryBlock. Without an `llm` they are only dropped.
+    """
+    blocks = [ProductReferenceBlock(priority=0, max_references=max_references)]
+    if llm is not None:
+        blocks.append(SummaryMemoryBlock(llm=llm, priority=1))
+    return Memory.from_defaults(
+        token_limit=target_tokens,
+        chat_history_token_ratio=chat_history_ratio,
+        token_flush_size=max(target_tokens // 4, 1),
+        memory_blocks=blocks,
+        **memory_kwargs,
+    )
+
+
+@dataclass
+class _Turn:
+    question: str
+    answer: str
+    references: list[str] = field(default_factory=list)
+
+
+class Conversation:
+    """
+    QueryAgent conversation history bounded to `target_tokens`. Only the
+    latest answer is sent in full; earlier answers are sent as the list of
+    products they mentioned, and the oldest turns are dropped first.
+    """
+
+    def __init__(self, target_tokens: int = 1500, max_references: int = 10, encoding_name: str = "o200k_base"):
+        self.target_tokens = target_tokens
+        self.max_references = max_references
+        self.encoding_name = encoding_name
+        self.turns: list[_Turn] = []
+        self.last_prompt_tokens = 0
+
+    def _tokens(self, messages: list[ChatMessage]) -> int:
+        return sum(count_tokens(m["content"], self.encoding_name) for m in messages)
+
+    def _compacted(self, turn: _Turn) -> list[ChatMessage]:
+        if turn.references:
+            answer = "Products mentioned: " + ", ".join(turn.references[:self.max_references])
+        else:
+            answer = "(earlier answer omitted)"
+        if count_tokens(turn.answer, self.encoding_name) <= count_tokens(answer, self.encoding_name):
+            answer = turn.answer
+        return [ChatMessage(role="user", content=turn.question), ChatMessage(role="assistant", content=answer)]
+
+    def messages(self, question: str) -> list[ChatMessage]:
+        """The conversation to send for `question`."""
+        latest = []
+        if self.turns:
+            turn = self.turns[-1]
+            latest = [ChatMessage(role="user", content=turn.question), ChatMessage(role="assistant", content=turn.answer)]
+        current = [ChatMessage(role="user", content=question)]
+        earlier = [self._compacted(turn) for turn in self.turns[:-1]]
+        budget = self.target_tokens - self._tokens(latest + current)
+        kept: list[list[ChatMessage]] = []
+        for pair in reversed(earlier):
+            budget -= self._tokens(pair)
+            if budget < 0:
+                break
+            kept.insert(0, pair)
+        messages = [m for pair in kept for m in pair] + latest + current
+        self.last_prompt_tokens = self._tokens(messages)
+        return messages
+
+    def record(self, question: str, response):
+        """Add a finished turn; `response` is the QueryAgent response (or the answer text)."""
+        if isinstance(response, str):
+            self.turns.append(_Turn(question, response, extract_references(response)))
+        else:
+            self.turns.append(_Turn(question, response.final_answer, response_references(response)))
+
+    def ask(self, agent, question: str, **kwargs):
+        """`agent.ask` with the bounded history, recording the answer."""
+        response = agent.ask(self.messages(question), **kwargs)
+        self.record(question, response)
+        return response
+
+
+async def _demo():
+    from llama_index.core import Settings
+
+    from benchmarks.fakes import FakeQueryAgent, offline_services
+
+    questions = [
+        "Recommend some footwear for me.",
+        "Which of those are under $80?",
+        "Show me hoodies instead.",
+        "Any in black?",
+        "What about summer dresses?",
+        "Which are the cheapest?",
+        "And handbags to go with them?",
+        "Any leather ones?",
+        "What about scarves?",
+        "Which of those are wool?",
+    ]
+    class DetailedQueryAgent(FakeQueryAgent):
+        # Real answers describe every product they recommend.
+        def ask(self, query, **kwargs):
+            response = super().ask(query, **kwargs)
+            response.final_answer = " ".join(
+                f"The {p['name']} (${p['price']:.2f}) is a good fit: {p['description']}"
+                for p in (obj.properties for obj in response.search_results.objects)
+            )
+            return response
+
+    with offline_services() as client:
+        qa = DetailedQueryAgent(client, collections=["ECommerce"])
+        conversation = Conversation(target_tokens=300)
+        full: list[ChatMessage] = []
+        for turn, question in enumerate(questions, start=1):
+            full.append(ChatMessage(role="user", content=question))
+            response = conversation.ask(qa, question)
+            full.append(ChatMessage(role="assistant", content=response.final_answer))
+            print(f"turn {turn:2d}: bounded {conversation.last_prompt_tokens:4d} tokens, "
+                  f"full history {conversation._tokens(full[:-1]):4d} tokens")
+
+        # FunctionAgent memory: overflowing messages end up as references and a summary.
+        memory = bounded_memory(target_tokens=600, llm=Settings.llm)
+        for question, answer in zip(questions, (m["content"] for m in full[1::2])):
+            await memory.aput_messages([LlamaChatMessage(role="user", content=question),
+                                        LlamaChatMessage(role="assistant", content=answer)])
+        await asyncio.gather(*(block.wait() for block in memory.memory_blocks if isinstance(block, SummaryMemoryBlock)))
+        messages = await memory.aget()
+        print(f"\nFunctionAgent memory: {len(messages)} messages, system message:\n{messages[0].content}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
@@ -0,0 +1,156 @@
+"""
+Concurrent, batched embedding of nodes into a VectorStoreIndex.
+
+`VectorStoreIndex.insert_nodes` embeds one batch after another. This pipeline
+keeps up to `max_in_flight` embedding requests running at once and retries
+rate-limited requests with exponential backoff. Everything else runs on
+worker threads, so the event loop only waits on embedding requests:
+  - pulling the next batch (streaming rows, hashing, splitting into nodes)
+  - inserting embedded nodes into the index, `insert_batch_size` at a time;
+    every `insert_nodes` call re-serializes the whole index struct, so
+    inserting each embedding batch on its own is quadratic in the catalog
+
+Run `python -m shared.embedding_pipeline` for a throughput demo against the
+offline FakeEmbedding model.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Iterable
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import BaseNode, MetadataMode
+
+
+@dataclass
+class EmbeddingStats:
+    nodes: int = 0
+    requests: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float | None = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    def report(self) -> str:
+        return (
+            f"{self.nodes} nodes embedded in {self.seconds:.2f}s "
+            f"({self.nodes_per_second:.1f} nodes/sec, {self.requests_per_second:.1f} requests/sec, "
+            f"{self.retries} retries)"
+        )
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for HTTP 429 style errors (openai.RateLimitError and similar)."""
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+async def embed_into_index(
+    index: VectorStoreIndex,
+    nodes: Iterable[BaseNode],
+    embed_model: BaseEmbedding,
+    batch_size: int | None = None,
+    max_in_flight: int = 4,
+    insert_batch_size: int = 1024,
+    max_retries: int = 6,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    is_retryable: Callable[[Exception], bool] = is_rate_limit_error,
+) -> EmbeddingStats:
+    """
+    Embed `nodes` in batches of `batch_size` (defaults to the model's
+    `embed_batch_size`) with at most `max_in_flight` requests at a time, and
+    insert them into `index` in chunks of about `insert_batch_size` nodes.
+
+    `nodes` is consumed lazily, on a worker thread, so it can be a generator
+    over a large catalog that does blocking work.
+    """
+    batch_size = batch_size or embed_model.embed_batch_size
+    stats = EmbeddingStats()
+    node_iterator = iter(nodes)
+    # The node generator may read and update the index too (see shared/query_engine.py),
+    # so pulling batches and inserting take turns.
+    index_lock = threading.Lock()
+    embedded: list[BaseNode] = []
+
+    def next_batch() -> tuple[list[BaseNode], list[str]]:
+        with index_lock:
+            batch = list(islice(node_iterator, batch_size))
+        return batch, [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+
+    def insert(chunk: list[BaseNode]):
+        with index_lock:
+            # Nodes that already have an embedding are inserted without re-embedding.
+            index.insert_nodes(chunk)
+
+    async def embed_batch(texts: list[str]) -> list[list[float]]:
+        for attempt in range(max_retries + 1):
+            stats.requests += 1
+            try:
+                return await embed_model.aget_text_embedding_batch(texts)
+            except Exception as e:
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                stats.retries += 1
+                delay = min(max_delay, base_delay * 2**attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+    async def worker():
+        # Workers pull batches from the shared iterator, so no more than
+        # `max_in_flight` batches plus one insert chunk are held in memory.
+        while True:
+            batch, texts = await asyncio.to_thread(next_batch)
+            if not batch:
+                return
+            embeddings = await embed_batch(texts)
+            for node, embedding in zip(batch, embeddings):
+                node.embedding = embedding
+            embedded.extend(batch)
+            if len(embedded) >= insert_batch_size:
+                chunk = embedded[:]
+                embedded.clear()
+                await asyncio.to_thread(insert, chunk)
+                stats.nodes += len(chunk)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max_in_flight)]
+    try:
+        await asyncio.gather(*workers)
+        if embedded:
+            await asyncio.to_thread(insert, embedded[:])
+            stats.nodes += len(embedded)
+    finally:
+        for task in workers:
+            task.cancel()
+        stats.finished_at = time.perf_counter()
+    return stats
+
+
+async def _demo():
+    from llama_index.core.schema import TextNode
+    from benchmarks.fakes import FakeEmbedding
+
+    embed_model = FakeEmbedding(latency=0.05, rate_limit_rate=0.1, embed_batch_size=50)
+    for max_in_flight in (1, 4, 16):
+        index = VectorStoreIndex(nodes=[], embed_model=embed_model)
+        nodes = (TextNode(text=f"Clothing item number {i}") for i in range(5000))
+        stats = await embed_into_index(index, nodes, embed_model, max_in_flight=max_in_flight, base_delay=0.01)
+        print(f"max_in_flight={max_in_flight:>2}: {stats.report()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_demo())
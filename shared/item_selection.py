@@ -0,0 +1,54 @@
+"""
+Deterministic parsing of admin item selections.
+
+Resolves the items named in an admin request to positions in the new-items
+catalog without an LLM call:
+    "add item 3"                     -> [3]
+    "add items 0-7"                  -> [0, 1, ..., 7]
+    "add items 1, 4 and 6"           -> [1, 4, 6]
+    "add all Cottagecore items"      -> every item whose `collection` is Cottagecore
+    "add all new items"              -> every item
+    "add the Stellar Mesh Hoodie"    -> the item with that name (or product_id)
+`parse_item_selection` returns None when nothing in the query resolves to an
+item, so the caller can fall back to asking the LLM.
+"""
+
+import re
+
+from shared.catalog import Catalog
+
+# Id-like tokens (four or more hyphenated parts) that aren't product ids are dropped, so
+# their digits aren't read as positions.
+_ID_LIKE = re.compile(r"(?<![\w-])\w+(?:-\w+){3,}(?![\w-])")
+_RANGE = re.compile(r"\b(\d+)\s*(?:-|–|to|through|thru)\s*(\d+)\b")
+_NUMBER = re.compile(r"\b\d+\b")
+_ALL_ITEMS = re.compile(r"\b(all (?:the )?(?:new )?items|everything)\b")
+
+
+def parse_item_selection(query: str, catalog: Catalog) -> list[int] | None:
+    """Return the positions in `catalog` selected by `query`, in order, without duplicates."""
+    text = " ".join(query.lower().split())
+    selected: list[int] = []
+
+    named = [name for name in catalog.collections if re.search(rf"\b{re.escape(name)}\b", text)]
+    if named:
+        # Numbers next to a collection name are counts ("the 2 Cottagecore items"), not positions.
+        selected = [i for name in named for i in catalog.in_collection(name)]
+    elif _ALL_ITEMS.search(text):
+        selected = list(range(len(catalog)))
+    else:
+        # Product ids are matched as the catalog spells them: they need not be hex UUIDs.
+        for product_id in catalog.product_ids:
+            pattern = rf"(?<![\w-]){re.escape(product_id.lower())}(?![\w-])"
+            if re.search(pattern, text):
+                selected.append(catalog.find(product_id=product_id))
+                text = re.sub(pattern, " ", text)
+        selected.extend(catalog.find(name=name) for name in catalog.names if name in text)
+        text = _ID_LIKE.sub(" ", text)
+        for start, end in _RANGE.findall(text):
+            low, high = sorted((int(start), int(end)))
+            selected.extend(range(low, high + 1))
+        selected.extend(int(number) for number in _NUMBER.findall(_RANGE.sub(" ", text)))
+
+    valid = list(dict.fromkeys(i for i in selected if i is not None and 0 <= i < len(catalog)))
+    return valid or None
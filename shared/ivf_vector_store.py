@@ -0,0 +1,303 @@
+"""
+Approximate nearest-neighbour (IVF-flat) search for the local query engine.
+
+`NumpyVectorStore` scores every vector on every query, so latency grows
+linearly with the catalog. `IVFVectorStore` partitions the vectors into
+`nlist` clusters (spherical k-means on a sample) and keeps an inverted list of
+rows per cluster. A query is scored against the centroids first, then only
+against the rows of its `nprobe` nearest clusters:
+  - `nprobe` trades recall for latency and can be changed at any time
+    (`store.nprobe = 32`); after clustering it is set to the smallest value
+    that reaches `target_recall` (recall@10 against exact search, measured on
+    a sample of the stored vectors)
+  - probing half of the clusters or more is slower than scanning everything,
+    so such searches (and any below `min_train_size` vectors, where the store
+    is not clustered) are exact
+  - inserts are assigned to their nearest centroid and are searched
+    exhaustively until the inverted lists are next rebuilt (by a write, never
+    by a search, which leaves the rows in place); the clusters are retrained
+    once the store has grown `retrain_growth` times
+  - restrictive filters are answered exactly over the matching rows, since
+    that scans fewer vectors than probing would
+  - centroids and assignments are persisted next to the vectors
+
+    store = IVFVectorStore(dtype="float16", nprobe=16)
+    index = VectorStoreIndex(nodes, storage_context=StorageContext.from_defaults(vector_store=store))
+
+Run `python benchmarks/ann_index.py` for recall@10 against latency compared
+with exact search.
+"""
+
+import os
+from typing import Any, Sequence
+
+import numpy as np
+from pydantic import PrivateAttr
+
+from shared.numpy_vector_store import NumpyVectorStore, _normalize, top_k
+
+
+class IVFVectorStore(NumpyVectorStore):
+    """NumpyVectorStore with an inverted-file index for sublinear queries."""
+
+    nlist: int | None = None  # None: about sqrt(size) clusters, chosen at training time
+    nprobe: int = 16
+    # 50k 1536-dim vectors take ~28ms to scan exactly; below that IVF saves little (benchmarks/ann_index.py).
+    min_train_size: int = 50000
+    target_recall: float | None = 0.95
+    measured_recall: float | None = None  # recall@10 of `nprobe` when it was calibrated
+    retrain_growth: float = 4.0
+    kmeans_iterations: int = 10
+    seed: int = 0
+
+    _centroids: np.ndarray | None = PrivateAttr(default=None)
+    _assignments: np.ndarray | None = PrivateAttr(default=None)
+    _trained_size: int = PrivateAttr(default=0)
+    _offsets: np.ndarray | None = PrivateAttr(default=None)
+    _listed: int = PrivateAttr(default=0)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "IVFVectorStore"
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def nbytes(self) -> int:
+        extra = self._size * 4
+        if self._centroids is not None:
+            extra += self._centroids.nbytes
+        return super().nbytes + extra
+
+    # --- Clustering ---------------------------------------------------------
+
+    def _decode(self, rows: np.ndarray) -> np.ndarray:
+        """Rows of the matrix as (approximately unit) float32 vectors."""
+        vectors = self._matrix[rows].astype(np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows, None]
+        return vectors
+
+    def _nearest(self, vectors: np.ndarray, centroids: np.ndarray | None = None) -> np.ndarray:
+        """Index of the nearest centroid for each row of `vectors`."""
+        centroids = self._centroids if centroids is None else centroids
+        # Blocks of rows keep the (rows x nlist) score matrix small.
+        step = max(1, 2**23 // len(centroids))
+        return np.concatenate([
+            np.argmax(vectors[start:start + step] @ centroids.T, axis=1).astype(np.int32)
+            for start in range(0, len(vectors), step)
+        ]) if len(vectors) else np.empty(0, dtype=np.int32)
+
+    def train(self):
+        """Cluster the stored vectors (k-means on a sample) and assign every row to a cluster."""
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or max(16, int(np.sqrt(self._size)))
+        nlist = min(nlist, self._size)
+        sample_size = min(self._size, max(50 * nlist, 10000), 100000)
+        sample = self._decode(np.sort(rng.choice(self._size, sample_size, replace=False)))
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)]
+        for _ in range(self.kmeans_iterations):
+            assignments = self._nearest(sample, centroids)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            sums = np.add.reduceat(sample[order], np.concatenate([[0], np.cumsum(counts[filled])[:-1]]))
+            centroids = centroids.copy()
+            centroids[filled] = _normalize(sums)
+            empty = np.flatnonzero(counts == 0)
+            # Reseed empty clusters with random sample vectors.
+            centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+        self._centroids = centroids.astype(np.float32)
+        self._assignments = np.empty(self._matrix.shape[0], dtype=np.int32)
+        for start in range(0, self._size, self.chunk_size):
+            rows = np.arange(start, min(start + self.chunk_size, self._size))
+            self._assignments[rows] = self._nearest(self._decode(rows))
+        self._trained_size = self._size
+        self._build_lists()
+        if self.target_recall is not None:
+            self.calibrate()
+
+    def calibrate(self, k: int = 10, queries: int = 100):
+        """Set `nprobe` to the smallest power of two whose recall@k reaches `target_recall`."""
+        rng = np.random.default_rng(self.seed)
+        rows = rng.choice(self._size, min(queries, self._size), replace=False)
+        vectors = self._decode(rows)
+
+        def neighbours(positions: np.ndarray) -> list[set]:
+            # Stored vectors are their own nearest neighbour: leave them out.
+            return [set(found[found != row][:k].tolist()) for found, row in zip(positions, rows)]
+
+        exact = neighbours(NumpyVectorStore.search(self, vectors, k + 1)[0])
+        nprobe, nlist = 1, len(self._centroids)
+        while True:
+            found = neighbours(self.search(vectors, k + 1, nprobe=nprobe)[0])
+            recall = float(np.mean([len(f & e) / max(len(e), 1) for f, e in zip(found, exact)]))
+            if recall >= self.target_recall or nprobe >= nlist:
+                break
+            nprobe = min(nprobe * 2, nlist)
+        self.nprobe = nprobe
+        self.measured_recall = recall
+
+    def _build_lists(self):
+        """
+        Sort the rows by cluster so every inverted list is a contiguous slice
+        of the matrix: probing a cluster reads a view instead of gathering rows.
+        """
+        assignments = self._assignments[: self._size]
+        order = np.argsort(assignments, kind="stable")
+        if (order != np.arange(self._size)).any():
+            self._reserve(0, self._matrix.shape[1])  # copy a memory-mapped matrix before writing
+            self._matrix[: self._size] = self._matrix[order]
+            if self._scales is not None:
+                self._scales[: self._size] = self._scales[order]
+            self._assignments[: self._size] = assignments[order]
+            ids, ref_doc_ids, metadata = self._ids, self._ref_doc_ids, self._metadata
+            self._ids = [ids[i] for i in order.tolist()]
+            self._ref_doc_ids = [ref_doc_ids[i] for i in order.tolist()]
+            self._metadata = [metadata[i] for i in order.tolist()]
+            self._positions = {node_id: i for i, node_id in enumerate(self._ids)}
+            self._columns.clear()
+        counts = np.bincount(self._assignments[: self._size], minlength=len(self._centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._listed = self._size
+
+    # --- Writes -------------------------------------------------------------
+
+    def add_vectors(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        ref_doc_ids: Sequence[str] | None = None,
+        metadata: Sequence[dict] | None = None,
+    ) -> list[str]:
+        listed = self._listed
+        added = super().add_vectors(ids, vectors, ref_doc_ids=ref_doc_ids, metadata=metadata)
+        if self._centroids is None:
+            if self._size >= self.min_train_size:
+                self.train()
+        elif self._size >= self.retrain_growth * self._trained_size:
+            self.train()
+        else:
+            if len(self._assignments) < self._matrix.shape[0]:
+                assignments = np.empty(self._matrix.shape[0], dtype=np.int32)
+                assignments[: len(self._assignments)] = self._assignments
+                self._assignments = assignments
+            positions = np.fromiter((self._positions[i] for i in ids), dtype=np.int64, count=len(ids))
+            self._assignments[positions] = self._nearest(_normalize(np.asarray(vectors, dtype=np.float32)))
+            if (positions < listed).any():
+                self._listed = 0  # replaced rows may have changed cluster
+            self._refresh_lists()
+        return added
+
+    def _remove(self, positions: list[int]):
+        if positions and self._assignments is not None:
+            # Mirror the swap-removal of NumpyVectorStore._remove.
+            size = self._size
+            for position in sorted(positions, reverse=True):
+                size -= 1
+                self._assignments[position] = self._assignments[size]
+            self._listed = 0
+        super()._remove(positions)
+        self._refresh_lists()
+
+    def _refresh_lists(self):
+        """
+        Rebuild the inverted lists once too many rows are outside them. Only
+        writes call this: rebuilding reorders the rows, which would invalidate
+        the filter mask of a query already under way.
+        """
+        if self._centroids is not None and self._size - self._listed > self._size // 16:
+            self._build_lists()
+
+    # --- Queries ------------------------------------------------------------
+
+    def _score(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        block = self._matrix[start:end]
+        scores = (block if block.dtype == np.float32 else block.astype(np.float32)) @ query
+        if self._scales is not None:
+            scores *= self._scales[start:end]
+        return scores
+
+    def search(
+        self, queries: np.ndarray, k: int, mask: np.ndarray | None = None, nprobe: int | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Like `NumpyVectorStore.search`, scanning only the `nprobe` nearest clusters of each query."""
+        nprobe = min(nprobe or self.nprobe, len(self._centroids)) if self._centroids is not None else 0
+        if self._centroids is None or 2 * nprobe >= len(self._centroids):
+            return super().search(queries, k, mask)
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        tail = (self._listed, self._size)  # rows added since the lists were built
+        if mask is not None and mask.sum() <= nprobe * self._listed / len(self._centroids) + tail[1] - tail[0]:
+            # Few rows pass the filter: scoring just those is exact and cheaper than probing.
+            return self._search_allowed(queries, k, np.flatnonzero(mask))
+
+        positions = np.zeros((len(queries), k), dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        probes, _ = top_k(queries @ self._centroids.T, nprobe)
+        for i, query in enumerate(queries):
+            ranges = [(self._offsets[c], self._offsets[c + 1]) for c in probes[i]] + [tail]
+            rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+            values = np.concatenate([self._score(query, start, end) for start, end in ranges])
+            if mask is not None:
+                values[~mask[rows]] = -np.inf
+            best, best_values = top_k(values[None, :], k)
+            positions[i, : best.shape[1]] = rows[best[0]]
+            scores[i, : best.shape[1]] = best_values[0]
+        return positions, scores
+
+    def _search_allowed(self, queries: np.ndarray, k: int, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        vectors = self._matrix[rows].astype(np.float32)
+        values = queries @ vectors.T
+        if self._scales is not None:
+            values *= self._scales[rows]
+        best, best_values = top_k(values, k)
+        positions = np.zeros((len(queries), k), dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        positions[:, : best.shape[1]] = rows[best]
+        scores[:, : best.shape[1]] = best_values
+        return positions, scores
+
+    # --- Persistence --------------------------------------------------------
+
+    @staticmethod
+    def _index_path(persist_path: str) -> str:
+        base = persist_path[: -len(".json")] if persist_path.endswith(".json") else persist_path
+        return f"{base}.ivf.npz"
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """Write the store (see NumpyVectorStore.persist) plus the centroids and assignments."""
+        if self._centroids is not None and self._listed < self._size:
+            # Save rows in cluster order, so the memory-mapped matrix needs no reordering on load.
+            self._build_lists()
+        super().persist(persist_path, fs=fs)
+        path = self._index_path(persist_path)
+        if self._centroids is None:
+            if os.path.exists(path):
+                os.remove(path)  # left by an earlier, clustered store at this path
+            return
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(
+                f,
+                centroids=self._centroids,
+                assignments=self._assignments[: self._size],
+                trained_size=np.array(self._trained_size),
+            )
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, fs: Any = None) -> "IVFVectorStore":
+        store = super().from_persist_path(persist_path, fs=fs)
+        path = cls._index_path(persist_path)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                if len(data["assignments"]) == store.size:
+                    store._centroids = data["centroids"]
+                    store._assignments = data["assignments"]
+                    store._trained_size = int(data["trained_size"])
+                    store._build_lists()  # persisted in cluster order: only the offsets are computed
+        if store._centroids is None and store.size >= store.min_train_size:
+            # Persisted by a NumpyVectorStore (or before it grew this large).
+            store.train()
+        return store
@@ -0,0 +1,446 @@
+"""
+Serving a workflow over MCP under bursty load.
+
+`workflow_as_mcp` starts a workflow run for every tool call as soon as it
+arrives, so a burst from several MCP clients runs everything at once: every
+run slows down, the loop's worker threads are oversubscribed, and the calls
+time out together. `bounded_workflow_as_mcp` registers the same tool, but
+every call goes through an `AdmissionController` first:
+  - at most `max_concurrent` workflow runs are in flight
+  - up to `max_queue` further calls wait (first come, first served) for a slot
+  - beyond that, calls are shed immediately with a `ServerBusyError`
+  - each call has a `deadline` (seconds from arrival, queueing included);
+    when it passes, the workflow run is cancelled with a `DeadlineExceededError`
+  - sync steps of admitted runs run on the controller's own thread pool, at
+    least `max_concurrent` threads, rather than the loop's default executor
+Both errors are `ToolError`s, so the client gets a readable error result.
+The in-flight and queue-depth gauges and the shed / timed-out counters are
+served as JSON on GET /status; queue wait and run time are recorded in a
+HistogramRegistry as "mcp.queue_wait" and "mcp.run".
+
+During spikes many clients ask the same thing at once. With a `SingleFlight`,
+concurrent calls with the same arguments (compared ignoring case and extra
+whitespace) share one workflow run and all get its result; /status reports
+how many calls were coalesced, and the hit rate of the SharedCache, if given.
+
+One process serves from one core. `serve_workers` runs the server in several
+worker processes behind one port (uvicorn's process manager): the workers are
+stateless streamable-http servers, so any worker can take any request, and
+they share router decisions and query results through a SharedCache.
+Pass the workflow as a `Lazy` (shared/startup.py) to start listening before
+it is built.
+
+    admission = AdmissionController(max_concurrent=8, max_queue=32, deadline=60)
+    mcp = bounded_workflow_as_mcp(agent, admission, single_flight=SingleFlight(),
+                                  start_event_model=QueryEvent, workflow_name="e-commerce-tool")
+    mcp.run(transport="streamable-http")
+"""
+
+import asyncio
+import contextvars
+import functools
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import time
+import types
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import uvicorn
+
+from mcp.server.mcpserver import Context, MCPServer
+from mcp.server.mcpserver.exceptions import ToolError
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from workflows import Workflow
+from workflows.errors import WorkflowCancelledByUser
+from workflows.events import Event, StartEvent, StopEvent
+
+from shared.shared_cache import SharedCache
+from shared.startup import Lazy
+from shared.tracing import HistogramRegistry
+
+MCP_MAX_CONCURRENT = int(os.getenv("MCP_MAX_CONCURRENT", "8"))
+MCP_MAX_QUEUE = int(os.getenv("MCP_MAX_QUEUE", "32"))
+MCP_DEADLINE = float(os.getenv("MCP_DEADLINE", "60"))
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "1"))
+MCP_GRACEFUL_TIMEOUT = int(os.getenv("MCP_GRACEFUL_TIMEOUT", "30"))
+_WORKER_APP = "MCP_WORKER_APP"  # "<script path>:<attribute>" of the MCPServer each worker serves
+
+
+class ServerBusyError(ToolError):
+    """Raised right away when every slot is busy and the queue is full."""
+
+
+class DeadlineExceededError(ToolError):
+    """Raised when a call is still queued or running at its deadline."""
+
+
+class AdmissionController:
+    """Concurrency cap, bounded FIFO queue and per-call deadline for workflow runs."""
+
+    def __init__(
+        self,
+        max_concurrent: int = MCP_MAX_CONCURRENT,
+        max_queue: int = MCP_MAX_QUEUE,
+        deadline: float | None = MCP_DEADLINE,
+        metrics: HistogramRegistry | None = None,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.metrics = metrics or HistogramRegistry()
+        self.in_flight = 0
+        self.admitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.shed = 0
+        self.timed_out = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # The workflows library runs sync steps on the loop's default executor,
+        # min(32, cpus + 4) threads. Admitted runs get their own, at least as large
+        # as the cap, so they don't queue again, out of sight, behind too few threads.
+        workers = max(max_concurrent, min(32, (os.cpu_count() or 1) + 4))
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="workflow-step")
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+    def _own_sync_steps(self, workflow: Workflow):
+        """Run the sync steps of `workflow` on `self.executor` (as async steps) instead of the default executor."""
+        if getattr(workflow, "_admission_executor", None) is self.executor:
+            return
+        for name in workflow._get_steps():
+            step = getattr(workflow, name, None)
+            if inspect.ismethod(step) and not inspect.iscoroutinefunction(step):
+                setattr(workflow, name, self._on_executor(step))
+        workflow._admission_executor = self.executor
+
+    def _on_executor(self, step: Callable) -> Callable:
+        # A method again (with the step's signature and config), or the library no longer finds the step.
+        @functools.wraps(step.__func__)
+        async def run_step(workflow, **kwargs):
+            context = contextvars.copy_context()  # like the library does, so spans nest under the run
+            call = functools.partial(context.run, step, **kwargs)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+        return types.MethodType(run_step, step.__self__)
+
+    async def _acquire(self, deadline_at: float | None):
+        """Take a slot, waiting in line for one until `deadline_at`."""
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.metrics.observe("mcp.queue_wait", 0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise ServerBusyError(
+                f"Server busy: {self.in_flight} requests running and {self.queued} queued. Retry shortly."
+            )
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            timeout = None if deadline_at is None else max(deadline_at - started, 0)
+            await asyncio.wait([waiter], timeout=timeout)
+        except asyncio.CancelledError:
+            self._leave(waiter)
+            raise
+        if not waiter.done():
+            self._leave(waiter)
+            self.timed_out += 1
+            raise DeadlineExceededError(f"Deadline of {self.deadline}s exceeded while queued.")
+        # _release handed its slot over to this call (in_flight is unchanged).
+        self.metrics.observe("mcp.queue_wait", time.monotonic() - started)
+
+    def _leave(self, waiter: asyncio.Future):
+        if waiter.done():
+            self._release()  # the slot arrived just as the caller gave up: pass it on
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def run(self, workflow: Workflow, on_event=None, **run_kwargs) -> Any:
+        """
+        `workflow.run(**run_kwargs)` once a slot is free, passing every streamed
+        event to the async `on_event`. Raises ServerBusyError or DeadlineExceededError.
+        """
+        deadline_at = None if self.deadline is None else time.monotonic() + self.deadline
+        await self._acquire(deadline_at)
+        self._own_sync_steps(workflow)
+        self.admitted += 1
+        started = time.monotonic()
+        handler = workflow.run(**run_kwargs)
+        try:
+            timeout = None if deadline_at is None else max(deadline_at - started, 0)
+            result = await asyncio.wait_for(self._drive(handler, on_event), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            await self._cancel(handler)
+            raise DeadlineExceededError(f"Deadline of {self.deadline}s exceeded; the request was cancelled.") from None
+        except BaseException:
+            self.failed += 1
+            await self._cancel(handler)
+            raise
+        finally:
+            self._release()
+            self.metrics.observe("mcp.run", time.monotonic() - started)
+        self.completed += 1
+        return result
+
+    @staticmethod
+    async def _drive(handler, on_event):
+        async for event in handler.stream_events():
+            if on_event is not None and not isinstance(event, StopEvent):
+                await on_event(event)
+        return await handler
+
+    @staticmethod
+    async def _cancel(handler):
+        if handler.done():
+            return
+        await handler.cancel_run()
+        try:
+            await handler
+        except (WorkflowCancelledByUser, asyncio.CancelledError):
+            pass
+
+
+def flight_key(run_args: BaseModel) -> str:
+    """Tool arguments as a key; strings are compared ignoring case and extra whitespace."""
+    values = {
+        name: " ".join(value.lower().split()) if isinstance(value, str) else value
+        for name, value in run_args.model_dump().items()
+    }
+    return json.dumps(values, sort_keys=True, default=str)
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    subscribers: list[Callable[[Event], Awaitable[None]]] = field(default_factory=list)
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one in-flight call: the first
+    starts it, the others wait for its result (or error). Events published by
+    the call reach every caller still waiting, from the moment they join. The
+    call is cancelled only when all of its callers have gone.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._flights: dict[str, _Flight] = {}
+
+    def stats(self) -> dict:
+        calls = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / calls if calls else 0.0,
+            "in_flight": len(self._flights),
+        }
+
+    async def do(
+        self,
+        key: str,
+        call: Callable[[Callable[[Event], Awaitable[None]]], Awaitable[Any]],
+        subscriber: Callable[[Event], Awaitable[None]] | None = None,
+    ) -> Any:
+        """`await call(publish)`, unless a call with `key` is already in flight, then its result."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(task=None)
+
+            async def publish(event: Event):
+                for send in list(flight.subscribers):
+                    try:
+                        await send(event)
+                    except Exception:
+                        # One caller's broken stream mustn't fail the call for the others.
+                        flight.subscribers.remove(send)
+
+            flight.task = asyncio.ensure_future(call(publish))
+            flight.task.add_done_callback(lambda _: self._flights.pop(key, None))
+            self._flights[key] = flight
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        if subscriber is not None:
+            flight.subscribers.append(subscriber)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if subscriber in flight.subscribers:
+                flight.subscribers.remove(subscriber)
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+
+def _warm_on_startup(lazy: Lazy, lifespan=None):
+    """Server lifespan that starts building `lazy` in the background, then runs `lifespan` (if any)."""
+
+    @asynccontextmanager
+    async def warm(server: MCPServer):
+        lazy.warm()
+        if lifespan is None:
+            yield {}
+        else:
+            async with lifespan(server) as state:
+                yield state
+
+    return warm
+
+
+def bounded_workflow_as_mcp(
+    workflow: Workflow | Lazy[Workflow],
+    admission: AdmissionController,
+    workflow_name: str | None = None,
+    workflow_description: str | None = None,
+    start_event_model: type[BaseModel] | None = None,
+    single_flight: SingleFlight | None = None,
+    shared_cache: SharedCache | None = None,
+    status_path: str | None = "/status",
+    **mcp_server_init_kwargs: Any,
+) -> MCPServer:
+    """
+    Like llama_index's `workflow_as_mcp`, with every tool call going through
+    `admission`. With `single_flight`, identical concurrent calls (see
+    `flight_key`) share one workflow run and one admission slot. The stats
+    (and those of `shared_cache`, when given) are served on GET `status_path`.
+
+    A `Lazy` workflow is built in the background once the server has started
+    (or by the first call, if that comes sooner), so the server listens
+    without waiting for it; `workflow_name` and `start_event_model` must then
+    be given. /status reports whether it is ready.
+    """
+    lazy = workflow if isinstance(workflow, Lazy) else None
+    if lazy is not None:
+        if workflow_name is None or start_event_model is None:
+            raise ValueError("A Lazy workflow needs a workflow_name and a start_event_model.")
+        mcp_server_init_kwargs["lifespan"] = _warm_on_startup(lazy, mcp_server_init_kwargs.get("lifespan"))
+    app = MCPServer(**mcp_server_init_kwargs)
+    StartEventCLS = start_event_model or workflow._start_event_class
+    if StartEventCLS == StartEvent:
+        raise ValueError("Must declare a custom StartEvent class in your workflow or provide a start_event_model.")
+
+    description = workflow_description or (workflow.__doc__ if lazy is None else None)
+
+    @app.tool(name=workflow_name or type(workflow).__name__, description=description)
+    async def _workflow_tool(run_args: StartEventCLS, context: Context) -> Any:
+        async def log(event):
+            await context.log("info", data=event.model_dump_json())
+
+        async def run(on_event):
+            target = workflow
+            if lazy is not None:
+                try:
+                    target = await lazy.aget()
+                except Exception as e:
+                    raise ToolError(f"{lazy.name} is not available ({e}), try again later") from e
+            if isinstance(run_args, StartEvent):
+                return await admission.run(target, on_event=on_event, start_event=run_args)
+            return await admission.run(target, on_event=on_event, **run_args.model_dump())
+
+        if single_flight is None:
+            return await run(log)
+        return await single_flight.do(flight_key(run_args), run, subscriber=log)
+
+    if status_path:
+        @app.custom_route(status_path, methods=["GET"])
+        async def _status(request: Request) -> JSONResponse:
+            stats = {"worker": os.getpid(), **admission.stats()}
+            if lazy is not None:
+                stats["workflow"] = lazy.stats()
+            if single_flight is not None:
+                stats["single_flight"] = single_flight.stats()
+            if shared_cache is not None:
+                # It counts its entries in SQLite, which may wait on another worker's write.
+                stats["shared_cache"] = await asyncio.to_thread(shared_cache.stats)
+            return JSONResponse(stats)
+
+    return app
+
+
+def worker_app():
+    """
+    App factory run in every worker process: the MCPServer named by
+    MCP_WORKER_APP as a stateless streamable-http app.
+    """
+    path, _, attribute = os.environ[_WORKER_APP].rpartition(":")
+    # Worker processes are spawned, which already imported the serving script as __mp_main__.
+    module = sys.modules.get("__mp_main__")
+    if module is None or os.path.abspath(getattr(module, "__file__", "")) != path:
+        spec = importlib.util.spec_from_file_location(f"mcp_worker_{Path(path).stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    # Sessions only exist in the process that created them; stateless requests can go to any worker.
+    return getattr(module, attribute).streamable_http_app(stateless_http=True)
+
+
+def serve_workers(
+    script: str,
+    attribute: str = "mcp",
+    workers: int = MCP_WORKERS,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    graceful_timeout: int = MCP_GRACEFUL_TIMEOUT,
+    startup_timeout: int = 60,
+):
+    """
+    Serve the MCPServer `attribute` of `script` from `workers` processes on
+    `host:port`, at /mcp. Signals to the parent process:
+      - SIGHUP restarts the workers one at a time, each replacement serving
+        before the worker it replaces stops
+      - SIGTTIN / SIGTTOU add / remove a worker
+      - SIGINT / SIGTERM stop; workers finish in-flight calls for up to
+        `graceful_timeout` seconds
+
+    A worker that isn't serving `startup_timeout` seconds after it starts is
+    replaced; each worker imports the whole script, which takes a while.
+    """
+    os.environ[_WORKER_APP] = f"{os.path.abspath(script)}:{attribute}"
+    uvicorn.run(
+        "shared.mcp_serving:worker_app",
+        factory=True,
+        workers=workers,
+        host=host,
+        port=port,
+        timeout_graceful_shutdown=graceful_timeout,
+        timeout_worker_healthcheck=startup_timeout,
+    )
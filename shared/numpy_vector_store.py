@@ -0,0 +1,379 @@
+"""
+NumPy-backed vector store for the local query engine.
+
+LlamaIndex's default SimpleVectorStore keeps every embedding as a Python list
+in a dict and scores them one by one in Python. `NumpyVectorStore` keeps them
+in one contiguous matrix instead:
+  - vectors are L2-normalized on insert, so cosine similarity is a matrix product
+  - the matrix can be stored as float32, float16 (half the memory) or int8
+    (a quarter, with one float32 scale per row); the smaller types trade
+    query latency for memory, since each block is cast back to float32
+  - queries are scored in blocks of `chunk_size` rows and the top-k taken
+    with `argpartition`, so scoring never materializes a float32 copy of a
+    quantized matrix
+  - simple metadata filters (==, !=, <, >, in, ...) are evaluated on cached
+    NumPy columns; anything else falls back to LlamaIndex's filter function
+  - `persist` writes the matrix as .npy files that are memory-mapped on load
+
+    store = NumpyVectorStore(dtype="float16")
+    index = VectorStoreIndex(nodes, storage_context=StorageContext.from_defaults(vector_store=store))
+
+Run `python benchmarks/vector_store.py` to compare memory and latency with the
+default store.
+"""
+
+import json
+import os
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import build_metadata_filter_fn, node_to_metadata_dict
+from pydantic import PrivateAttr
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+DEFAULT_PERSIST_FNAME = "default__vector_store.json"
+
+_COMPARISONS = {
+    FilterOperator.EQ: np.equal,
+    FilterOperator.NE: np.not_equal,
+    FilterOperator.GT: np.greater,
+    FilterOperator.GTE: np.greater_equal,
+    FilterOperator.LT: np.less,
+    FilterOperator.LTE: np.less_equal,
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Indices and values of the `k` highest scores in each row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    values = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """In-memory (or memory-mapped) vector store backed by a contiguous NumPy matrix."""
+
+    stores_text: bool = False
+    is_embedding_query: bool = True
+    dtype: str = "float32"
+    chunk_size: int = 65536
+
+    _matrix: np.ndarray | None = PrivateAttr(default=None)
+    _scales: np.ndarray | None = PrivateAttr(default=None)
+    _size: int = PrivateAttr(default=0)
+    _ids: list[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: list[str] = PrivateAttr(default_factory=list)
+    _metadata: list[dict] = PrivateAttr(default_factory=list)
+    _positions: dict[str, int] = PrivateAttr(default_factory=dict)
+    _columns: dict[str, np.ndarray] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, dtype: str = "float32", chunk_size: int = 65536, **kwargs: Any):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}, not {dtype!r}")
+        super().__init__(dtype=dtype, chunk_size=chunk_size, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def size(self) -> int:
+        # Not __len__: an empty store would be falsy, and StorageContext.from_defaults
+        # replaces falsy vector stores with a SimpleVectorStore.
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the vectors (and int8 scales) actually stored."""
+        if self._matrix is None:
+            return 0
+        row = self._matrix.shape[1] * self._matrix.itemsize + (4 if self._scales is not None else 0)
+        return self._size * row
+
+    # --- Writes -------------------------------------------------------------
+
+    def _reserve(self, rows: int, dim: int):
+        """Make room for `rows` more vectors, doubling the capacity (and copying memory-mapped arrays)."""
+        if self._matrix is not None and self._matrix.shape[1] != dim:
+            raise ValueError(f"Expected {self._matrix.shape[1]}-dimensional embeddings, got {dim}")
+        needed = self._size + rows
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if needed <= capacity and not isinstance(self._matrix, np.memmap):
+            return
+        capacity = max(needed, 2 * capacity, 1024)
+        matrix = np.empty((capacity, dim), dtype=DTYPES[self.dtype])
+        scales = np.empty(capacity, dtype=np.float32) if self.dtype == "int8" else None
+        if self._matrix is not None:
+            matrix[: self._size] = self._matrix[: self._size]
+            if scales is not None:
+                scales[: self._size] = self._scales[: self._size]
+        self._matrix, self._scales = matrix, scales
+
+    def _encode(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+        vectors = _normalize(vectors)
+        if self.dtype != "int8":
+            return vectors.astype(DTYPES[self.dtype]), None
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> list[str]:
+        """Add (or replace) nodes; their embeddings must already be set."""
+        if not nodes:
+            return []
+        metadata = []
+        for node in nodes:
+            node_metadata = node_to_metadata_dict(node, remove_text=True, flat_metadata=False)
+            node_metadata.pop("_node_content", None)
+            metadata.append(node_metadata)
+        return self.add_vectors(
+            [node.node_id for node in nodes],
+            np.asarray([node.get_embedding() for node in nodes], dtype=np.float32),
+            ref_doc_ids=[node.ref_doc_id or "None" for node in nodes],
+            metadata=metadata,
+        )
+
+    def add_vectors(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        ref_doc_ids: Sequence[str] | None = None,
+        metadata: Sequence[dict] | None = None,
+    ) -> list[str]:
+        """Add (or replace) raw vectors, one row per id; used by `add` and for bulk loads."""
+        vectors, scales = self._encode(np.asarray(vectors, dtype=np.float32))
+        self._reserve(len(ids), vectors.shape[1])
+        ref_doc_ids = ref_doc_ids or ["None"] * len(ids)
+        metadata = metadata or [{} for _ in ids]
+        positions = np.empty(len(ids), dtype=np.int64)
+        # Private attributes go through pydantic's __getattr__; bind them once per batch.
+        index, ids_list, ref_docs, metadata_list = self._positions, self._ids, self._ref_doc_ids, self._metadata
+        size = self._size
+        for i, node_id in enumerate(ids):
+            position = index.get(node_id)
+            if position is None:
+                position = size
+                size += 1
+                index[node_id] = position
+                ids_list.append(node_id)
+                ref_docs.append(ref_doc_ids[i])
+                metadata_list.append(metadata[i])
+            else:
+                ref_docs[position] = ref_doc_ids[i]
+                metadata_list[position] = metadata[i]
+            positions[i] = position
+        self._size = size
+        self._matrix[positions] = vectors
+        if scales is not None:
+            self._scales[positions] = scales
+        self._columns.clear()
+        return list(ids)
+
+    def _remove(self, positions: list[int]):
+        """Remove rows by moving the last rows into the gaps, keeping the matrix contiguous."""
+        if not positions:
+            return
+        self._reserve(0, self._matrix.shape[1])  # copy a memory-mapped matrix before writing
+        for position in sorted(positions, reverse=True):
+            last = self._size - 1
+            del self._positions[self._ids[position]]
+            if position != last:
+                self._matrix[position] = self._matrix[last]
+                if self._scales is not None:
+                    self._scales[position] = self._scales[last]
+                self._ids[position] = self._ids[last]
+                self._ref_doc_ids[position] = self._ref_doc_ids[last]
+                self._metadata[position] = self._metadata[last]
+                self._positions[self._ids[position]] = position
+            self._ids.pop()
+            self._ref_doc_ids.pop()
+            self._metadata.pop()
+            self._size -= 1
+        self._columns.clear()
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self.delete_ref_docs([ref_doc_id])
+
+    def delete_ref_docs(self, ref_doc_ids: Iterable[str]) -> None:
+        """Delete the nodes of several documents with a single pass over the rows."""
+        ref_doc_ids = set(ref_doc_ids)
+        self._remove([i for i, ref in enumerate(self._ref_doc_ids) if ref in ref_doc_ids])
+
+    def delete_nodes(self, node_ids: list[str] | None = None, filters: MetadataFilters | None = None, **kwargs: Any) -> None:
+        mask = self._mask(node_ids, filters)
+        self._remove(list(np.flatnonzero(mask)) if mask is not None else list(range(self._size)))
+
+    def clear(self) -> None:
+        self._remove(list(range(self._size)))
+
+    # --- Filters ------------------------------------------------------------
+
+    def _column(self, key: str) -> np.ndarray:
+        """Metadata values for `key` as an array: float64 (NaN when missing) if numeric, else object."""
+        if key not in self._columns:
+            values = [metadata.get(key) for metadata in self._metadata]
+            if all(isinstance(v, (int, float)) and not isinstance(v, bool) or v is None for v in values):
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+            self._columns[key] = column
+        return self._columns[key]
+
+    def _filter_mask(self, filters: MetadataFilters) -> np.ndarray:
+        masks = []
+        for f in filters.filters:
+            if isinstance(f, MetadataFilters):
+                masks.append(self._filter_mask(f))
+                continue
+            column = self._column(f.key)
+            if f.operator in _COMPARISONS and (column.dtype != object or f.operator in (FilterOperator.EQ, FilterOperator.NE)):
+                masks.append(_COMPARISONS[f.operator](column, f.value).astype(bool))
+            elif f.operator in (FilterOperator.IN, FilterOperator.NIN) and isinstance(f.value, list):
+                inside = np.isin(column, f.value)
+                masks.append(inside if f.operator == FilterOperator.IN else ~inside)
+            else:
+                # Operators on lists and text (ANY, CONTAINS, TEXT_MATCH, ...) use LlamaIndex's checks.
+                check = build_metadata_filter_fn(lambda i: self._metadata[i], MetadataFilters(filters=[f]))
+                masks.append(np.fromiter((check(i) for i in range(self._size)), dtype=bool, count=self._size))
+        if not masks:
+            return np.ones(self._size, dtype=bool)
+        if filters.condition == FilterCondition.OR:
+            return np.logical_or.reduce(masks)
+        mask = np.logical_and.reduce(masks)
+        return ~mask if filters.condition == FilterCondition.NOT else mask
+
+    def _mask(self, node_ids: list[str] | None, filters: MetadataFilters | None) -> np.ndarray | None:
+        mask = None
+        if filters is not None and filters.filters:
+            mask = self._filter_mask(filters)
+        if node_ids is not None:
+            allowed = np.zeros(self._size, dtype=bool)
+            allowed[[self._positions[i] for i in node_ids if i in self._positions]] = True
+            mask = allowed if mask is None else mask & allowed
+        return mask
+
+    # --- Queries ------------------------------------------------------------
+
+    def search(self, queries: np.ndarray, k: int, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-`k` rows for each query (one per row of `queries`): positions and
+        cosine similarities, best first. Rows where `mask` is False are skipped.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        best_positions = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, self._size, self.chunk_size):
+            end = min(start + self.chunk_size, self._size)
+            block = self._matrix[start:end]
+            scores = queries @ (block if block.dtype == np.float32 else block.astype(np.float32)).T
+            if self._scales is not None:
+                scores *= self._scales[start:end]
+            if mask is not None:
+                scores[:, ~mask[start:end]] = -np.inf
+            positions, values = top_k(scores, k)
+            best_positions = np.concatenate([best_positions, positions + start], axis=1)
+            best_scores = np.concatenate([best_scores, values], axis=1)
+            if best_positions.shape[1] > k:
+                order, best_scores = top_k(best_scores, k)
+                best_positions = np.take_along_axis(best_positions, order, axis=1)
+        return best_positions, best_scores
+
+    def _result(self, positions: np.ndarray, scores: np.ndarray) -> VectorStoreQueryResult:
+        keep = np.isfinite(scores)
+        return VectorStoreQueryResult(
+            ids=[self._ids[p] for p in positions[keep]],
+            similarities=scores[keep].tolist(),
+        )
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if self._size == 0 or query.query_embedding is None:
+            return VectorStoreQueryResult(ids=[], similarities=[])
+        mask = self._mask(query.node_ids, query.filters)
+        positions, scores = self.search(np.asarray(query.query_embedding), query.similarity_top_k, mask)
+        return self._result(positions[0], scores[0])
+
+    def batch_query(
+        self, embeddings: Sequence[Sequence[float]], similarity_top_k: int = 10, filters: MetadataFilters | None = None
+    ) -> list[VectorStoreQueryResult]:
+        """Answer several queries with one matrix product per block."""
+        if self._size == 0:
+            return [VectorStoreQueryResult(ids=[], similarities=[]) for _ in embeddings]
+        positions, scores = self.search(np.asarray(embeddings), similarity_top_k, self._mask(None, filters))
+        return [self._result(p, s) for p, s in zip(positions, scores)]
+
+    # --- Persistence --------------------------------------------------------
+
+    @staticmethod
+    def _array_paths(persist_path: str) -> tuple[str, str]:
+        base = persist_path[: -len(".json")] if persist_path.endswith(".json") else persist_path
+        return f"{base}.vectors.npy", f"{base}.scales.npy"
+
+    def persist(self, persist_path: str, fs: Any = None) -> None:
+        """Write the metadata as JSON to `persist_path` and the matrix next to it as .npy files."""
+        os.makedirs(os.path.dirname(persist_path) or ".", exist_ok=True)
+        vectors_path, scales_path = self._array_paths(persist_path)
+        arrays = [(vectors_path, self._matrix[: self._size] if self._matrix is not None else np.empty((0, 0), DTYPES[self.dtype]))]
+        if self._scales is not None:
+            arrays.append((scales_path, self._scales[: self._size]))
+        for path, array in arrays:
+            # The current file may be memory-mapped by this store: write a new one and swap it in.
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(f"{path}.tmp", path)
+        with open(f"{persist_path}.tmp", "w") as f:
+            json.dump({
+                "config": self.model_dump(exclude={"stores_text", "is_embedding_query"}),
+                "ids": self._ids,
+                "ref_doc_ids": self._ref_doc_ids,
+                "metadata": self._metadata,
+            }, f)
+        os.replace(f"{persist_path}.tmp", persist_path)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, fs: Any = None) -> "NumpyVectorStore":
+        """Load a persisted store; the matrix is memory-mapped, not read into memory."""
+        with open(persist_path, "r") as f:
+            data = json.load(f)
+        store = cls(**data["config"])
+        vectors_path, scales_path = cls._array_paths(persist_path)
+        if data["ids"]:
+            store._matrix = np.load(vectors_path, mmap_mode="r")
+            if store.dtype == "int8":
+                store._scales = np.load(scales_path, mmap_mode="r")
+        store._ids = data["ids"]
+        store._ref_doc_ids = data["ref_doc_ids"]
+        store._metadata = data["metadata"]
+        store._positions = {node_id: i for i, node_id in enumerate(store._ids)}
+        store._size = len(store._ids)
+        return store
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str, fs: Any = None) -> "NumpyVectorStore":
+        return cls.from_persist_path(os.path.join(persist_dir, DEFAULT_PERSIST_FNAME), fs=fs)
@@ -0,0 +1,83 @@
+"""
+Compact, token-budgeted serialization of Weaviate search results for prompts.
+
+Interpolating `results.search_results.objects` into a prompt pulls in the
+repr of every object: UUIDs, metadata, vectors and every property. The search
+step only needs a few properties per item to write a readable list, so
+`project_results` keeps the selected properties, truncates descriptions and
+serializes the rows as TSV (or minimal JSON lines), stopping once the next row
+would exceed `token_budget` tokens as counted by tiktoken.
+"""
+
+import json
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_PROPERTIES = ("name", "brand", "category", "price", "colors", "description")
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str):
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # The BPE files are downloaded on first use; without network access
+        # fall back to the usual ~4 characters per token estimate.
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = "o200k_base") -> int:
+    encoding = _encoding(encoding_name)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def _value(value, max_chars: int) -> str:
+    if isinstance(value, (list, tuple)):
+        value = ",".join(str(v) for v in value)
+    elif isinstance(value, float):
+        value = f"{value:.2f}"
+    text = " ".join(str(value).split())  # drops tabs and newlines
+    if len(text) > max_chars:
+        text = text[: max_chars - 1].rstrip() + "…"
+    return text
+
+
+def project_results(
+    objects,
+    properties: tuple[str, ...] = DEFAULT_PROPERTIES,
+    max_description_chars: int = 160,
+    token_budget: int = 1500,
+    format: str = "tsv",
+    encoding_name: str = "o200k_base",
+) -> str:
+    """
+    Serialize Weaviate objects (anything with a `.properties` dict) compactly.
+
+    `format` is "tsv" (a header row, then one row per object) or "json" (one
+    minimal JSON object per line). Rows that don't fit in `token_budget` are
+    dropped and replaced by a single "... N more results omitted" line.
+    """
+    def row(obj) -> str:
+        values = {
+            key: _value(obj.properties.get(key, ""), max_description_chars if key == "description" else 80)
+            for key in properties
+        }
+        if format == "json":
+            return json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+        return "\t".join(values.values())
+
+    lines = ["\t".join(properties)] if format == "tsv" else []
+    used = sum(count_tokens(line, encoding_name) for line in lines)
+    objects = list(objects)
+    for i, obj in enumerate(objects):
+        line = row(obj)
+        tokens = count_tokens(line, encoding_name) + 1  # + the newline
+        if used + tokens > token_budget:
+            lines.append(f"... {len(objects) - i} more results omitted")
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines)
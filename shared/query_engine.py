@@ -0,0 +1,291 @@
+"""
+Build the local e-commerce query engine used in chapter 1.
+
+Embedding every product on each start is slow and costs money, so the index is
+persisted to disk next to a small manifest. On the next start:
+  - nothing changed            -> the index is loaded as-is, no embeddings
+  - some products changed      -> only new/changed documents are re-embedded
+  - the embedding model changed -> the index is rebuilt from scratch
+The manifest also records the dataset's revision on the Hugging Face Hub
+(one small API call); when it is unchanged the index is loaded without
+streaming the dataset at all. Without a revision (offline, or rows that don't
+come from the Hub) the dataset is streamed and fingerprinted as above.
+Vectors live in a NumpyVectorStore (exact search). Once the index holds
+IVF_MIN_SIZE vectors it is loaded as an IVFVectorStore instead (see
+shared/ivf_vector_store.py), with `nprobe` calibrated to a recall target, since
+from that size on exact search is what makes query latency grow with the
+catalog. ECOMMERCE_VECTOR_STORE pins a store; changing it also rebuilds.
+"""
+
+import hashlib
+import json
+import os
+from itertools import islice
+from typing import Iterable, Iterator
+
+from llama_index.core import (
+    Document,
+    Settings,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+from llama_index.core.async_utils import asyncio_run
+from llama_index.core.ingestion import run_transformations
+
+from shared.embedding_pipeline import embed_into_index
+from shared.ivf_vector_store import IVFVectorStore
+from shared.numpy_vector_store import NumpyVectorStore
+
+PERSIST_DIR = os.getenv("ECOMMERCE_INDEX_DIR", "storage/ecommerce_index")
+MANIFEST_FILE = "manifest.json"
+# "simple" (LlamaIndex's default store), "numpy" (exact search), "ivf" (approximate) or
+# "auto" (numpy, ivf from IVF_MIN_SIZE vectors on); all but simple take an optional dtype: "auto:float16", ...
+VECTOR_STORE = os.getenv("ECOMMERCE_VECTOR_STORE", "auto")
+# Measured with benchmarks/ann_index.py: below ~50k vectors IVF at 0.95 recall is at most ~2x faster than exact search.
+IVF_MIN_SIZE = IVFVectorStore.model_fields["min_train_size"].default
+DATASET = ("weaviate/agents", "query-agent-ecommerce")
+
+
+def dataset_revision(limit: int | None = None) -> str | None:
+    """
+    The dataset's current commit on the Hub plus the row limit, or None when
+    the Hub can't be reached. Cheap compared to streaming the rows.
+    """
+    from huggingface_hub import HfApi
+
+    try:
+        sha = HfApi().dataset_info(DATASET[0], timeout=10).sha
+    except Exception as e:
+        print(f"⚠ Couldn't read the dataset revision ({type(e).__name__}), fingerprinting every row")
+        return None
+    return f"{sha}:{limit}" if sha else None
+
+
+def iter_document_batches(
+    limit: int | None = None, batch_size: int = 32, revision: str | None = None
+) -> Iterator[list[Document]]:
+    """
+    Lazily pull rows from the streamed Hugging Face dataset and yield them as
+    lists of at most `batch_size` documents. Only one batch is held in memory
+    at a time, so memory use depends on `batch_size`, not on the dataset size.
+    By default the whole dataset is read; `limit` caps the number of rows.
+    `revision` pins the Hub commit (see `dataset_revision`).
+    """
+    # `datasets` takes seconds to import and is only needed when the index is (re)built.
+    from datasets import load_dataset
+
+    ecommerce_dataset = load_dataset(
+        *DATASET, split="train", streaming=True, revision=revision.split(":")[0] if revision else None
+    )
+    batch = []
+    for row in islice(ecommerce_dataset, limit):
+        batch.append(to_document(row))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def to_document(row: dict) -> Document:
+    """
+    Turn a dataset row into a Document with a stable id, so the same product
+    maps to the same document across runs and can be refreshed in place.
+    The id comes from the row's uuid or `product_id`; rows without either are
+    keyed on all of their properties (names repeat within a category).
+    """
+    properties = row["properties"]
+    stable_id = row.get("uuid") or properties.get("product_id")
+    key = str(stable_id) if stable_id else json.dumps(properties, sort_keys=True, default=str)
+    doc_id = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return Document(
+        id_=doc_id,
+        text=properties["description"],
+        metadata={"name": properties["name"], "price": properties["price"], "category": properties["category"]},
+    )
+
+
+def _read_manifest(persist_dir: str) -> dict | None:
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_manifest(persist_dir: str, manifest: dict):
+    with open(os.path.join(persist_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _vector_store(spec: str, persist_dir: str | None = None, size: int = 0):
+    """
+    The vector store for `spec`, loaded from `persist_dir` when given. None
+    means LlamaIndex's default. "auto" is decided by the number of vectors, `size`.
+    """
+    kind, _, dtype = spec.partition(":")
+    if kind == "simple":
+        return None
+    if kind == "auto":
+        # Both stores persist the same files, so the index can switch between them on load.
+        kind = "ivf" if size >= IVF_MIN_SIZE else "numpy"
+    if kind in ("numpy", "ivf"):
+        store_class = NumpyVectorStore if kind == "numpy" else IVFVectorStore
+        if persist_dir is not None:
+            return store_class.from_persist_dir(persist_dir)
+        return store_class(dtype=dtype or "float32")
+    raise ValueError(f"Unknown vector store {spec!r}")
+
+
+def _stale_documents(index: VectorStoreIndex, batch: list[Document]) -> list[Document]:
+    """
+    Return the documents of `batch` that are new or changed, removing any older
+    version of them from the index so they can be inserted again.
+    """
+    stale = [document for document in batch if index.docstore.get_document_hash(document.id_) != document.hash]
+    _delete_documents(index, [d.id_ for d in stale if index.docstore.get_document_hash(d.id_) is not None])
+    for document in stale:
+        index.docstore.set_document_hash(document.id_, document.hash)
+    return stale
+
+
+def _delete_documents(index: VectorStoreIndex, ref_doc_ids: list[str]):
+    """
+    `index.delete_ref_doc(..., delete_from_docstore=True)` for many documents.
+    Deleting one at a time scans every vector once per document and once per
+    node; a store with `delete_ref_docs` removes them all in one pass.
+    """
+    if not ref_doc_ids:
+        return
+    vector_store = index.vector_store
+    if not hasattr(vector_store, "delete_ref_docs"):
+        for ref_doc_id in ref_doc_ids:
+            index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+        return
+    vector_store.delete_ref_docs(ref_doc_ids)
+    for ref_doc_id in ref_doc_ids:
+        ref_doc_info = index.docstore.get_ref_doc_info(ref_doc_id)
+        if ref_doc_info is not None:
+            for node_id in ref_doc_info.node_ids:
+                index.index_struct.delete(node_id)
+        index.docstore.delete_ref_doc(ref_doc_id, raise_error=False)
+    index.storage_context.index_store.add_index_struct(index.index_struct)
+
+
+def load_or_build_index(
+    document_batches: Iterable[list[Document]],
+    persist_dir: str = PERSIST_DIR,
+    embed_batch_size: int | None = None,
+    max_in_flight: int = 4,
+    vector_store: str = VECTOR_STORE,
+    revision: str | None = None,
+) -> VectorStoreIndex:
+    """
+    Feed `document_batches` into a VectorStoreIndex one batch at a time,
+    reusing the persisted index in `persist_dir` whenever possible. New and
+    changed documents are embedded concurrently, see `embed_into_index`.
+    When `revision` (of the source the batches come from) matches the one the
+    index was built from, the batches aren't read at all.
+    """
+    embed_model_name = Settings.embed_model.model_name
+    manifest = _read_manifest(persist_dir)
+
+    if manifest and manifest["embed_model"] == embed_model_name and manifest.get("vector_store", "simple") == vector_store:
+        storage_context = StorageContext.from_defaults(
+            persist_dir=persist_dir, vector_store=_vector_store(vector_store, persist_dir, manifest.get("vectors", 0))
+        )
+        index = load_index_from_storage(storage_context)
+        if revision is not None and manifest.get("revision") == revision:
+            print(f"✓ Loaded cached index from {persist_dir} (dataset revision unchanged)")
+            return index
+    else:
+        manifest = None
+        storage_context = StorageContext.from_defaults(vector_store=_vector_store(vector_store))
+        index = VectorStoreIndex(nodes=[], storage_context=storage_context)
+
+    # Fingerprint of every document's text and metadata plus the embedding model name.
+    digest = hashlib.sha256(embed_model_name.encode("utf-8"))
+    seen_ids = set()
+
+    def stale_nodes():
+        for batch in document_batches:
+            for document in batch:
+                digest.update(document.id_.encode("utf-8"))
+                digest.update(document.hash.encode("utf-8"))
+                seen_ids.add(document.id_)
+            stale = _stale_documents(index, batch)
+            if stale:
+                yield from run_transformations(stale, Settings.transformations)
+
+    # asyncio_run also works when called from inside a running event loop.
+    stats = asyncio_run(
+        embed_into_index(
+            index,
+            stale_nodes(),
+            Settings.embed_model,
+            batch_size=embed_batch_size,
+            max_in_flight=max_in_flight,
+        )
+    )
+    current = digest.hexdigest()
+
+    if manifest and manifest["fingerprint"] == current:
+        print(f"✓ Loaded cached index from {persist_dir}")
+        if revision is not None and manifest.get("revision") != revision:
+            _write_manifest(persist_dir, {**manifest, "revision": revision})
+        return index
+
+    removed = [doc_id for doc_id in index.ref_doc_info if doc_id not in seen_ids]
+    for doc_id in removed:
+        index.delete_ref_doc(doc_id, delete_from_docstore=True)
+    if manifest:
+        print(f"✓ Refreshed cached index: {len(removed)} removed, {stats.report()}")
+    else:
+        print(f"✓ Built new index: {stats.report()}")
+
+    os.makedirs(persist_dir, exist_ok=True)
+    index.storage_context.persist(persist_dir=persist_dir)
+    size = getattr(index.vector_store, "size", 0)
+    _write_manifest(
+        persist_dir,
+        {
+            "embed_model": embed_model_name,
+            "vector_store": vector_store,
+            "vectors": size,
+            "fingerprint": current,
+            "revision": revision,
+        },
+    )
+    store = _vector_store(vector_store, size=size)
+    if store is not None and type(store) is not type(index.vector_store):
+        # "auto" crossed IVF_MIN_SIZE: reload the persisted vectors into the other store.
+        storage_context = StorageContext.from_defaults(
+            persist_dir=persist_dir, vector_store=_vector_store(vector_store, persist_dir, size)
+        )
+        index = load_index_from_storage(storage_context)
+        index.storage_context.persist(persist_dir=persist_dir)  # with the clusters, so later loads don't retrain
+    return index
+
+
+def create_query_engine(
+    limit: int | None = None,
+    batch_size: int = 32,
+    persist_dir: str = PERSIST_DIR,
+    embed_batch_size: int | None = None,
+    max_in_flight: int = 4,
+    vector_store: str = VECTOR_STORE,
+):
+    revision = dataset_revision(limit)
+    # A generator: no rows are streamed unless the index needs them.
+    document_batches = iter_document_batches(limit=limit, batch_size=batch_size, revision=revision)
+    index = load_or_build_index(
+        document_batches,
+        persist_dir=persist_dir,
+        embed_batch_size=embed_batch_size,
+        max_in_flight=max_in_flight,
+        vector_store=vector_store,
+        revision=revision,
+    )
+    engine = index.as_query_engine(similarity_top_k=10)
+    return engine
@@ -0,0 +1,264 @@
+"""
+Client-side query vectors for Weaviate searches.
+
+`near_text` and `hybrid` make Weaviate vectorize the query text on every call,
+even for the same popular queries. `QueryVectorCache` embeds each distinct
+query once, keeps the vectors in an LRU cache and persists them to disk, so
+they survive restarts. `VectorSearch` sends the cached vector with
+`near_vector` / `hybrid(vector=...)` instead of the text.
+
+Query vectors must come from the model that vectorized the objects. The
+ECommerce collection (02_03) is vectorized by `text2vec_weaviate`, so
+`WeaviateEmbedding` asks the same Weaviate Embeddings service (and model) for
+the query vectors. The weaviate client has no API for that service, and the
+request `WeaviateEmbedding` sends has not been checked against it yet, so
+`VectorSearch.for_collection` only uses it with WEAVIATE_QUERY_VECTORS=1;
+otherwise (and if the service can't be reached) the text is sent and Weaviate
+vectorizes it, exactly as `near_text` does.
+
+    search = VectorSearch.for_collection(collection)
+    response = search.near_text("smart pants", limit=2)
+    print(search.stats())  # {'hits': ..., 'misses': ..., 'hit_rate': ..., 'fallbacks': ...}
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import httpx
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import Field
+
+QUERY_VECTOR_CACHE = os.getenv("QUERY_VECTOR_CACHE", "storage/query_vectors.npz")
+# Opt-in: client-side query vectors from the Weaviate Embeddings service (unverified request format).
+WEAVIATE_QUERY_VECTORS = os.getenv("WEAVIATE_QUERY_VECTORS") == "1"
+WEAVIATE_EMBEDDINGS_URL = os.getenv("WEAVIATE_EMBEDDINGS_URL", "https://api.embedding.weaviate.io")
+# Named vector of the ECommerce collection, and the model text2vec_weaviate uses when none is configured.
+QUERY_TARGET_VECTOR = "default"
+WEAVIATE_EMBED_MODEL = "Snowflake/snowflake-arctic-embed-l-v2.0"
+
+
+class WeaviateEmbedding(BaseEmbedding):
+    """
+    The Weaviate Embeddings service behind `text2vec_weaviate`, called from the
+    client. It authenticates with the cluster's URL and API key, as the
+    cluster itself does. The endpoint, header and payload are not from a
+    published client: verify them before relying on this (see the module
+    docstring).
+    """
+
+    model_name: str = WEAVIATE_EMBED_MODEL
+    cluster_url: str = Field(default_factory=lambda: os.getenv("WEAVIATE_URL", ""))
+    api_key: str = Field(default_factory=lambda: os.getenv("WEAVIATE_API_KEY", ""), exclude=True, repr=False)
+    base_url: str = WEAVIATE_EMBEDDINGS_URL
+    timeout: float = 30.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "WeaviateEmbedding"
+
+    @classmethod
+    def for_collection(cls, collection, target_vector: str = QUERY_TARGET_VECTOR, **kwargs) -> "WeaviateEmbedding":
+        """An embedding with the model `collection` vectorizes `target_vector` with."""
+        vector_config = collection.config.get().vector_config or {}
+        vectorizer = vector_config[target_vector].vectorizer if target_vector in vector_config else None
+        model = (vectorizer.model or {}).get("model") if vectorizer is not None else None
+        return cls(model_name=model or WEAVIATE_EMBED_MODEL, **kwargs)
+
+    def _request(self, texts: list[str], is_search_query: bool) -> dict:
+        cluster_url = self.cluster_url if "://" in self.cluster_url else f"https://{self.cluster_url}"
+        return {
+            "url": f"{self.base_url.rstrip('/')}/v1/embeddings/embed",
+            "headers": {"Authorization": f"Bearer {self.api_key}", "X-Weaviate-Cluster-URL": cluster_url},
+            "json": {"texts": texts, "model": self.model_name, "is_search_query": is_search_query},
+            "timeout": self.timeout,
+        }
+
+    def _embed(self, texts: list[str], is_search_query: bool = False) -> list[list[float]]:
+        response = httpx.post(**self._request(texts, is_search_query))
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    async def _aembed(self, texts: list[str], is_search_query: bool = False) -> list[list[float]]:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(**self._request(texts, is_search_query))
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        return self._embed([query], is_search_query=True)[0]
+
+    async def _aget_query_embedding(self, query: str) -> list[float]:
+        return (await self._aembed([query], is_search_query=True))[0]
+
+    def _get_text_embedding(self, text: str) -> list[float]:
+        return self._embed([text])[0]
+
+    def _get_text_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts)
+
+    async def _aget_text_embedding(self, text: str) -> list[float]:
+        return (await self._aembed([text]))[0]
+
+
+class QueryVectorCache:
+    """
+    LRU cache of query text -> query vector, persisted to `path` (None keeps
+    it in memory only). Vectors cached for a different embedding model are
+    ignored when loading.
+    """
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding | None = None,
+        path: str | None = QUERY_VECTOR_CACHE,
+        max_entries: int = 10000,
+        autosave_every: int = 100,
+    ):
+        self._embed_model = embed_model
+        self.path = path
+        self.max_entries = max_entries
+        self.autosave_every = autosave_every
+        self.hits = 0
+        self.misses = 0
+        self._unsaved = 0
+        self._vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def embed_model(self) -> BaseEmbedding:
+        return self._embed_model or Settings.embed_model
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "entries": len(self._vectors)}
+
+    @staticmethod
+    def _key(query: str) -> str:
+        # Only whitespace is normalized: case can change the embedding.
+        return " ".join(query.split())
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["model"]) != self.embed_model.model_name:
+                    return
+                for query, vector in zip(data["queries"].tolist(), data["vectors"]):
+                    self._vectors[query] = vector
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Ignoring unreadable query vector cache {self.path}: {e}")
+
+    def save(self):
+        """Write the cache to `path` (atomically)."""
+        if not self.path:
+            return
+        with self._lock:
+            queries = list(self._vectors)
+            vectors = np.stack(list(self._vectors.values())) if queries else np.zeros((0, 0), dtype=np.float32)
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp.npz"
+        np.savez(tmp_path, model=np.array(self.embed_model.model_name), queries=np.array(queries, dtype=str), vectors=vectors)
+        os.replace(tmp_path, self.path)
+
+    def _lookup(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._vectors.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _store(self, key: str, vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+            self._unsaved += 1
+            autosave = self.autosave_every and self._unsaved >= self.autosave_every
+        if autosave:
+            self.save()
+        return vector
+
+    def get(self, query: str) -> list[float]:
+        """The vector for `query`, embedding it only on a cache miss."""
+        key = self._key(query)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self._store(key, self.embed_model.get_query_embedding(query))
+        return vector.tolist()
+
+    async def aget(self, query: str) -> list[float]:
+        key = self._key(query)
+        vector = self._lookup(key)
+        if vector is None:
+            vector = self._store(key, await self.embed_model.aget_query_embedding(query))
+        return vector.tolist()
+
+
+class VectorSearch:
+    """
+    `near_text` / `hybrid` with the same arguments as `collection.query`, but
+    sending a cached client-side query vector (on `target_vector`) when given
+    a `cache`. Without one, or once a query can't be embedded, texts are sent
+    and Weaviate vectorizes them.
+    """
+
+    def __init__(self, collection, cache: QueryVectorCache | None = None, target_vector: str = QUERY_TARGET_VECTOR):
+        self.collection = collection
+        self.cache = cache
+        self.target_vector = target_vector
+        self.fallbacks = 0
+
+    @classmethod
+    def for_collection(cls, collection, target_vector: str = QUERY_TARGET_VECTOR, enabled: bool | None = None) -> "VectorSearch":
+        """Search `collection`, with cached `WeaviateEmbedding` query vectors if `enabled` (default: WEAVIATE_QUERY_VECTORS)."""
+        enabled = WEAVIATE_QUERY_VECTORS if enabled is None else enabled
+        cache = QueryVectorCache(WeaviateEmbedding.for_collection(collection, target_vector)) if enabled else None
+        return cls(collection, cache, target_vector)
+
+    def stats(self) -> dict:
+        return {**(self.cache.stats() if self.cache is not None else {}), "fallbacks": self.fallbacks}
+
+    def save(self):
+        if self.cache is not None:
+            self.cache.save()
+
+    def _vector(self, query: str) -> list[float] | None:
+        if self.cache is None:
+            return None
+        if self.fallbacks:
+            # Don't wait on a failing service for every query.
+            self.fallbacks += 1
+            return None
+        try:
+            return self.cache.get(query)
+        except Exception as e:
+            print(f"⚠ Embedding queries client-side failed ({type(e).__name__}: {e}), letting Weaviate vectorize them")
+            self.fallbacks += 1
+            return None
+
+    def near_text(self, query: str, **kwargs):
+        vector = self._vector(query)
+        if vector is None:
+            return self.collection.query.near_text(query=query, target_vector=self.target_vector, **kwargs)
+        return self.collection.query.near_vector(near_vector=vector, target_vector=self.target_vector, **kwargs)
+
+    def hybrid(self, query: str, **kwargs):
+        # The text is still sent for the keyword (BM25) half of the hybrid search.
+        return self.collection.query.hybrid(
+            query=query, vector=self._vector(query), target_vector=self.target_vector, **kwargs
+        )
@@ -0,0 +1,207 @@
+"""
+Invalidation-aware cache for Weaviate query results.
+
+Reads outnumber writes by orders of magnitude, so most searches can be served
+from memory as long as the collection hasn't changed. `ResultCache.wrap`
+caches the results of query methods (`collection.query.near_text`, `bm25`,
+`hybrid`, `QueryAgent.search`, ...) keyed on the method and every argument:
+query, alpha, limit, filters, returned properties and so on.
+
+Every collection has a generation number. `invalidate_on_writes` wraps the
+write methods of `collection.data` so each write made in this process bumps
+the generation, which drops that collection's cached results. Writes made by
+other processes are not seen; `ttl` bounds how stale those results can get.
+
+With `shared` (a SharedCache), misses are looked up in the cache shared by the
+other worker processes before querying, results are written through to it,
+and invalidations reach every worker through the shared generation. Only
+JSON results (strings, numbers, lists, dicts) are shared; others stay in
+this process's cache. Shared entries live under the "results" namespace, so
+invalidating every collection leaves the other users of the SharedCache alone.
+
+    cache = ResultCache(max_entries=1000, ttl=300)
+    cache.wrap(collection.query, "ECommerce", "near_text", "bm25", "hybrid")
+    invalidate_on_writes(collection.data, "ECommerce")
+"""
+
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from shared.shared_cache import SharedCache
+
+WRITE_METHODS = ("insert", "insert_many", "replace", "update", "delete_by_id", "delete_many")
+
+_generations: dict[str, int] = {}
+_generations_lock = threading.Lock()
+_caches: "weakref.WeakSet[ResultCache]" = weakref.WeakSet()
+SHARED_NAMESPACE = "results"
+
+
+def generation(collection_name: str) -> int:
+    return _generations.get(collection_name, 0)
+
+
+def bump_generation(collection_name: str):
+    """Mark every cached result for `collection_name` as stale (in every ResultCache)."""
+    with _generations_lock:
+        _generations[collection_name] = _generations.get(collection_name, 0) + 1
+        caches = list(_caches)
+    for cache in caches:
+        cache.invalidate(collection_name)
+
+
+def invalidate_on_writes(data, collection_name: str, methods=WRITE_METHODS):
+    """
+    Wrap the write methods of `collection.data` (the object the writes go
+    through) so every write bumps the collection's generation. Returns `data`.
+    """
+    for name in methods:
+        method = getattr(data, name, None)
+        if method is None:
+            continue
+
+        def write(*args, _method=method, **kwargs):
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                bump_generation(collection_name)
+
+        setattr(data, name, write)
+    return data
+
+
+def _canonical(value) -> str:
+    """A stable text form of a call argument (filters, MetadataQuery, vectors, ...)."""
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_canonical(v) for v in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{k!r}:{_canonical(v)}" for k, v in sorted(value.items())) + "}"
+    text = repr(value)
+    if " object at 0x" in text and hasattr(value, "__dict__"):
+        # Objects without a useful repr (e.g. Filter.all_of(...)) are keyed on their attributes.
+        return f"{type(value).__name__}({_canonical(vars(value))})"
+    return text
+
+
+@dataclass
+class _Entry:
+    collection: str
+    generation: int
+    result: Any
+    created_at: float
+
+
+def _shared_namespace(collection_name: str) -> str:
+    return f"{SHARED_NAMESPACE}:{collection_name}"
+
+
+class ResultCache:
+    """
+    LRU cache of query results. Entries expire after `ttl` seconds (None keeps
+    them until evicted or invalidated), and the least recently used entries
+    are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float | None = 300, shared: SharedCache | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        with _generations_lock:
+            _caches.add(self)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self._entries),
+            "invalidations": self.invalidations,
+            "shared_hits": self.shared_hits,
+        }
+
+    def _generation(self, collection_name: str) -> int:
+        # Both counters only grow, so their sum changes whenever either does.
+        shared = self.shared.generation(_shared_namespace(collection_name)) if self.shared is not None else 0
+        return generation(collection_name) + shared
+
+    def invalidate(self, collection_name: str | None = None):
+        """Drop the cached results of `collection_name` (or of every collection)."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if collection_name in (None, entry.collection)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+        if self.shared is not None:
+            self.shared.invalidate(SHARED_NAMESPACE if collection_name is None else _shared_namespace(collection_name))
+
+    def _lookup(self, key: str, collection_name: str, current_generation: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                entry.generation != current_generation
+                or (self.ttl is not None and time.monotonic() - entry.created_at > self.ttl)
+            ):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry.result
+
+    def _store(self, key: str, collection_name: str, current_generation: int, result):
+        with self._lock:
+            if current_generation != self._generation(collection_name):
+                return  # a write landed while the query ran; the result may be stale already
+            self._entries[key] = _Entry(collection_name, current_generation, result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def call(self, collection_name: str, method, name: str, *args, **kwargs):
+        """`method(*args, **kwargs)`, served from the cache when an identical call is cached."""
+        key = hashlib.sha1(f"{collection_name}|{name}|{_canonical(args)}|{_canonical(kwargs)}".encode("utf-8")).hexdigest()
+        current_generation = self._generation(collection_name)
+        found, result = self._lookup(key, collection_name, current_generation)
+        if found:
+            return result
+        if self.shared is not None:
+            found, result = self.shared.get(_shared_namespace(collection_name), key)
+            if found:
+                self.shared_hits += 1
+                self._store(key, collection_name, current_generation, result)
+                return result
+        result = method(*args, **kwargs)
+        self._store(key, collection_name, current_generation, result)
+        if self.shared is not None and current_generation == self._generation(collection_name):
+            self.shared.set(_shared_namespace(collection_name), key, result)
+        return result
+
+    def wrap(self, obj, collection_name: str, *method_names: str):
+        """Cache the results of `obj.<method>` for each name, in place. Returns `obj`."""
+        label = type(obj).__name__
+        for name in method_names:
+            method = getattr(obj, name)
+
+            def cached(*args, _method=method, _name=f"{label}.{name}", **kwargs):
+                return self.call(collection_name, _method, _name, *args, **kwargs)
+
+            setattr(obj, name, cached)
+        return obj
@@ -0,0 +1,277 @@
+"""
+Local query routing for the workflow agents.
+
+The workflows used to spend a full LLM completion on every request just to
+pick one label, and stalled when the reply did not match a label exactly.
+`QueryRouter` classifies locally first:
+  1. keyword patterns, when exactly one route matches
+  2. nearest centroid over embeddings of labelled examples (embedded once)
+and only asks the LLM, constrained to the route names, when neither is
+confident. It always returns one of the route names. With a SharedCache,
+embedding and LLM decisions are shared by every worker process (as label and
+confidence; a cached label that isn't a route name is ignored).
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Literal
+
+import numpy as np
+from pydantic import create_model
+
+from shared.shared_cache import SharedCache
+
+if TYPE_CHECKING:
+    # llama_index.core takes seconds to import; it is imported when a router is built.
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.llms import LLM
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Route:
+    name: str
+    description: str
+    examples: list[str]
+    keywords: list[str] = field(default_factory=list)
+
+
+@dataclass
+class RouteDecision:
+    label: str
+    confidence: float
+    source: str  # "keyword", "embedding", "llm" or "default"
+
+
+ECOMMERCE_ROUTE = Route(
+    name="ECommerce",
+    description="The query is about clothing items and prices.",
+    examples=[
+        "Do you have floral summer dresses?",
+        "What is the price of the leather boots?",
+        "Show me jackets under $100",
+        "cheap t-shirts",
+        "Which handbags are on sale?",
+        "I need comfortable running shoes",
+    ],
+    keywords=[r"\b(dress|dresses|shirts?|t-shirts?|jackets?|shoes|boots|sneakers|handbags?|jeans|hoodies?|sweaters?|skirts?|clothing|clothes)\b"],
+)
+
+OTHER_ROUTE = Route(
+    name="Other",
+    description="The query is about something else.",
+    examples=[
+        "Where can I buy a macbook?",
+        "What's the weather like today?",
+        "Tell me a joke",
+        "How do I fix my laptop?",
+        "Who won the football game yesterday?",
+        "Book me a flight to Paris",
+    ],
+)
+
+ASK_ROUTE = Route(
+    name="Ask",
+    description="The query is a question that can be answered in natural language.",
+    examples=[
+        "I'm looking for a dress for a summer party. What can you recommend?",
+        "Which brand makes the most comfortable shoes?",
+        "What should I wear to a wedding?",
+        "Is the Stellar Mesh Hoodie warm enough for winter?",
+    ],
+    keywords=[r"\b(recommend|suggest|why|should i)\b"],
+)
+
+SEARCH_ROUTE = Route(
+    name="Search",
+    description="The query is a question that can be answered by searching the database and returning a list of objects.",
+    examples=[
+        "Find me some vintage floral dresses under $60",
+        "Show me all red sneakers",
+        "List leather jackets",
+        "Search for wool sweaters",
+        "vintage shoes",
+        "black hoodies by Urban Threadline",
+    ],
+    keywords=[r"^(find|show|list|search)\b"],
+)
+
+STATS_ROUTE = Route(
+    name="Stats",
+    description="The query asks for counts, average/min/max prices, or the most common colors or tags of the catalog or a category.",
+    examples=[
+        "How many items do we have in the Footwear category?",
+        "What is the average price of handbags?",
+        "What's the price range for jackets?",
+        "How many products are in the catalog?",
+        "Which colors are most common for tops?",
+        "What is the highest price in Outerwear?",
+    ],
+    keywords=[r"\b(how many|number of|average|avg|price range|(lowest|highest|minimum|maximum) price)\b"],
+)
+
+ADMIN_ROUTE = Route(
+    name="Admin",
+    description="The query is about adding an item to the collection.",
+    examples=[
+        "Add item 3 to the collection",
+        "Please insert the new item at index 0",
+        "Add items 0-7",
+        "Add all Cottagecore items to the catalog",
+        "Upload new product number 5",
+    ],
+    keywords=[r"\b(add|insert|upload|import)\b.*\b(items?|products?|collection|catalog)\b"],
+)
+
+
+class QueryRouter:
+    """
+    Route a query to one of `routes`.
+
+    The embedding step is confident when the best centroid similarity is at
+    least `min_similarity` and beats the runner-up by `min_margin`. Below that
+    the LLM is asked (if one is given); if the LLM fails too, `default` (the
+    first route unless set) is returned. Embedding and LLM decisions are kept
+    in `shared_cache` when given, keyed on the query ignoring case and spacing.
+    """
+
+    def __init__(
+        self,
+        routes: list[Route],
+        llm: "LLM | None" = None,
+        embed_model: "BaseEmbedding | None" = None,
+        min_similarity: float = 0.3,
+        min_margin: float = 0.03,
+        default: str | None = None,
+        shared_cache: SharedCache | None = None,
+    ):
+        from llama_index.core import PromptTemplate
+
+        self.routes = routes
+        self.llm = llm
+        self._embed_model = embed_model
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.default = default or routes[0].name
+        self.decisions = Counter()
+        self.shared_cache = shared_cache
+        self._namespace = "router:" + ",".join(route.name for route in routes)
+        self._keywords = [
+            (route.name, [re.compile(pattern, re.IGNORECASE) for pattern in route.keywords]) for route in routes
+        ]
+        self._centroids: np.ndarray | None = None
+        self._lock = threading.Lock()
+        # Steps run on worker threads, so decisions are counted under a lock of their own.
+        self._decisions_lock = threading.Lock()
+        names = tuple(route.name for route in routes)
+        self._route_names = frozenset(names)
+        self._choice_model = create_model("RouteChoice", label=(Literal[names], ...))
+        self._prompt = PromptTemplate(
+            "Given the query '{query}', return the relevant category of the query.\n"
+            + "\n".join(f"Return '{route.name}' if: {route.description}" for route in routes)
+        )
+
+    @property
+    def embed_model(self) -> "BaseEmbedding":
+        from llama_index.core import Settings
+
+        return self._embed_model or Settings.embed_model
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _match_keywords(self, query: str) -> RouteDecision | None:
+        matches = [name for name, patterns in self._keywords if any(p.search(query) for p in patterns)]
+        if len(matches) == 1:
+            return RouteDecision(label=matches[0], confidence=1.0, source="keyword")
+        return None
+
+    def _build_centroids(self, embed_batch) -> np.ndarray:
+        # All examples are embedded in one request, once per router.
+        texts = [example for route in self.routes for example in route.examples]
+        vectors = self._normalize(embed_batch(texts))
+        centroids, start = [], 0
+        for route in self.routes:
+            centroids.append(vectors[start:start + len(route.examples)].mean(axis=0))
+            start += len(route.examples)
+        return self._normalize(centroids)
+
+    def _nearest_centroid(self, vector) -> RouteDecision | None:
+        similarities = self._centroids @ self._normalize(vector)
+        order = np.argsort(similarities)[::-1]
+        best = similarities[order[0]]
+        margin = best - similarities[order[1]] if len(order) > 1 else best
+        if best >= self.min_similarity and margin >= self.min_margin:
+            return RouteDecision(label=self.routes[order[0]].name, confidence=float(margin), source="embedding")
+        return None
+
+    def _decide(self, decision: RouteDecision, query: str | None = None) -> RouteDecision:
+        with self._decisions_lock:
+            self.decisions[decision.source] += 1
+        if query is not None and self.shared_cache is not None:
+            self.shared_cache.set(self._namespace, " ".join(query.lower().split()), [decision.label, decision.confidence])
+        return decision
+
+    def _cached(self, query: str) -> RouteDecision | None:
+        if self.shared_cache is None:
+            return None
+        found, value = self.shared_cache.get(self._namespace, " ".join(query.lower().split()))
+        if not found:
+            return None
+        try:
+            label, confidence = value
+        except (TypeError, ValueError):
+            return None
+        if label not in self._route_names:
+            return None
+        return RouteDecision(label=label, confidence=float(confidence), source="cache")
+
+    def route(self, query: str) -> RouteDecision:
+        decision = self._match_keywords(query) or self._cached(query)
+        if decision:
+            return self._decide(decision)
+
+        with self._lock:
+            if self._centroids is None:
+                self._centroids = self._build_centroids(self.embed_model.get_text_embedding_batch)
+        decision = self._nearest_centroid(self.embed_model.get_query_embedding(query))
+        if decision:
+            return self._decide(decision, query)
+
+        if self.llm is not None:
+            try:
+                choice = self.llm.structured_predict(self._choice_model, self._prompt, query=query)
+                return self._decide(RouteDecision(label=choice.label, confidence=0.0, source="llm"), query)
+            except Exception as e:
+                logger.warning("Router LLM fallback failed (%s), using %r", e, self.default)
+        return self._decide(RouteDecision(label=self.default, confidence=0.0, source="default"))
+
+    async def aroute(self, query: str) -> RouteDecision:
+        decision = self._match_keywords(query) or self._cached(query)
+        if decision:
+            return self._decide(decision)
+
+        if self._centroids is None:
+            texts = [example for route in self.routes for example in route.examples]
+            vectors = await self.embed_model.aget_text_embedding_batch(texts)
+            with self._lock:
+                if self._centroids is None:
+                    self._centroids = self._build_centroids(lambda _: vectors)
+        decision = self._nearest_centroid(await self.embed_model.aget_query_embedding(query))
+        if decision:
+            return self._decide(decision, query)
+
+        if self.llm is not None:
+            try:
+                choice = await self.llm.astructured_predict(self._choice_model, self._prompt, query=query)
+                return self._decide(RouteDecision(label=choice.label, confidence=0.0, source="llm"), query)
+            except Exception as e:
+                logger.warning("Router LLM fallback failed (%s), using %r", e, self.default)
+        return self._decide(RouteDecision(label=self.default, confidence=0.0, source="default"))
@@ -0,0 +1,235 @@
+"""
+Semantic response cache for query engines.
+
+Paraphrased questions ("cheap floral dress", "affordable floral dresses") end
+up with very similar embeddings, so the answer to one can be served for the
+other without running retrieval and LLM synthesis again. Lookups embed the
+query (one cheap embedding call) and return the cached response of the most
+similar cached query above `similarity_threshold`.
+
+    cache = SemanticCache(similarity_threshold=0.92)
+    query_engine = cache.wrap(create_query_engine())
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.response.schema import Response
+
+
+@dataclass
+class _Entry:
+    query: str
+    row: int  # of the vector in SemanticCache._matrix
+    response: str
+    created_at: float
+    size: int
+
+
+class SemanticCache:
+    """
+    LRU cache of query -> response, looked up by embedding similarity.
+
+    Entries expire after `ttl` seconds (None keeps them forever), and the
+    least recently used entries are evicted once there are more than
+    `max_entries` of them or they take more than `max_bytes`.
+
+    Query vectors are rows of one matrix, so a lookup is a single product.
+    Rows freed by evictions are reused; hits only update the LRU order.
+    """
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding | None = None,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float | None = 3600,
+    ):
+        self._embed_model = embed_model
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._matrix: np.ndarray | None = None
+        self._live = np.zeros(0, dtype=bool)
+        self._row_keys: list[str | None] = []
+        self._free_rows: list[int] = []
+        self._lock = threading.Lock()
+
+    @property
+    def embed_model(self) -> BaseEmbedding:
+        return self._embed_model or Settings.embed_model
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        self._live[entry.row] = False
+        self._row_keys[entry.row] = None
+        self._free_rows.append(entry.row)
+
+    def _allocate_row(self, vector: np.ndarray) -> int:
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            row = len(self._row_keys)
+            self._row_keys.append(None)
+            if self._matrix is None or row == len(self._matrix):
+                # Grow geometrically, so appending stays amortized O(1).
+                capacity = max(16, 2 * row)
+                matrix = np.zeros((capacity, len(vector)), dtype=np.float32)
+                live = np.zeros(capacity, dtype=bool)
+                if self._matrix is not None:
+                    matrix[:row] = self._matrix[:row]
+                    live[:row] = self._live[:row]
+                self._matrix, self._live = matrix, live
+        self._matrix[row] = vector
+        self._live[row] = True
+        return row
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        deadline = time.monotonic() - self.ttl
+        # Entries are kept in LRU order, not insertion order, so check them all.
+        for key in [key for key, entry in self._entries.items() if entry.created_at < deadline]:
+            self._remove(key)
+
+    def _lookup_exact(self, key: str) -> str | None:
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.response
+
+    def _lookup_similar(self, vector: np.ndarray) -> str | None:
+        with self._lock:
+            self._expire()
+            if not self._entries:
+                self.misses += 1
+                return None
+            rows = len(self._row_keys)
+            similarities = np.where(self._live[:rows], self._matrix[:rows] @ vector, -np.inf)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            key = self._row_keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key].response
+
+    def _store(self, query: str, vector: np.ndarray, response: str):
+        key = self._key(query)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            row = self._allocate_row(vector)
+            self._row_keys[row] = key
+            size = vector.nbytes + len(query.encode("utf-8")) + len(response.encode("utf-8"))
+            entry = _Entry(query=query, row=row, response=response, created_at=time.monotonic(), size=size)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def get(self, query: str) -> tuple[str | None, np.ndarray | None]:
+        """
+        Return `(response, query_vector)`. The vector is None on exact-text
+        hits, otherwise it can be passed back to `put` to avoid re-embedding.
+        """
+        response = self._lookup_exact(self._key(query))
+        if response is not None:
+            return response, None
+        vector = self._normalize(self.embed_model.get_query_embedding(query))
+        return self._lookup_similar(vector), vector
+
+    async def aget(self, query: str) -> tuple[str | None, np.ndarray | None]:
+        response = self._lookup_exact(self._key(query))
+        if response is not None:
+            return response, None
+        vector = self._normalize(await self.embed_model.aget_query_embedding(query))
+        return self._lookup_similar(vector), vector
+
+    def put(self, query: str, response: str, vector: np.ndarray | None = None):
+        if vector is None:
+            vector = self._normalize(self.embed_model.get_query_embedding(query))
+        self._store(query, vector, response)
+
+    async def aput(self, query: str, response: str, vector: np.ndarray | None = None):
+        if vector is None:
+            vector = self._normalize(await self.embed_model.aget_query_embedding(query))
+        self._store(query, vector, response)
+
+    def wrap(self, query_engine) -> "CachedQueryEngine":
+        return CachedQueryEngine(query_engine, self)
+
+
+class CachedQueryEngine:
+    """
+    Drop-in replacement for a query engine that answers from a SemanticCache
+    first. Only `query` and `aquery` are cached; the returned Response has the
+    answer text in `.response` just like the wrapped engine's.
+    """
+
+    def __init__(self, query_engine, cache: SemanticCache):
+        self.query_engine = query_engine
+        self.cache = cache
+
+    def query(self, query: str) -> Response:
+        cached, vector = self.cache.get(query)
+        if cached is not None:
+            return Response(response=cached, metadata={"cache_hit": True})
+        response = self.query_engine.query(query)
+        # Empty responses aren't cached ("None" is not an answer).
+        if response.response is not None:
+            self.cache.put(query, str(response.response), vector)
+        return response
+
+    async def aquery(self, query: str) -> Response:
+        cached, vector = await self.cache.aget(query)
+        if cached is not None:
+            return Response(response=cached, metadata={"cache_hit": True})
+        response = await self.query_engine.aquery(query)
+        if response.response is not None:
+            await self.cache.aput(query, str(response.response), vector)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.query_engine, name)
@@ -0,0 +1,151 @@
+"""
+Cache shared by every worker process of a multi-process server.
+
+In-process caches (ResultCache, the router's decisions) start empty in every
+worker and each worker pays for its own misses. `SharedCache` keeps entries in
+a SQLite file (WAL mode, so readers don't block the writer) that all workers
+on the box open:
+  - entries live in namespaces ("router:Ask,Search,Stats", "results:ECommerce",
+    ...) and expire after `ttl` seconds; the oldest are trimmed past `max_entries`
+  - `invalidate(namespace)` drops a namespace and the ones nested under it
+    ("results" covers "results:ECommerce") and bumps its generation, which
+    other workers compare against to drop their in-process copies
+  - values are stored as JSON, never pickled: anyone who can write the file
+    could otherwise run code in every worker. Cache errors (a locked or
+    unreadable file, a value that isn't JSON) are treated as misses and never
+    fail a request
+
+The callers are sync code running on worker threads, so this uses sqlite3
+directly, with one connection per thread.
+
+    shared = SharedCache()
+    router = QueryRouter(routes, llm=llm, shared_cache=shared)
+    result_cache = ResultCache(shared=shared)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+SHARED_CACHE_DB = "storage/shared_cache.db"
+
+
+class SharedCache:
+    """Key-value cache in a SQLite file shared by the processes that open it."""
+
+    def __init__(self, path: str | None = None, ttl: float | None = 300, max_entries: int = 100000):
+        # $SHARED_CACHE_DB is read here rather than at import, so it can be pointed elsewhere after import.
+        path = path or os.getenv("SHARED_CACHE_DB", SHARED_CACHE_DB)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._writes = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        try:
+            entries = self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate, "errors": self.errors, "entries": entries}
+
+    def get(self, namespace: str, key: str) -> tuple[bool, Any]:
+        """(True, value) when a fresh entry exists, else (False, None)."""
+        try:
+            row = self._connection().execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is not None and (self.ttl is None or time.time() - row[1] <= self.ttl):
+                value = json.loads(row[0])
+                self.hits += 1
+                return True, value
+        except (sqlite3.Error, ValueError):
+            self.errors += 1
+        self.misses += 1
+        return False, None
+
+    def set(self, namespace: str, key: str, value: Any):
+        """Store `value`, which must be JSON-serializable (anything else is counted as an error)."""
+        try:
+            data = json.dumps(value, separators=(",", ":"))
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, data, time.time()),
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._trim(connection)
+        except (sqlite3.Error, TypeError, ValueError):
+            self.errors += 1
+
+    def _trim(self, connection: sqlite3.Connection):
+        if self.ttl is not None:
+            connection.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+        connection.execute(
+            "DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def generation(self, namespace: str) -> int:
+        """Generation of `namespace`, counting invalidations of the namespaces it is nested in."""
+        parts = namespace.split(":")
+        scopes = [":".join(parts[:i]) for i in range(1, len(parts) + 1)]
+        try:
+            row = self._connection().execute(
+                f"SELECT SUM(generation) FROM generations WHERE namespace IN ({','.join('?' * len(scopes))})", scopes
+            ).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return 0
+        return row[0] or 0
+
+    def invalidate(self, namespace: str):
+        """Drop the entries of `namespace` and of those nested under it, and bump its generation for every worker."""
+        connection = None
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM entries WHERE namespace = ? OR substr(namespace, 1, ?) = ?",
+                (namespace, len(namespace) + 1, namespace + ":"),
+            )
+            connection.execute(
+                "INSERT INTO generations (namespace, generation) VALUES (?, 1) "
+                "ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1",
+                (namespace,),
+            )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            self.errors += 1
+            if connection is not None and connection.in_transaction:
+                connection.execute("ROLLBACK")
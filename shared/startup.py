@@ -0,0 +1,90 @@
+"""
+Fast startup: values built on first use, or warmed in the background.
+
+A replica that imports every SDK, connects to Weaviate and loads its index
+before it listens takes seconds to accept its first request, which is time an
+autoscaler spends with traffic queued. The lesson scripts therefore keep their
+heavy imports inside the functions that need them and wrap clients, agents and
+indexes in `Lazy`:
+  - `lazy.get()` builds the value on first use (once, even when several
+    threads ask at the same time) and returns it from then on
+  - `await lazy.aget()` does the same on a worker thread, so the event loop
+    keeps serving while the value is built
+  - `lazy.warm()` starts building in a background thread right away; the
+    first caller then waits only for whatever is left
+  - a failed build is reported and retried by the next caller
+`bounded_workflow_as_mcp` accepts a `Lazy` workflow and warms it once the
+server is up; GET /status reports whether it is ready.
+
+    agent = Lazy(lambda: ECommerceAgent(client=connect()), "agent")
+    agent.warm()
+    ...
+    result = await (await agent.aget()).run(query=query)
+
+Run `python benchmarks/startup.py` for the import time (as `-X importtime`
+reports it) and the time to listen and to warm up of the MCP server.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """The value returned by `factory`, built once, on first use or by `warm()`."""
+
+    def __init__(self, factory: Callable[[], T], name: str | None = None):
+        self.factory = factory
+        self.name = name or getattr(factory, "__name__", "value")
+        self.seconds: float | None = None
+        self.error: str | None = None
+        self._value: T | None = None
+        self._ready = False
+        self._lock = threading.Lock()
+        self._warming: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def stats(self) -> dict:
+        return {"ready": self._ready, "seconds": self.seconds, "error": self.error}
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                started = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.seconds = time.perf_counter() - started
+                self.error = None
+                self._ready = True
+        return self._value
+
+    async def aget(self) -> T:
+        if self._ready:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    def warm(self) -> threading.Thread:
+        """Start building the value in a daemon thread (once); returns the thread."""
+        with self._lock:
+            if self._warming is None:
+                self._warming = threading.Thread(target=self._warm, name=f"warm-{self.name}", daemon=True)
+                self._warming.start()
+        return self._warming
+
+    def _warm(self):
+        try:
+            self.get()
+            print(f"✓ {self.name} ready in {self.seconds:.1f}s")
+        except Exception:
+            print(f"⚠ Warming {self.name} failed ({self.error}), retrying on first use")
@@ -0,0 +1,107 @@
+"""
+Token streaming out of workflow steps.
+
+Steps write a `TokenEvent` to the workflow event stream with the chunks the
+LLM or the QueryAgent produces, so callers iterating `handler.stream_events()`
+can render the answer as it arrives instead of waiting for the StopEvent.
+Deltas are batched (one event per `FLUSH_INTERVAL` seconds at most), since
+every event costs a notification when a step runs behind an MCP server:
+
+    handler = agent.run(query=query)
+    async for event in handler.stream_events():
+        if isinstance(event, TokenEvent):
+            print(event.delta, end="", flush=True)
+    result = await handler
+"""
+
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Callable
+
+from workflows import Context
+from workflows.events import Event
+
+if TYPE_CHECKING:
+    from llama_index.core.llms import LLM
+
+FLUSH_INTERVAL = 0.05
+
+
+class TokenEvent(Event):
+    delta: str
+
+
+class _DeltaBuffer:
+    """Joins deltas and hands them to `emit` at most every `interval` seconds."""
+
+    def __init__(self, emit: Callable[[str], None], interval: float = FLUSH_INTERVAL):
+        self.emit = emit
+        self.interval = interval
+        self._pending: list[str] = []
+        self._flushed = time.monotonic()
+
+    def add(self, delta: str):
+        self._pending.append(delta)
+        if time.monotonic() - self._flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.emit("".join(self._pending))
+            self._pending = []
+        self._flushed = time.monotonic()
+
+
+async def stream_completion(ctx: Context, llm: "LLM", prompt: str) -> str:
+    """Stream `llm`'s completion of `prompt` as TokenEvents and return the full text."""
+    buffer = _DeltaBuffer(lambda delta: ctx.write_event_to_stream(TokenEvent(delta=delta)))
+    text = ""
+    async for chunk in await llm.astream_complete(prompt):
+        if chunk.delta:
+            buffer.add(chunk.delta)
+        text = chunk.text
+    buffer.flush()
+    return text
+
+
+async def stream_answer(ctx: Context, agent, query: str):
+    """
+    Stream `QueryAgent.ask_stream` deltas as TokenEvents and return the final
+    QueryAgent response. The agent's generator is blocking, so the whole
+    stream is read in one worker thread, which hands batches of deltas back
+    to the event loop and closes the generator (and its HTTP stream) when it
+    ends, fails or the step is cancelled.
+    """
+    from weaviate.agents.classes import StreamedTokens
+
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+
+    def emit(delta: str):
+        if not cancelled.is_set():
+            ctx.write_event_to_stream(TokenEvent(delta=delta))
+
+    def read() -> object:
+        buffer = _DeltaBuffer(lambda delta: loop.call_soon_threadsafe(emit, delta))
+        outputs = agent.ask_stream(query, include_progress=False)
+        response = None
+        try:
+            for output in outputs:
+                if cancelled.is_set():
+                    break
+                if isinstance(output, StreamedTokens):
+                    buffer.add(output.delta)
+                else:
+                    response = output
+            if not cancelled.is_set():
+                buffer.flush()
+        finally:
+            outputs.close()
+        return response
+
+    try:
+        return await asyncio.to_thread(read)
+    finally:
+        # On cancellation or a deadline the thread stops at the next output.
+        cancelled.set()
@@ -0,0 +1,388 @@
+"""
+Per-step tracing and latency histograms for the lesson workflows.
+
+Workflow steps, LLM calls and embedding calls are already wrapped in
+`llama-index-instrumentation` spans. `enable_tracing()` attaches a span handler
+to the root dispatcher that times every span and:
+  - appends one JSON line per finished span to a trace file (buffered, and
+    written by a background thread so the event loop never waits on disk);
+    "{pid}" in its name is replaced by the process id, so every worker
+    process of a server writes a file of its own
+  - records its duration in an in-process HistogramRegistry
+Token counts reported by the LLM and the event types going in and out of each
+workflow step are added to the span records.
+
+Calls that are not instrumented upstream (Weaviate, QueryAgent) can be traced
+with `trace_calls(obj, "ask_stream", "search")`; a generator method's span
+lasts until its last item (the final response) or until it is closed.
+
+    registry = enable_tracing()
+    ...
+    print(registry.report())
+"""
+
+import atexit
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from typing import Any, Dict, Optional
+
+from llama_index_instrumentation import get_dispatcher
+from llama_index_instrumentation.dispatcher import active_instrument_tags
+from llama_index_instrumentation.event_handlers import BaseEventHandler
+from llama_index_instrumentation.span import BaseSpan, active_span_id
+from llama_index_instrumentation.span_handlers import BaseSpanHandler
+from pydantic import Field, PrivateAttr
+from workflows import Workflow
+from workflows.events import Event
+
+TRACE_FILE = os.getenv("TRACE_FILE", "traces/spans.{pid}.jsonl")
+
+# Span names created by `trace_calls`, mapped to their kind.
+_CALL_KINDS: dict[str, str] = {}
+
+
+class LatencyHistogram:
+    """Fixed log-spaced buckets (20% apart) from 0.5ms to ~3min; percentiles are interpolated."""
+
+    BOUNDS = [0.0005 * 1.2**i for i in range(71)]
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = self.BOUNDS[i - 1] if i else 0.0
+                upper = self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class HistogramRegistry:
+    """Latency histograms and token totals keyed by span name."""
+
+    def __init__(self):
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.tokens: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float, tokens: int = 0):
+        with self._lock:
+            self.histograms.setdefault(name, LatencyHistogram()).observe(seconds)
+            if tokens:
+                self.tokens[name] = self.tokens.get(name, 0) + tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {**histogram.summary(), "tokens": self.tokens.get(name, 0)}
+                for name, histogram in sorted(self.histograms.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.tokens.clear()
+
+    def report(self) -> str:
+        lines = [f"{'span':<45} {'n':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'tokens':>8}"]
+        for name, stats in self.snapshot().items():
+            lines.append(
+                f"{name:<45} {stats['count']:>5} {stats['p50']:>7.3f}s {stats['p95']:>7.3f}s "
+                f"{stats['p99']:>7.3f}s {stats['tokens']:>8}"
+            )
+        return "\n".join(lines)
+
+
+class TracedSpan(BaseSpan):
+    name: str
+    kind: str
+    started_at: float = Field(default_factory=time.perf_counter)
+    duration: float = 0.0
+    event_in: Optional[str] = None
+    event_out: Optional[str] = None
+    tokens: Dict[str, int] = Field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def _span_kind(name: str, instance: Any) -> str:
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.llms import LLM
+
+    if name in _CALL_KINDS:
+        return _CALL_KINDS[name]
+    if isinstance(instance, Workflow):
+        return "workflow" if name.endswith(".run") else "step"
+    if isinstance(instance, LLM):
+        return "llm"
+    if isinstance(instance, BaseEmbedding):
+        return "embedding"
+    return "other"
+
+
+class SpanWriter:
+    """
+    Appends span records to a JSONL file from a daemon thread, every
+    `flush_interval` seconds or once `batch_size` records are waiting.
+    `write()` only appends to a list; whatever is left is flushed at exit.
+    "{pid}" in `path` is replaced by the id of the process.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, batch_size: int = 1000):
+        path = path.replace("{pid}", str(os.getpid()))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._file = open(path, "a")
+        self._pending: list[dict] = []
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, name="span-writer", daemon=True).start()
+        atexit.register(self.flush)
+
+    def write(self, record: dict):
+        with self._lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        # Taking the file lock first keeps batches in the order they were buffered.
+        with self._file_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if pending:
+                self._file.write("".join(json.dumps(record, default=str) + "\n" for record in pending))
+                self._file.flush()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠ Writing spans to {self.path} failed: {e}")
+
+
+class TracingSpanHandler(BaseSpanHandler[TracedSpan]):
+    """Times every span and exports it to the registry and the trace file."""
+
+    _registry: HistogramRegistry = PrivateAttr()
+    _writer: SpanWriter | None = PrivateAttr(default=None)
+
+    def __init__(self, registry: HistogramRegistry, trace_path: str | None = TRACE_FILE):
+        super().__init__()
+        self._registry = registry
+        if trace_path:
+            self._writer = SpanWriter(trace_path)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TracingSpanHandler"
+
+    def new_span(
+        self,
+        id_: str,
+        bound_args: inspect.BoundArguments,
+        instance: Optional[Any] = None,
+        parent_span_id: Optional[str] = None,
+        tags: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> TracedSpan:
+        # Span ids look like "ECommerceAgent.start-<uuid>".
+        name = id_.split("-", 1)[0]
+        event_in = next((type(v).__name__ for v in bound_args.arguments.values() if isinstance(v, Event)), None)
+        return TracedSpan(
+            id_=id_,
+            parent_id=parent_span_id,
+            tags=tags or {},
+            name=name,
+            kind=_span_kind(name, instance),
+            event_in=event_in,
+        )
+
+    def _finish(self, span: TracedSpan):
+        span.duration = time.perf_counter() - span.started_at
+        # Private methods just repeat the timing of their public wrapper.
+        if not span.name.rsplit(".", 1)[-1].startswith("_"):
+            self._registry.observe(span.name, span.duration, span.tokens.get("total_tokens", 0))
+        if self._writer:
+            self._writer.write(span.model_dump(exclude={"started_at"}))
+
+    def prepare_to_exit_span(
+        self,
+        id_: str,
+        bound_args: inspect.BoundArguments,
+        instance: Optional[Any] = None,
+        result: Optional[Any] = None,
+        **kwargs: Any,
+    ) -> Optional[TracedSpan]:
+        span = self.open_spans.get(id_)
+        if span is None:
+            return None
+        if isinstance(result, Event):
+            span.event_out = type(result).__name__
+        self._finish(span)
+        return span
+
+    def prepare_to_drop_span(
+        self,
+        id_: str,
+        bound_args: inspect.BoundArguments,
+        instance: Optional[Any] = None,
+        err: Optional[BaseException] = None,
+        **kwargs: Any,
+    ) -> Optional[TracedSpan]:
+        span = self.open_spans.get(id_)
+        if span is None:
+            return None
+        span.error = f"{type(err).__name__}: {err}" if err else None
+        self._finish(span)
+        return span
+
+    def add_tokens(self, span_id: str, tokens: dict):
+        span = self.open_spans.get(span_id)
+        if span is not None:
+            for key, value in tokens.items():
+                span.tokens[key] = span.tokens.get(key, 0) + value
+
+
+class TokenCountHandler(BaseEventHandler):
+    """Copies the token usage of LLM responses onto the span that produced them."""
+
+    _span_handler: TracingSpanHandler = PrivateAttr()
+
+    def __init__(self, span_handler: TracingSpanHandler):
+        super().__init__()
+        self._span_handler = span_handler
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TokenCountHandler"
+
+    def handle(self, event, **kwargs):
+        from llama_index.core.instrumentation.events.llm import LLMChatEndEvent, LLMCompletionEndEvent
+
+        if not isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)) or event.response is None:
+            return
+        usage = event.response.additional_kwargs or {}
+        raw_usage = getattr(event.response.raw, "usage", None) if not isinstance(event.response.raw, dict) else event.response.raw.get("usage")
+        tokens = {}
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            value = usage.get(key)
+            if value is None and raw_usage is not None:
+                value = raw_usage.get(key) if isinstance(raw_usage, dict) else getattr(raw_usage, key, None)
+            if isinstance(value, int):
+                tokens[key] = value
+        if tokens:
+            self._span_handler.add_tokens(event.span_id, tokens)
+
+
+_enabled: HistogramRegistry | None = None
+
+
+def enable_tracing(trace_path: str | None = TRACE_FILE) -> HistogramRegistry:
+    """
+    Attach the tracing handlers to the root dispatcher (once per process) and
+    return the shared HistogramRegistry. Pass `trace_path=None` to skip the
+    JSONL export.
+    """
+    global _enabled
+    if _enabled is None:
+        registry = HistogramRegistry()
+        span_handler = TracingSpanHandler(registry, trace_path=trace_path)
+        dispatcher = get_dispatcher()
+        dispatcher.add_span_handler(span_handler)
+        dispatcher.add_event_handler(TokenCountHandler(span_handler))
+        _enabled = registry
+    return _enabled
+
+
+def trace_calls(obj, *method_names: str, name: str | None = None, kind: str = "weaviate"):
+    """
+    Wrap `obj`'s methods in dispatcher spans, so calls to services that aren't
+    instrumented upstream (QueryAgent, Weaviate collections) show up in traces.
+    Returns `obj` for convenience.
+    """
+    dispatcher = get_dispatcher()
+    prefix = name or type(obj).__name__
+    for method_name in method_names:
+        method = getattr(obj, method_name)
+        if inspect.isgeneratorfunction(method):
+            traced = _traced_generator(dispatcher, f"{prefix}.{method_name}", method)
+        else:
+            def call(*args, _method=method, **kwargs):
+                return _method(*args, **kwargs)
+
+            call.__qualname__ = f"{prefix}.{method_name}"
+            traced = dispatcher.span(call)
+        _CALL_KINDS[f"{prefix}.{method_name}"] = kind
+        setattr(obj, method_name, traced)
+    return obj
+
+
+def _traced_generator(dispatcher, name: str, method):
+    """
+    `dispatcher.span` would end the span as soon as the generator is created;
+    this one starts it on the first `next()` and ends it after the last item
+    (recorded as the result) or when the consumer closes the generator.
+    """
+    signature = inspect.signature(method)
+
+    def call(*args, **kwargs):
+        id_ = f"{name}-{uuid.uuid4()}"
+        bound_args = signature.bind(*args, **kwargs)
+        dispatcher.span_enter(id_=id_, bound_args=bound_args, parent_id=active_span_id.get(), tags=active_instrument_tags.get())
+        outputs = method(*args, **kwargs)
+        last = None
+        try:
+            for last in outputs:
+                yield last
+        except GeneratorExit:
+            # The consumer stopped early (e.g. `break` out of a stream): the
+            # call finished normally, with the last item it took as the result.
+            dispatcher.span_exit(id_=id_, bound_args=bound_args, result=last)
+            raise
+        except BaseException as e:
+            dispatcher.span_drop(id_=id_, bound_args=bound_args, err=e)
+            raise
+        else:
+            dispatcher.span_exit(id_=id_, bound_args=bound_args, result=last)
+        finally:
+            outputs.close()
+
+    call.__qualname__ = name
+    return call
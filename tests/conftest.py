@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Like the lesson scripts, the tests import `shared` and `benchmarks` from the repository root.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,51 @@
+import asyncio
+
+from benchmarks.fakes import FakeCollection, fake_catalog
+from shared.bulk_import import object_uuid
+from shared.catalog_sync import sync_catalog
+
+
+def catalog(n: int) -> list[dict]:
+    return [{**row["properties"], "product_id": f"sku-{i}"} for i, row in enumerate(fake_catalog(n))]
+
+
+def stored(collection: FakeCollection) -> dict[str, dict]:
+    return {str(obj.uuid): obj.properties for obj in collection.iterator()}
+
+
+def test_sync_sends_only_the_delta():
+    collection = FakeCollection("ECommerce")
+    rows = catalog(200)
+    stats = asyncio.run(sync_catalog(collection, rows))
+    assert (stats.added, stats.changed, stats.removed, stats.unchanged) == (200, 0, 0, 0)
+
+    rows[3] = {**rows[3], "price": rows[3]["price"] + 1}
+    removed = rows.pop()
+    rows.append(catalog(201)[200])
+    stats = asyncio.run(sync_catalog(collection, rows))
+    assert (stats.added, stats.changed, stats.removed, stats.unchanged) == (1, 1, 1, 198)
+    assert stats.imported.imported == 2
+
+    objects = stored(collection)
+    assert len(objects) == 200
+    assert objects[object_uuid(rows[3])]["price"] == rows[3]["price"]
+    assert object_uuid(removed) not in objects
+
+
+def test_sync_without_changes_sends_nothing():
+    collection = FakeCollection("ECommerce")
+    rows = catalog(100)
+    asyncio.run(sync_catalog(collection, rows))
+    stats = asyncio.run(sync_catalog(collection, rows))
+    assert (stats.added, stats.changed, stats.removed, stats.unchanged) == (0, 0, 0, 100)
+    assert stats.imported is None
+
+
+def test_edited_item_without_product_id_is_added_and_removed():
+    collection = FakeCollection("ECommerce")
+    rows = [row["properties"] for row in fake_catalog(20)]
+    asyncio.run(sync_catalog(collection, rows))
+    rows[0] = {**rows[0], "price": rows[0]["price"] + 1}
+    stats = asyncio.run(sync_catalog(collection, rows))
+    # The UUID follows the content when there is no product_id.
+    assert (stats.added, stats.changed, stats.removed) == (1, 0, 1)
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+
+from shared.catalog import Catalog
+from shared.item_selection import parse_item_selection
+
+# The real new-items file: its product ids are UUID-shaped but not all hex.
+NEW_ITEMS = Path(__file__).resolve().parents[1] / "new_clothing_items.json"
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return Catalog(str(NEW_ITEMS))
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("add item 3", [3]),
+        ("add items 1-3", [1, 2, 3]),
+        ("add items 4 to 2", [2, 3, 4]),
+        ("add items 1, 4 and 0", [1, 4, 0]),
+        ("add items 2, 2 and 2-3", [2, 3]),
+        ("add all Cottagecore items", [1, 8]),
+        ("add the 2 dark academia items", [4]),
+        ("add all new items", list(range(10))),
+        ("add everything", list(range(10))),
+        ("please add the  stellar mesh HOODIE", [0]),
+        ("add the Neon Circuit Board Sunglasses and item 5", [9, 5]),
+    ],
+)
+def test_selections(catalog, query, expected):
+    assert parse_item_selection(query, catalog) == expected
+
+
+@pytest.mark.parametrize("position", range(10))
+def test_every_product_id_resolves(catalog, position):
+    product_id = catalog.properties(position)["product_id"]
+    assert parse_item_selection(f"add {product_id}", catalog) == [position]
+    other = (position + 1) % 10
+    assert parse_item_selection(f"add {product_id.upper()} and item {other}", catalog) == [position, other]
+
+
+@pytest.mark.parametrize("query", ["add the blue ones", "add item 42", "add a 0c0ffee0-0000-0000-0000-000000000000"])
+def test_unresolved_selections_return_none(catalog, query):
+    assert parse_item_selection(query, catalog) is None
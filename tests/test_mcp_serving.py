@@ -0,0 +1,161 @@
+import asyncio
+import threading
+
+import pytest
+from pydantic import BaseModel
+from workflows import Workflow, step
+from workflows.events import Event, StartEvent, StopEvent
+
+from shared.mcp_serving import (
+    AdmissionController,
+    DeadlineExceededError,
+    ServerBusyError,
+    SingleFlight,
+    flight_key,
+)
+
+
+class SlowEvent(Event):
+    seconds: float
+
+
+class SlowWorkflow(Workflow):
+    """Sleeps `seconds` in an async step, then reports the thread its sync step ran on."""
+
+    @step
+    async def start(self, ev: StartEvent) -> SlowEvent:
+        await asyncio.sleep(ev.seconds)
+        return SlowEvent(seconds=ev.seconds)
+
+    @step
+    def finish(self, ev: SlowEvent) -> StopEvent:
+        return StopEvent(result=threading.current_thread().name)
+
+
+def test_flight_key_ignores_case_and_spacing():
+    class Args(BaseModel):
+        query: str
+        limit: int = 5
+
+    assert flight_key(Args(query="Floral  Dresses ")) == flight_key(Args(query="floral dresses"))
+    assert flight_key(Args(query="floral dresses")) != flight_key(Args(query="floral dresses", limit=6))
+
+
+def test_single_flight_coalesces_identical_calls():
+    async def main():
+        flights = SingleFlight()
+        calls = []
+
+        async def call(publish):
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("key", call) for _ in range(5)), flights.do("other", call))
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(main())
+    assert results == ["result"] * 6
+    assert len(calls) == 2
+    assert flights.stats() == {"leaders": 2, "coalesced": 4, "coalesced_rate": 4 / 6, "in_flight": 0}
+
+
+def test_single_flight_shares_errors_and_events():
+    async def main():
+        flights = SingleFlight()
+        received = {"a": [], "b": []}
+
+        async def call(publish):
+            await asyncio.sleep(0.01)  # both callers have joined
+            await publish("event")
+            raise ValueError("boom")
+
+        def subscriber(name):
+            async def send(event):
+                received[name].append(event)
+            return send
+
+        outcomes = await asyncio.gather(
+            flights.do("key", call, subscriber=subscriber("a")),
+            flights.do("key", call, subscriber=subscriber("b")),
+            return_exceptions=True,
+        )
+        return outcomes, received
+
+    outcomes, received = asyncio.run(main())
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert received == {"a": ["event"], "b": ["event"]}
+
+
+def test_single_flight_cancels_the_call_once_every_caller_left():
+    async def main():
+        flights = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def call(publish):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.ensure_future(flights.do("key", call))
+        await started.wait()
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        await asyncio.sleep(0)
+        return flights.stats()["in_flight"]
+
+    assert asyncio.run(main()) == 0
+
+
+def test_admission_runs_sync_steps_on_its_own_executor():
+    async def main():
+        admission = AdmissionController(max_concurrent=2, max_queue=4, deadline=10)
+        results = await asyncio.gather(*(admission.run(SlowWorkflow(), seconds=0.01) for _ in range(4)))
+        return admission, results, asyncio.get_running_loop()._default_executor
+
+    admission, results, default_executor = asyncio.run(main())
+    assert all(name.startswith("workflow-step") for name in results)
+    assert default_executor is None  # the loop's default executor is left alone
+    assert admission.stats()["completed"] == 4
+    assert admission.in_flight == 0
+
+
+def test_admission_caps_concurrency_and_sheds_beyond_the_queue():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, deadline=10)
+        running = asyncio.ensure_future(admission.run(SlowWorkflow(), seconds=0.2))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(admission.run(SlowWorkflow(), seconds=0.0))
+        await asyncio.sleep(0.01)
+        stats = admission.stats()
+        with pytest.raises(ServerBusyError):
+            await admission.run(SlowWorkflow(), seconds=0.0)
+        await asyncio.gather(running, queued)
+        return stats, admission.stats()
+
+    during, after = asyncio.run(main())
+    assert (during["in_flight"], during["queue_depth"]) == (1, 1)
+    assert after["shed"] == 1
+    assert after["completed"] == 2
+    assert (after["in_flight"], after["queue_depth"]) == (0, 0)
+
+
+def test_admission_cancels_runs_past_their_deadline():
+    async def main():
+        admission = AdmissionController(max_concurrent=1, max_queue=2, deadline=0.1)
+        outcomes = await asyncio.gather(
+            admission.run(SlowWorkflow(), seconds=1.0),
+            admission.run(SlowWorkflow(), seconds=0.0),
+            return_exceptions=True,
+        )
+        return admission, outcomes
+
+    admission, outcomes = asyncio.run(main())
+    # The first run times out while running, the second while queued behind it.
+    assert all(isinstance(outcome, DeadlineExceededError) for outcome in outcomes)
+    assert admission.timed_out == 2
+    assert admission.in_flight == 0 and admission.queued == 0
@@ -0,0 +1,44 @@
+import numpy as np
+from llama_index.core import Document, MockEmbedding, StorageContext, VectorStoreIndex
+from llama_index.core.schema import NodeRelationship, TextNode
+
+from shared.numpy_vector_store import NumpyVectorStore
+from shared.query_engine import _stale_documents
+
+
+def build_index(documents: list[Document]) -> VectorStoreIndex:
+    index = VectorStoreIndex(
+        nodes=[],
+        storage_context=StorageContext.from_defaults(vector_store=NumpyVectorStore()),
+        embed_model=MockEmbedding(embed_dim=8),
+    )
+    _stale_documents(index, documents)
+    rng = np.random.default_rng(0)
+    index.insert_nodes([
+        TextNode(
+            id_=f"{document.id_}-{part}",
+            text=document.text,
+            embedding=rng.normal(size=8).tolist(),
+            relationships={NodeRelationship.SOURCE: document.as_related_node_info()},
+        )
+        for document in documents
+        for part in range(2)
+    ])
+    return index
+
+
+def test_changed_documents_are_removed_from_the_index():
+    documents = [Document(id_=f"doc-{i}", text=f"item {i}") for i in range(10)]
+    index = build_index(documents)
+    assert index.vector_store.size == 20
+
+    changed = [Document(id_=f"doc-{i}", text=f"item {i}, now in blue") for i in (2, 5)]
+    new = [Document(id_="doc-10", text="item 10")]
+    stale = _stale_documents(index, documents[:2] + changed + new)
+
+    assert [document.id_ for document in stale] == ["doc-2", "doc-5", "doc-10"]
+    assert index.vector_store.size == 16
+    assert not {"doc-2-0", "doc-2-1", "doc-5-0", "doc-5-1"} & set(index.index_struct.nodes_dict)
+    assert index.docstore.get_ref_doc_info("doc-2") is None
+    assert index.docstore.get_ref_doc_info("doc-3") is not None
+    assert _stale_documents(index, changed + new) == []
@@ -0,0 +1,170 @@
+import numpy as np
+import pytest
+from llama_index.core.vector_stores.types import MetadataFilter, MetadataFilters, VectorStoreQuery
+
+from shared.ivf_vector_store import IVFVectorStore
+from shared.numpy_vector_store import NumpyVectorStore
+
+
+def clustered_vectors(n: int, dim: int = 32, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def fill(store: NumpyVectorStore, vectors: np.ndarray) -> list[str]:
+    ids = [f"node-{i}" for i in range(len(vectors))]
+    store.add_vectors(
+        ids,
+        vectors,
+        ref_doc_ids=[f"doc-{i % 10}" for i in range(len(vectors))],
+        metadata=[{"price": float(i), "doc": f"doc-{i % 10}"} for i in range(len(vectors))],
+    )
+    return ids
+
+
+def query(store: NumpyVectorStore, vector: np.ndarray, k: int = 5, **kwargs) -> list[str]:
+    return store.query(VectorStoreQuery(query_embedding=vector.tolist(), similarity_top_k=k, **kwargs)).ids
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_numpy_store_finds_stored_vectors(dtype):
+    store = NumpyVectorStore(dtype=dtype)
+    vectors = clustered_vectors(300)
+    ids = fill(store, vectors)
+    for i in (0, 17, 299):
+        assert query(store, vectors[i])[0] == ids[i]
+
+
+def test_numpy_store_matches_brute_force():
+    store = NumpyVectorStore(chunk_size=64)  # several blocks
+    vectors = clustered_vectors(300)
+    ids = fill(store, vectors)
+    q = np.random.default_rng(1).normal(size=32).astype(np.float32)
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = [ids[i] for i in np.argsort(-(normalized @ q))[:10]]
+    assert query(store, q, k=10) == expected
+
+
+def test_numpy_store_filters():
+    store = NumpyVectorStore()
+    vectors = clustered_vectors(100)
+    fill(store, vectors)
+    filters = MetadataFilters(filters=[MetadataFilter(key="price", value=10.0, operator="<")])
+    found = query(store, vectors[50], k=20, filters=filters)
+    assert sorted(found) == sorted(f"node-{i}" for i in range(10))
+
+
+def test_numpy_store_delete_nodes_and_ref_docs():
+    store = NumpyVectorStore()
+    vectors = clustered_vectors(100)
+    ids = fill(store, vectors)
+    store.delete_nodes(node_ids=[ids[3]])
+    assert store.size == 99
+    assert ids[3] not in query(store, vectors[3], k=10)
+    # Rows moved into the gap are still found under their own id.
+    assert query(store, vectors[99])[0] == ids[99]
+
+    store.delete("doc-5")
+    assert store.size == 89
+    assert not any(int(node_id.split("-")[1]) % 10 == 5 for node_id in query(store, vectors[5], k=89))
+
+
+def test_numpy_store_delete_ref_docs_matches_single_deletes():
+    vectors = clustered_vectors(100)
+    one_by_one, batched = NumpyVectorStore(), NumpyVectorStore()
+    fill(one_by_one, vectors)
+    fill(batched, vectors)
+    for ref_doc_id in ("doc-1", "doc-4", "doc-9"):
+        one_by_one.delete(ref_doc_id)
+    batched.delete_ref_docs(["doc-1", "doc-4", "doc-9", "doc-missing"])
+    assert batched.size == one_by_one.size == 70
+    assert sorted(query(batched, vectors[0], k=100)) == sorted(query(one_by_one, vectors[0], k=100))
+
+
+def test_numpy_store_replaces_existing_ids():
+    store = NumpyVectorStore()
+    vectors = clustered_vectors(50)
+    ids = fill(store, vectors)
+    store.add_vectors([ids[0]], vectors[1:2])
+    assert store.size == 50
+    assert set(query(store, vectors[1], k=2)) == {ids[0], ids[1]}
+
+
+def test_numpy_store_persist_roundtrip(tmp_path):
+    store = NumpyVectorStore(dtype="float16")
+    vectors = clustered_vectors(100)
+    ids = fill(store, vectors)
+    path = str(tmp_path / "default__vector_store.json")
+    store.persist(path)
+    loaded = NumpyVectorStore.from_persist_path(path)
+    assert loaded.size == 100
+    assert query(loaded, vectors[42])[0] == ids[42]
+
+
+def test_ivf_store_is_exact_below_min_train_size():
+    store = IVFVectorStore(min_train_size=1000)
+    vectors = clustered_vectors(300)
+    fill(store, vectors)
+    exact = NumpyVectorStore()
+    fill(exact, vectors)
+    assert not store.trained
+    assert query(store, vectors[7], k=10) == query(exact, vectors[7], k=10)
+
+
+def test_ivf_store_calibrates_nprobe_to_target_recall():
+    store = IVFVectorStore(min_train_size=1000, nlist=32, target_recall=0.9)
+    vectors = clustered_vectors(2000)
+    fill(store, vectors)
+    assert store.trained
+    assert store.measured_recall >= 0.9
+    assert 1 <= store.nprobe <= 32
+
+    exact = NumpyVectorStore()
+    fill(exact, vectors)
+    queries = clustered_vectors(50, seed=2)
+    recall = np.mean([
+        len(set(query(store, q, k=10)) & set(query(exact, q, k=10))) / 10 for q in queries
+    ])
+    assert recall >= 0.8
+
+
+def test_ivf_store_delete():
+    store = IVFVectorStore(min_train_size=1000, nlist=32)
+    vectors = clustered_vectors(2000)
+    ids = fill(store, vectors)
+    store.delete_nodes(node_ids=ids[:100])
+    assert store.size == 1900
+    for i in (0, 50, 99):
+        assert ids[i] not in query(store, vectors[i], k=10)
+    for i in (100, 1000, 1999):
+        assert query(store, vectors[i])[0] == ids[i]
+
+    store.delete("doc-3")
+    assert not any(node_id.endswith("3") for node_id in query(store, vectors[3], k=50))
+
+
+def test_ivf_store_searches_rows_added_after_training():
+    store = IVFVectorStore(min_train_size=1000, nlist=32)
+    fill(store, clustered_vectors(2000))
+    new = clustered_vectors(10, seed=3)
+    store.add_vectors([f"new-{i}" for i in range(10)], new)
+    for i in range(10):
+        assert query(store, new[i])[0] == f"new-{i}"
+
+
+@pytest.mark.parametrize("mutation", ["delete", "insert", "replace"])
+def test_ivf_store_filtered_query_after_a_write(mutation):
+    store = IVFVectorStore(min_train_size=1000, nlist=64, nprobe=4, target_recall=None)
+    vectors = np.random.default_rng(0).normal(size=(4000, 32)).astype(np.float32)
+    store.add_vectors([f"id{i}" for i in range(4000)], vectors, metadata=[{"cat": i % 10} for i in range(4000)])
+    if mutation == "delete":
+        store.delete_nodes(["id5"])
+    elif mutation == "insert":
+        store.add_vectors(["extra"], vectors[:1], metadata=[{"cat": 1}])
+    else:
+        store.add_vectors(["id7"], vectors[8:9], metadata=[{"cat": 7}])
+    filters = MetadataFilters(filters=[MetadataFilter(key="cat", value=3)])
+    found = query(store, vectors[13], k=10, filters=filters)
+    assert len(found) == 10
+    assert all(int(node_id[2:]) % 10 == 3 for node_id in found)